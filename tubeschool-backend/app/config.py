@@ -1,27 +1,113 @@
+from pydantic import ValidationInfo, field_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
     # Qdrant Configuration
-    QDRANT_URL: str
-    QDRANT_API_KEY: str
+    QDRANT_URL: str = ""
+    QDRANT_API_KEY: str = ""
+    QDRANT_PATH: str = ""  # Embedded Qdrant instead of QDRANT_URL: storage directory, or ":memory:"
+    QDRANT_ASYNC: bool = True  # Use AsyncQdrantClient on the request path
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_TIMEOUT: int = 10  # Seconds per Qdrant call
+    QDRANT_POOL_SIZE: int = 20  # Max pooled REST connections
 
     # LLM API Keys
     HUGGINGFACEHUB_API_TOKEN: str = ""
     GOOGLE_API_KEY: str = ""
     AZURE_OPENAI_API_KEY: str = ""
     AZURE_OPENAI_ENDPOINT: str = ""
+    AZURE_OPENAI_DEPLOYMENT: str = ""
+    AZURE_OPENAI_API_VERSION: str = "2024-06-01"
 
     # Qdrant Collections
     VIDEO_CHUNKS_COLLECTION: str = "video_chunks"
     USER_DOUBTS_COLLECTION: str = "user_doubts"
+    QUIZ_POOL_COLLECTION: str = "quiz_pool"
+    VIDEO_TOPICS_COLLECTION: str = "video_topics"
+    VIDEO_SECTIONS_COLLECTION: str = "video_sections"
+    TRANSCRIPTS_COLLECTION: str = "video_transcripts"
+    VIDEO_NOTES_COLLECTION: str = "video_notes"
+    INDEX_VERSIONS_COLLECTION: str = "index_versions"
+    DOUBT_SUMMARIES_COLLECTION: str = "doubt_summaries"
+    PROCESSES_COLLECTION: str = "app_processes"
+
+    # Versioned collections: the collection names above are aliases of the live
+    # index version, rebuilt in the background when the embedding/chunking config changes
+    AUTO_REINDEX: bool = True
+    INDEX_POLL_INTERVAL_SEC: float = 30.0  # How often every worker checks for a switch
+    REINDEX_LEASE_SEC: float = 300.0  # A build without heartbeat for this long can be taken over
+    REINDEX_FETCH_INTERVAL_SEC: float = 1.0  # Pace of transcript refetches, so a re-index can't trip the breaker
+
+    # Transcript fetching (per-attempt timeout, retries with backoff, circuit breaker)
+    TRANSCRIPT_TIMEOUT_SEC: float = 10.0
+    TRANSCRIPT_RETRIES: int = 2
+    TRANSCRIPT_RETRY_BACKOFF_SEC: float = 0.5
+    TRANSCRIPT_BREAKER_THRESHOLD: int = 5  # Consecutive failures before failing fast
+    TRANSCRIPT_BREAKER_RESET_SEC: float = 30.0
+    TRANSCRIPT_MAX_WORKERS: int = 8
+
+    # Write-behind batching of user doubts
+    DOUBT_FLUSH_BATCH_SIZE: int = 32
+    DOUBT_FLUSH_INTERVAL_SEC: float = 2.0
+
+    # Retention of user doubts: a background compactor deletes doubts past the TTL and
+    # orphaned ones (created before the oldest running process started, so their
+    # in-memory session is gone), optionally keeping per-video topic counts
+    DOUBT_TTL_DAYS: float = 30.0  # 0 keeps doubts until they are orphaned
+    DOUBT_COMPACT_ORPHANS: bool = True
+    DOUBT_ORPHAN_GRACE_SEC: float = 3600.0  # Margin for clock skew between processes
+    DOUBT_COMPACTION_INTERVAL_SEC: float = 3600.0
+    DOUBT_TOPIC_SUMMARY: bool = True
+    PROCESS_HEARTBEAT_SEC: float = 60.0  # Liveness records, stale after 3 missed heartbeats
+
+    # In-process session doubt index
+    DOUBT_INDEX_MAX_SESSIONS: int = 10000
+    WEAK_TOPICS_LIMIT: int = 5
+
+    # Topic vocabulary (k-means over chunk embeddings, labeled once per video)
+    TOPIC_MAX_CLUSTERS: int = 12
+    TOPIC_MIN_SIMILARITY: float = 0.2  # Questions below this match no topic
+    TOPIC_CACHE_MAX_VIDEOS: int = 1000
 
     # Embedding Configuration
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 50
 
+    # Shared embedding process (one model per node instead of one per worker)
+    EMBEDDING_SERVER_SOCKET: str = ""  # Unix socket path, empty = load the model in each worker
+    EMBEDDING_BATCH_MAX_SIZE: int = 64  # Texts per forward pass
+    EMBEDDING_BATCH_WAIT_MS: float = 5.0  # How long to wait for more requests to batch
+    EMBEDDING_SERVER_TIMEOUT_SEC: float = 30.0
+
+    # Section layer for long videos: contiguous chunks are grouped into sections,
+    # queries pick the best sections first and only search chunks inside them
+    SECTION_MIN_CHUNKS: int = 200  # Videos with fewer chunks use flat search (0 disables sections)
+    SECTION_SIZE: int = 20  # Chunks per section
+    SECTION_TOP_K: int = 3  # Sections searched per query
+
+    # Cross-encoder reranking of retrieved chunks for questions: RERANK_CANDIDATES
+    # chunks are fetched by cosine similarity, rescored, and the best RERANK_TOP_K kept
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_TOP_K: int = 2
+    RERANK_BATCH_SIZE: int = 32  # (question, chunk) pairs per forward pass
+    RERANK_MAX_LENGTH: int = 256  # Tokens per pair; chunks of CHUNK_SIZE characters fit well within
+    RERANK_CACHE_SIZE: int = 50000  # Cached (question, chunk) scores
+
+    # Playback WebSocket: position heartbeats keep the chunks around the student's
+    # position warm (with embeddings), so questions over the socket skip the Qdrant search
+    PLAYBACK_WINDOW_BEHIND_SEC: float = 180.0
+    PLAYBACK_WINDOW_AHEAD_SEC: float = 60.0  # The window reloads after moving half of this
+    PLAYBACK_MAX_CHUNKS: int = 40  # Warm chunks per connection
+    PLAYBACK_MIN_SCORE: float = 0.3  # Questions matching no warm chunk this well search the whole video
+    PLAYBACK_CONTEXT_CACHE_SIZE: int = 8  # Assembled prompt contexts per connection
+
     # LLM Configuration
     LLM_PROVIDER: str = "huggingface"  # Options: google, huggingface, azure
     GEMINI_MODEL: str = "gemini-2.0-flash-lite"
@@ -29,7 +115,74 @@ class Settings(BaseSettings):
     TEMPERATURE: float = 0.7
     MAX_TOKENS: int = 4096
 
+    # Provider chain (JSON list, e.g. ["huggingface", "google"]), empty means [LLM_PROVIDER].
+    # A call that has not produced its first token within the LLM_HEDGE_PERCENTILE
+    # latency of its provider is hedged to the next provider; errors fail over to it
+    LLM_PROVIDERS: List[str] = []
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Calls of a provider and call site before hedging them
+    LLM_LATENCY_WINDOW: int = 200  # Recent first-token latencies kept per provider and call site
+    LLM_BREAKER_THRESHOLD: int = 5  # Consecutive failures before a provider is skipped
+    LLM_BREAKER_RESET_SEC: float = 30.0
+    LLM_MAX_WORKERS: int = 32  # Concurrent provider calls, hedges included
+
+    # Prompt context budgets (tokens of retrieved transcript per endpoint)
+    QA_CONTEXT_TOKEN_BUDGET: int = 1500
+    QUIZ_CONTEXT_TOKEN_BUDGET: int = 3000
+    NOTES_CONTEXT_TOKEN_BUDGET: int = 12000
+    WEAK_AREAS_CONTEXT_TOKEN_BUDGET: int = 2000
+
+    # Retrieved chunks per doubt for the per-session Weak Areas Review of the notes
+    NOTES_CHUNKS_PER_DOUBT: int = 2
+
+    # General quiz pool (generated once per video after ingestion)
+    QUIZ_POOL_SIZE: int = 20
+
+    # Retrieved chunks per doubt for personalized quizzes
+    QUIZ_CHUNKS_PER_DOUBT: int = 2
+
+    # Local short-answer grading (cosine similarity to the expected answer)
+    SHORT_ANSWER_ACCEPT_THRESHOLD: float = 0.85
+    SHORT_ANSWER_REJECT_THRESHOLD: float = 0.3
+
+    # Admission control for LLM-bound endpoints
+    ADMISSION_CONCURRENCY: Dict[str, int] = {
+        "questions": 8,
+        "quiz": 4,
+        "quiz_submit": 8,
+        "notes": 2
+    }
+    ADMISSION_QUEUE_SIZE: int = 32  # Waiting requests per endpoint before 503
+    ADMISSION_QUEUE_TIMEOUT_SEC: float = 15.0
+    ADMISSION_SESSION_IN_FLIGHT: int = 2  # Concurrent requests per session before 429
+    ADMISSION_RETRY_AFTER_SEC: int = 5
+
+    # Time budget per LLM-bound endpoint (retrieval, LLM calls and grading); past it,
+    # or once the client disconnects, upstream work stops and a partial result is returned
+    REQUEST_DEADLINE_SEC: Dict[str, float] = {
+        "questions": 30.0,
+        "quiz": 60.0,
+        "quiz_submit": 30.0,
+        "notes": 120.0
+    }
+    DEADLINE_POLL_SEC: float = 0.25  # How often a call waiting on the LLM checks its deadline
+
+    @field_validator("ADMISSION_CONCURRENCY", "REQUEST_DEADLINE_SEC")
+    @classmethod
+    def merge_endpoint_defaults(cls, value: Dict, info: ValidationInfo) -> Dict:
+        """Per-endpoint overrides only replace the endpoints they name"""
+        return {**cls.model_fields[info.field_name].default, **value}
+
     PORT: int = 8000
+    LOG_LEVEL: str = "INFO"
+    DEBUG: bool = False
+
+    # Request profiling (Server-Timing header + slow-request profiler reports)
+    PROFILE_HEADER: str = "X-Profile"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_SLOW_THRESHOLD_SEC: float = 5.0
+    PROFILE_DIR: str = "profiles"
 
     class Config:
         env_file = ".env"
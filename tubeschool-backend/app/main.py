@@ -1,12 +1,16 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from app.config import settings
 from app.routes import sessions
+from app.utils.deadline import RequestAborted
+from app.utils.metrics import REQUEST_ERRORS, REQUEST_LATENCY, render_metrics
+from app.utils.profiling import RequestProfile, should_profile
 import logging
 import time
 
-# Configure logging for debugging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=settings.LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -15,26 +19,74 @@ app = FastAPI(
     title="TubeSchool API",
     description="Transform YouTube videos into personalized learning experiences",
     version="1.0.0",
-    debug=True  # Enable debug mode
+    debug=settings.DEBUG
 )
 
 
-# Request logging middleware for debugging
+# Request metrics middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    logger.debug(f"Request: {request.method} {request.url}")
-    logger.debug(f"Headers: {request.headers}")
+    start_time = time.perf_counter()
 
     response = await call_next(request)
 
-    process_time = time.time() - start_time
-    logger.debug(f"Response status: {response.status_code}")
-    logger.debug(f"Process time: {process_time:.4f}s")
+    process_time = time.perf_counter() - start_time
+
+    # Label by route template (not the raw URL) to keep session IDs out of the metrics
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+
+    REQUEST_LATENCY.labels(method=request.method, endpoint=endpoint).observe(process_time)
+    if response.status_code >= 400:
+        REQUEST_ERRORS.labels(
+            method=request.method,
+            endpoint=endpoint,
+            status=str(response.status_code)
+        ).inc()
+
+    logger.info(f"{request.method} {endpoint} {response.status_code} {process_time:.3f}s")
 
     return response
 
 
+# Opt-in profiling: Server-Timing breakdown and slow-request profiler reports
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not should_profile(request.headers):
+        return await call_next(request)
+
+    profile = RequestProfile()
+    start_time = time.perf_counter()
+    profile.start()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        profile.stop()
+        raise
+
+    # Stages up to the response head; a streamed body is still being produced
+    response.headers["Server-Timing"] = profile.server_timing(time.perf_counter() - start_time)
+    body = response.body_iterator
+
+    async def profiled_body():
+        # The profile stays open until the whole body has been sent
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            profile.stop()
+            profile.save_report(request.method, request.url.path, time.perf_counter() - start_time)
+
+    response.body_iterator = profiled_body()
+    return response
+
+
+# Past the request deadline (504) or abandoned by the client (499)
+@app.exception_handler(RequestAborted)
+async def request_aborted(request: Request, exc: RequestAborted):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
 # CORS middleware for frontend integration
 app.add_middleware(
     CORSMiddleware,
@@ -42,12 +94,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 # Include routers
 app.include_router(sessions.router, prefix="/api/v1", tags=["sessions"])
 
 
+@app.on_event("startup")
+async def startup():
+    # Interval flush of the write-behind doubt buffer
+    sessions.vector_service.start_doubt_flusher()
+    # Build the index version of the current config in the background if it changed
+    sessions.reindex_service.start()
+    # Liveness heartbeat and periodic compaction of expired and orphaned doubts
+    sessions.retention_service.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    sessions.reindex_service.stop()
+    sessions.retention_service.stop()
+    # Flush buffered doubts and release pooled Qdrant connections
+    await sessions.vector_service.aclose()
+
+
 @app.get("/")
 async def root():
     return {
@@ -59,4 +130,10 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Session Models
 class SessionCreate(BaseModel):
@@ -52,6 +52,8 @@ class QuizResult(BaseModel):
     correct_answers: int
     feedback: List[Dict[str, Any]]
     weak_concepts: Optional[List[str]] = None
+    grading_stats: Optional[Dict[str, Any]] = None  # How many short answers were graded without the LLM
+    pending_answers: int = 0  # Short answers left ungraded at the deadline (is_correct is None)
 
 # Internal Models for Vector Store
 class VideoChunk(BaseModel):
@@ -69,9 +71,10 @@ class UserDoubt(BaseModel):
     answer: str
     timestamp_sec: Optional[int] = None
     topic: Optional[str] = None
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class NotesResponse(BaseModel):
     session_id: str
     video_id: str
-    note_content: str
\ No newline at end of file
+    note_content: str
+    partial: bool = False  # Weak Areas Review left out to meet the deadline
\ No newline at end of file
@@ -1,4 +1,7 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from app.models.schemas import (
     SessionCreate, SessionResponse,
     QuestionRequest, QuestionResponse,
@@ -10,29 +13,135 @@ from app.services.transcript_service import TranscriptService
 from app.services.vector_service import VectorService
 from app.services.qa_service import QAService
 from app.services.quiz_service import QuizService
+from app.services.topic_service import TopicService
+from app.services.reindex_service import ReindexService
+from app.services.retention_service import RetentionService
+from app.services.playback_service import PlaybackContext
+from app.services.llm_service import get_llm_service
 from app.config import settings  # <--- Added this missing import
+from app.utils.metrics import record_cache
+from app.utils.admission import admission, hold
+from app.utils.deadline import (
+    DeadlineExceeded, RequestAborted, bounded, detached, request_deadline, start_deadline, watch_disconnect
+)
+from app.utils.resilience import CircuitOpenError
+from pydantic import ValidationError
+from typing import Callable, Optional
+import asyncio
 import uuid
+import json
+import logging
+import threading
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # Initialize services
 transcript_service = TranscriptService()
 vector_service = VectorService()
 qa_service = QAService()
-quiz_service = QuizService()
+quiz_service = QuizService(vector_service)
 note_service = NoteService()
+topic_service = TopicService(vector_service)
+reindex_service = ReindexService(vector_service, transcript_service)
+retention_service = RetentionService(vector_service)
 
 # In-memory session storage (for MVP - use DB in production)
 sessions_store = {}
 
+# Per-video background builds in progress, keyed by (kind, video_id)
+video_builds = set()
+video_builds_lock = threading.Lock()
+
+
+def claim_video_build(kind: str, video_id: str) -> bool:
+    """Make sure only one background build of a kind runs per video"""
+    with video_builds_lock:
+        if (kind, video_id) in video_builds:
+            return False
+        video_builds.add((kind, video_id))
+        return True
+
+
+def release_video_build(kind: str, video_id: str):
+    with video_builds_lock:
+        video_builds.discard((kind, video_id))
+
+
+@detached
+def build_video_topics(video_id: str):
+    """Background task: derive and persist the topic vocabulary of a video once"""
+    if not claim_video_build("topics", video_id):
+        return
+
+    try:
+        if topic_service.get_vocabulary(video_id) is None:
+            topic_service.build_vocabulary(video_id)
+    except Exception as e:
+        logger.error(f"Topic vocabulary build failed for {video_id}: {e}")
+    finally:
+        release_video_build("topics", video_id)
+
+
+@detached
+def build_quiz_pool(video_id: str):
+    """Background task: generate the general quiz pool of a video, or top it up to QUIZ_POOL_SIZE"""
+    if not claim_video_build("quiz_pool", video_id):
+        return
+
+    try:
+        pool = vector_service.get_quiz_pool(video_id)
+        missing = settings.QUIZ_POOL_SIZE - len(pool)
+        if missing <= 0:
+            return
+
+        video_chunks = vector_service.get_all_video_chunks(video_id)
+        if not video_chunks:
+            return
+
+        # The model may repeat pooled questions, keep only new ones
+        known = {q['question_text'].strip().lower() for q in pool}
+        questions = [
+            q for q in quiz_service.generate_question_pool(video_chunks, missing)
+            if q['question_text'].strip().lower() not in known
+        ][:missing]
+        # Slots after the existing questions: concurrent builds overwrite each other instead of piling up
+        vector_service.store_quiz_pool(video_id, questions, first_slot=len(pool))
+        logger.info(f"Quiz pool for {video_id}: {len(pool) + len(questions)} questions")
+    except Exception as e:
+        logger.error(f"Quiz pool generation failed for {video_id}: {e}")
+    finally:
+        release_video_build("quiz_pool", video_id)
+
+
+@detached
+def build_video_notes(video_id: str):
+    """Background task: generate and persist the video-level study notes once"""
+    if not claim_video_build("notes", video_id):
+        return
+
+    try:
+        if vector_service.get_video_notes(video_id) is not None:
+            return
+
+        video_chunks = vector_service.get_all_video_chunks(video_id)
+        if video_chunks:
+            vector_service.store_video_notes(video_id, note_service.generate_video_notes(video_chunks))
+    except Exception as e:
+        logger.error(f"Video notes generation failed for {video_id}: {e}")
+    finally:
+        release_video_build("notes", video_id)
+
 
 @router.post("/sessions", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
-async def create_session(session_data: SessionCreate):
+async def create_session(session_data: SessionCreate, background_tasks: BackgroundTasks):
     """
     Start a new learning session with a YouTube video
     - Extracts video ID
     - Fetches and indexes transcript if not already done
+    - Builds the topic vocabulary, general quiz pool and video-level notes in the background
     - Returns session_id for subsequent requests
     """
     try:
@@ -48,12 +157,23 @@ async def create_session(session_data: SessionCreate):
         session_id = str(uuid.uuid4())
 
         # Check if transcript already indexed
-        transcript_loaded = vector_service.check_video_exists(video_id)
+        transcript_loaded = await vector_service.acheck_video_exists(video_id)
 
         if not transcript_loaded:
             # Fetch transcript
             try:
-                transcript = transcript_service.fetch_transcript(video_id)
+                transcript = await run_in_threadpool(transcript_service.fetch_transcript, video_id)
+            except CircuitOpenError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Transcript service is temporarily unavailable: {str(e)}",
+                    headers={"Retry-After": str(int(e.retry_after))}
+                )
+            except TimeoutError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail=f"Timed out fetching transcript: {str(e)}"
+                )
             except Exception as e:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -64,15 +184,22 @@ async def create_session(session_data: SessionCreate):
             chunks = transcript_service.chunk_transcript(transcript)
 
             # Store in vector DB
-            vector_service.store_video_chunks(video_id, chunks)
+            await vector_service.astore_video_chunks(video_id, chunks)
 
             # Calculate duration
             duration = transcript_service.get_video_duration(transcript)
             transcript_loaded = True
+
+            # Keep the raw transcript so config changes can re-chunk without refetching
+            background_tasks.add_task(vector_service.store_transcript, video_id, transcript)
+            background_tasks.add_task(build_video_topics, video_id)
+            background_tasks.add_task(build_quiz_pool, video_id)
+            background_tasks.add_task(build_video_notes, video_id)
         else:
             duration = None
 
-        # Store session
+        # Store session (new sessions start with an empty, authoritative doubt index)
+        vector_service.doubt_index.start_session(session_id)
         sessions_store[session_id] = {
             "session_id": session_id,
             "video_id": video_id,
@@ -97,8 +224,96 @@ async def create_session(session_data: SessionCreate):
         )
 
 
-@router.post("/sessions/{session_id}/questions", response_model=QuestionResponse)
-async def ask_question(session_id: str, question_data: QuestionRequest):
+def question_top_k() -> int:
+    """Chunks a question is answered from (with reranking, a couple of rescored chunks are enough)"""
+    return settings.RERANK_TOP_K if vector_service.reranker is not None else 3
+
+
+async def answer_question(
+        session_id: str,
+        question_data: QuestionRequest,
+        schedule: Callable,
+        playback: Optional[PlaybackContext] = None
+) -> QuestionResponse:
+    """
+    Retrieve context for a question, answer it, label its topic and store the doubt.
+    With a playback context, the warm window around the playback position is
+    matched first and Qdrant is only searched when it doesn't cover the question.
+    `schedule(fn, *args)` runs follow-up work after the answer.
+    """
+    video_id = sessions_store[session_id]['video_id']
+
+    # Embed the question once: used for retrieval and again when storing the doubt
+    query_vector = await bounded(vector_service.aencode_query(question_data.question))
+
+    context_chunks, segments = None, None
+    if playback is not None:
+        reranker = vector_service.reranker
+        context_chunks = playback.search(query_vector, settings.RERANK_CANDIDATES if reranker is not None else None)
+        if context_chunks and reranker is not None:
+            context_chunks = await run_in_threadpool(reranker.rerank, question_data.question, context_chunks, question_top_k())
+        if context_chunks:
+            segments = await run_in_threadpool(playback.assembled, context_chunks)
+
+    if not context_chunks:
+        # Search for relevant chunks
+        context_chunks = await bounded(vector_service.asearch_video_chunks(
+            video_id=video_id,
+            query=question_data.question,
+            top_k=question_top_k(),
+            query_vector=query_vector,
+            rerank=True
+        ))
+
+    if not context_chunks:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No relevant content found in video"
+        )
+
+    # Generate answer (blocking LLM calls run in the threadpool, off the event loop)
+    answer = await run_in_threadpool(
+        qa_service.generate_answer,
+        question=question_data.question,
+        context_chunks=context_chunks,
+        segments=segments
+    )
+
+    # Assign topic locally (nearest topic centroid of the video)
+    try:
+        topic = await run_in_threadpool(topic_service.assign_topic, video_id, query_vector)
+    except LookupError:
+        # No vocabulary yet (video indexed before topics existed): LLM fallback, build it for next time
+        schedule(build_video_topics, video_id)
+        topic = await run_in_threadpool(qa_service.extract_topic, question_data.question, answer)
+
+    # Store doubt
+    doubt = UserDoubt(
+        session_id=session_id,
+        video_id=video_id,
+        question=question_data.question,
+        answer=answer,
+        timestamp_sec=question_data.timestamp_sec,
+        topic=topic
+    )
+    await vector_service.astore_user_doubt(doubt, vector=query_vector)
+
+    # Return answer with most relevant timestamp
+    relevant_timestamp = int(context_chunks[0]['start_time_sec']) if context_chunks else None
+
+    return QuestionResponse(
+        answer=answer,
+        relevant_timestamp=relevant_timestamp,
+        confidence=context_chunks[0]['score'] if context_chunks else None
+    )
+
+
+@router.post(
+    "/sessions/{session_id}/questions",
+    response_model=QuestionResponse,
+    dependencies=[Depends(request_deadline("questions")), Depends(admission("questions"))]
+)
+async def ask_question(session_id: str, question_data: QuestionRequest, background_tasks: BackgroundTasks):
     """
     Ask a question about the video content
     - Retrieves relevant context from transcript
@@ -113,67 +328,178 @@ async def ask_question(session_id: str, question_data: QuestionRequest):
                 detail="Session not found"
             )
 
-        session = sessions_store[session_id]
-        video_id = session['video_id']
+        return await answer_question(session_id, question_data, background_tasks.add_task)
 
-        # Search for relevant chunks
-        context_chunks = vector_service.search_video_chunks(
-            video_id=video_id,
-            query=question_data.question,
-            top_k=3
+    except (HTTPException, RequestAborted):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to answer question: {str(e)}"
         )
 
-        if not context_chunks:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No relevant content found in video"
+
+@router.websocket("/sessions/{session_id}/playback")
+async def playback_channel(websocket: WebSocket, session_id: str):
+    """
+    Playback channel of a session, JSON messages both ways.
+    - {"type": "position", "position_sec": 93.5}: heartbeat (every few seconds while playing);
+      the chunks around the position are kept warm with their embeddings
+    - {"type": "question", "question": ..., "request_id": ..., "timestamp_sec": ...}: answered like
+      POST /questions, from the warm window when it covers the question; the timestamp
+      defaults to the last position
+    Replies are {"type": "answer", "request_id", "answer", "relevant_timestamp", "confidence"}
+    or {"type": "error", "request_id", "detail"} (plus "retry_after" when rejected by admission control).
+    """
+    if session_id not in sessions_store:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Session not found")
+        return
+
+    await websocket.accept()
+    playback = PlaybackContext(vector_service, sessions_store[session_id]['video_id'], question_top_k())
+    send_lock = asyncio.Lock()
+    pending_questions = set()
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    def schedule(fn, *args):
+        asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def handle_question(message: dict):
+        request_id = message.get("request_id")
+        # Each question runs in its own task, with its own deadline
+        deadline = start_deadline("questions")
+        try:
+            question_data = QuestionRequest(
+                question=message.get("question"),
+                timestamp_sec=message.get("timestamp_sec", int(playback.position) if playback.position is not None else None)
             )
+            async with await hold("questions", session_id):
+                response = await answer_question(session_id, question_data, schedule, playback=playback)
+            await send({"type": "answer", "request_id": request_id, **response.model_dump()})
+        except HTTPException as e:
+            error = {"type": "error", "request_id": request_id, "detail": e.detail}
+            if e.headers and "Retry-After" in e.headers:
+                error["retry_after"] = int(e.headers["Retry-After"])
+            await send(error)
+        except ValidationError as e:
+            await send({"type": "error", "request_id": request_id, "detail": f"Invalid question: {e.errors()[0]['msg']}"})
+        except Exception as e:
+            logger.error(f"Playback question failed for session {session_id}: {e}")
+            await send({"type": "error", "request_id": request_id, "detail": f"Failed to answer question: {str(e)}"})
+        finally:
+            # Stops the LLM call of a question cancelled by the disconnect
+            deadline.cancel()
 
-        # Generate answer
-        answer = qa_service.generate_answer(
-            question=question_data.question,
-            context_chunks=context_chunks
-        )
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                kind = message.get("type")
+                if kind == "position":
+                    playback.move(float(message["position_sec"]))
+                elif kind == "question":
+                    # Answered concurrently, so heartbeats keep flowing while the LLM runs
+                    task = asyncio.create_task(handle_question(message))
+                    pending_questions.add(task)
+                    task.add_done_callback(pending_questions.discard)
+                else:
+                    await send({"type": "error", "detail": f"Unknown message type: {kind}"})
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                await send({"type": "error", "detail": f"Invalid message: {str(e)}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        playback.close()
+        for task in pending_questions:
+            task.cancel()
+
+
+async def prepare_quiz(
+        session_id: str,
+        video_id: str,
+        num_questions: int,
+        background_tasks: BackgroundTasks
+) -> dict:
+    """
+    Inputs of a quiz: the session doubts and weak topics, plus either a quiz
+    sampled from the video's pool ('quiz_data') or the transcript context to
+    generate one from ('video_chunks')
+    """
+    # Get all doubts for this session
+    doubts = await vector_service.aget_session_doubts(session_id)
 
-        # Extract topic
-        topic = qa_service.extract_topic(question_data.question, answer)
+    # Logic: If no doubts -> General Quiz (10 MCQs from video)
+    #        If doubts    -> Personalized Quiz (Prioritize doubts + fill from video)
 
-        # Store doubt
-        doubt = UserDoubt(
-            session_id=session_id,
-            video_id=video_id,
-            question=question_data.question,
-            answer=answer,
-            timestamp_sec=question_data.timestamp_sec,
-            topic=topic
-        )
-        vector_service.store_user_doubt(doubt)
+    quiz_data = None
+    video_chunks = []
 
-        # Return answer with most relevant timestamp
-        relevant_timestamp = int(context_chunks[0]['start_time_sec']) if context_chunks else None
+    if not doubts:
+        # Case 1: No Doubts (General Quiz)
 
-        return QuestionResponse(
-            answer=answer,
-            relevant_timestamp=relevant_timestamp,
-            confidence=context_chunks[0]['score'] if context_chunks else None
-        )
+        # Serve from the pre-generated pool when it is large enough (quizzes longer
+        # than the pool get the whole pool)
+        pool = await vector_service.aget_quiz_pool(video_id)
+        served = len(pool) >= min(num_questions, settings.QUIZ_POOL_SIZE)
+        record_cache("quiz_pool", hit=served)
+        if len(pool) < settings.QUIZ_POOL_SIZE:
+            # Pool not ready, short (few valid questions generated) or predates pools
+            background_tasks.add_task(build_quiz_pool, video_id)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to answer question: {str(e)}"
-        )
+        if served:
+            quiz_data = quiz_service.sample_from_pool(pool, num_questions)
+        else:
+            # Context: Search for broad topics to get a summary view of the video
+            video_chunks = await vector_service.asearch_video_chunks(
+                video_id=video_id,
+                query="Summary of key concepts and main topics",
+                top_k=num_questions*2  # Get enough context for 10 questions
+            )
+    else:
+        # Case 2: Doubts Exist (Personalized Quiz)
 
+        # Context: Focus on the doubts (every doubt, one batched round trip)
+        doubt_questions = list(dict.fromkeys(doubt['question'] for doubt in doubts))
+        video_chunks = await vector_service.asearch_video_chunks_batch(
+            video_id=video_id,
+            queries=doubt_questions,
+            top_k_per_query=settings.QUIZ_CHUNKS_PER_DOUBT
+        )
 
-@router.get("/sessions/{session_id}/quiz", response_model=QuizResponse)
-async def generate_quiz(session_id: str, num_questions: int = 5):
+    return {
+        "doubts": doubts,
+        "quiz_data": quiz_data,
+        "video_chunks": video_chunks,
+        "weak_topics": await vector_service.aget_weak_topics(session_id) if doubts else None
+    }
+
+
+def question_for_response(question: dict) -> QuizQuestion:
+    """Quiz question without its correct answer"""
+    return QuizQuestion(
+        question_id=question['question_id'],
+        question_text=question['question_text'],
+        question_type=question['question_type'],
+        options=question.get('options'),
+        topic=question.get('topic')
+    )
+
+
+@router.get(
+    "/sessions/{session_id}/quiz",
+    response_model=QuizResponse,
+    dependencies=[Depends(request_deadline("quiz")), Depends(admission("quiz"))]
+)
+async def generate_quiz(session_id: str, background_tasks: BackgroundTasks, num_questions: int = 5):
     """
     Generate a personalized quiz based on user's doubts
     - Analyzes questions asked during the session
     - Identifies weak topics
     - Creates targeted quiz questions
+    - Serves general quizzes from the video's pre-generated pool
     """
     try:
         # Validate session
@@ -186,54 +512,24 @@ async def generate_quiz(session_id: str, num_questions: int = 5):
         session = sessions_store[session_id]
         video_id = session['video_id']
 
-        # Get all doubts for this session
-        doubts = vector_service.get_session_doubts(session_id)
-
-        # Logic: If no doubts -> General Quiz (10 MCQs from video)
-        #        If doubts    -> Personalized Quiz (Prioritize doubts + fill from video)
-
-        if not doubts:
-            # Case 1: No Doubts (General Quiz)
-
-
-            # Context: Search for broad topics to get a summary view of the video
-            video_chunks = vector_service.search_video_chunks(
-                video_id=video_id,
-                query="Summary of key concepts and main topics",
-                top_k=num_questions*2  # Get enough context for 10 questions
-            )
-        else:
-            # Case 2: Doubts Exist (Personalized Quiz)
-
-            # Context: Focus on the doubts
-            sample_chunk = doubts[0]
-            video_chunks = vector_service.search_video_chunks(
-                video_id=video_id,
-                query=sample_chunk['question'],
-                top_k=5
-            )
+        quiz_inputs = await bounded(prepare_quiz(session_id, video_id, num_questions, background_tasks))
+        quiz_data = quiz_inputs['quiz_data']
 
         # Generate quiz
-        quiz_data = quiz_service.generate_quiz(
-            doubts=doubts,
-            video_chunks=video_chunks,
-            num_questions=num_questions
-        )
+        if quiz_data is None:
+            quiz_data = await run_in_threadpool(
+                quiz_service.generate_quiz,
+                doubts=quiz_inputs['doubts'],
+                video_chunks=quiz_inputs['video_chunks'],
+                num_questions=num_questions,
+                weak_topics=quiz_inputs['weak_topics']
+            )
 
         # Store quiz questions in session for evaluation
         sessions_store[session_id]['quiz_questions'] = quiz_data['questions']
 
         # Remove correct answers from response
-        questions_for_response = [
-            QuizQuestion(
-                question_id=q['question_id'],
-                question_text=q['question_text'],
-                question_type=q['question_type'],
-                options=q.get('options'),
-                topic=q.get('topic')
-            )
-            for q in quiz_data['questions']
-        ]
+        questions_for_response = [question_for_response(q) for q in quiz_data['questions']]
 
         return QuizResponse(
             session_id=session_id,
@@ -243,7 +539,7 @@ async def generate_quiz(session_id: str, num_questions: int = 5):
             weak_topics=quiz_data.get('weak_topics', [])
         )
 
-    except HTTPException:
+    except (HTTPException, RequestAborted):
         raise
     except Exception as e:
         raise HTTPException(
@@ -252,13 +548,18 @@ async def generate_quiz(session_id: str, num_questions: int = 5):
         )
 
 
-@router.post("/sessions/{session_id}/quiz/submit", response_model=QuizResult)
+@router.post(
+    "/sessions/{session_id}/quiz/submit",
+    response_model=QuizResult,
+    dependencies=[Depends(request_deadline("quiz_submit")), Depends(admission("quiz_submit"))]
+)
 async def submit_quiz(session_id: str, submission: QuizSubmission):
     """
     Submit and evaluate quiz answers
     - Auto-grades MCQs
     - Uses LLM to evaluate short answers
     - Provides detailed feedback
+    - Short answers the LLM could not grade within the deadline are marked pending
     """
     try:
         # Validate session
@@ -280,14 +581,15 @@ async def submit_quiz(session_id: str, submission: QuizSubmission):
         questions = session['quiz_questions']
 
         # Evaluate quiz
-        result = quiz_service.evaluate_quiz(
+        result = await run_in_threadpool(
+            quiz_service.evaluate_quiz,
             questions=questions,
             answers=[ans.dict() for ans in submission.answers]
         )
 
         return QuizResult(**result)
 
-    except HTTPException:
+    except (HTTPException, RequestAborted):
         raise
     except Exception as e:
         raise HTTPException(
@@ -300,7 +602,8 @@ async def submit_quiz(session_id: str, submission: QuizSubmission):
 async def reset_vectorstore():
     """
     Reset all Qdrant collections (DELETE ALL DATA)
-    Use with caution - this will delete all transcripts and doubts
+    Use with caution - this will delete all transcripts and doubts.
+    Changing the embedding or chunking config does not need this, see /admin/index-status.
     """
     try:
         vector_service.reset_collections()
@@ -310,10 +613,7 @@ async def reset_vectorstore():
 
         return {
             "message": "Vector store reset successfully",
-            "collections_reset": [
-                settings.VIDEO_CHUNKS_COLLECTION,
-                settings.USER_DOUBTS_COLLECTION
-            ],
+            "collections_reset": list(vector_service.index.collections.values()) + vector_service.store_collections(),
             "sessions_cleared": True
         }
     except Exception as e:
@@ -323,14 +623,97 @@ async def reset_vectorstore():
         )
 
 
-@router.get("/sessions/{session_id}/notes", response_model=NotesResponse)
+@router.get("/admin/index-status", status_code=status.HTTP_200_OK)
+async def index_status():
+    """
+    Live and configured index versions, and progress of the background re-index
+    """
+    return reindex_service.status()
+
+
+@router.delete("/admin/index-versions/{version}", status_code=status.HTTP_200_OK)
+async def drop_index_version(version: str):
+    """
+    Delete the collections of a retired index version
+    """
+    try:
+        await run_in_threadpool(vector_service.drop_index_version, version)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    return {"message": f"Index version {version} dropped"}
+
+
+@router.get("/admin/llm-status", status_code=status.HTTP_200_OK)
+async def llm_status():
+    """
+    Hedge rate, hedge win rate and wins per provider of the LLM provider chain
+    """
+    return get_llm_service().stats()
+
+
+@router.get("/admin/videos/{video_id}/doubt-summary", status_code=status.HTTP_200_OK)
+async def doubt_summary(video_id: str):
+    """
+    Doubt and per-topic counts of a video, aggregated from compacted doubts
+    """
+    summary = await run_in_threadpool(vector_service.get_doubt_summary, video_id)
+    if summary is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No compacted doubts for this video")
+
+    return {**summary, "last_compaction": retention_service.last_compaction}
+
+
+async def prepare_notes(session_id: str, video_id: str) -> dict:
+    """
+    Inputs of the study notes: the persisted video-level notes (or, if they don't
+    exist yet, the transcript chunks to generate them from), plus the session
+    doubts and the chunks they retrieve for the Weak Areas Review
+    """
+    video_notes = await vector_service.aget_video_notes(video_id)
+    record_cache("video_notes", hit=video_notes is not None)
+
+    video_chunks = []
+    if video_notes is None:
+        video_chunks = await vector_service.aget_all_video_chunks(video_id)
+        if not video_chunks:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Video transcript not found"
+            )
+
+    doubts = await vector_service.aget_session_doubts(session_id)
+
+    doubt_chunks = []
+    if doubts:
+        doubt_chunks = await vector_service.asearch_video_chunks_batch(
+            video_id=video_id,
+            queries=list(dict.fromkeys(doubt['question'] for doubt in doubts)),
+            top_k_per_query=settings.NOTES_CHUNKS_PER_DOUBT
+        )
+
+    return {
+        "video_notes": video_notes,
+        "video_chunks": video_chunks,
+        "doubts": doubts,
+        "doubt_chunks": doubt_chunks
+    }
+
+
+@router.get(
+    "/sessions/{session_id}/notes",
+    response_model=NotesResponse,
+    dependencies=[Depends(request_deadline("notes")), Depends(admission("notes"))]
+)
 async def generate_notes(session_id: str):
     """
     Generate downloadable study notes for the session.
     Includes:
     - Executive Summary
     - Point-wise detailed key concepts
-    - Review of weak topics (doubts)
+    - Review of weak topics (doubts), left out (`partial`) if the deadline passes first
     """
     try:
         # Validate session
@@ -343,31 +726,210 @@ async def generate_notes(session_id: str):
         session = sessions_store[session_id]
         video_id = session['video_id']
 
-        # 1. Fetch all transcript chunks (Full Video Context)
-        video_chunks = vector_service.get_all_video_chunks(video_id)
-
-        if not video_chunks:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Video transcript not found"
-            )
-
-        # 2. Fetch user doubts for this session (Weak Areas)
-        doubts = vector_service.get_session_doubts(session_id)
-
-        # 3. Generate Notes using LLM
-        note_content = note_service.generate_notes(video_chunks, doubts)
+        notes_inputs = await bounded(prepare_notes(session_id, video_id))
+        partial = False
+
+        try:
+            # 1. Video-level sections (generated once per video, then reused)
+            video_notes = notes_inputs['video_notes']
+            if video_notes is None:
+                video_notes = await run_in_threadpool(note_service.generate_video_notes, notes_inputs['video_chunks'])
+                await run_in_threadpool(vector_service.store_video_notes, video_id, video_notes)
+
+            # 2. Weak Areas Review of this session, from its doubts only
+            weak_areas = ""
+            if notes_inputs['doubts']:
+                try:
+                    weak_areas = await run_in_threadpool(
+                        note_service.generate_weak_areas,
+                        notes_inputs['doubts'],
+                        notes_inputs['doubt_chunks']
+                    )
+                except DeadlineExceeded:
+                    # The video-level sections alone are still useful notes
+                    partial = True
+
+            note_content = note_service.assemble_notes(video_notes, weak_areas)
+        except RequestAborted:
+            raise
+        except Exception as e:
+            note_content = f"# Error\nCould not generate notes: {str(e)}"
 
         return NotesResponse(
             session_id=session_id,
             video_id=video_id,
-            note_content=note_content
+            note_content=note_content,
+            partial=partial
         )
 
-    except HTTPException:
+    except (HTTPException, RequestAborted):
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate notes: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/sessions/{session_id}/notes/stream")
+async def stream_notes(session_id: str, request: Request):
+    """
+    Stream study notes as Server-Sent Events while the model writes them.
+    - `delta` events carry Markdown fragments ({"text": ...}) in order
+    - a final `done` event carries the complete NotesResponse; if the deadline passes during
+      the Weak Areas Review, it carries the notes without it (`partial`)
+    - an `error` event ({"detail": ...}) ends the stream if generation fails
+    """
+    if session_id not in sessions_store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+
+    video_id = sessions_store[session_id]['video_id']
+    deadline = start_deadline("notes")
+
+    # Held until the stream ends, not just until this function returns
+    slot = await hold("notes", session_id)
+    watcher = watch_disconnect(request, deadline)
+    try:
+        notes_inputs = await bounded(prepare_notes(session_id, video_id))
+    except Exception:
+        watcher.cancel()
+        await slot.aclose()
+        raise
+
+    async def events():
+        parts = []
+        try:
+            # Persisted video-level sections are sent at once, otherwise streamed and persisted
+            video_notes = notes_inputs['video_notes']
+            if video_notes is not None:
+                parts.append(video_notes)
+                yield sse_event("delta", {"text": video_notes})
+            else:
+                video_parts = []
+                async for text in iterate_in_threadpool(note_service.stream_video_notes(notes_inputs['video_chunks'])):
+                    video_parts.append(text)
+                    yield sse_event("delta", {"text": text})
+                video_notes = "".join(video_parts)
+                parts.append(video_notes)
+                await run_in_threadpool(vector_service.store_video_notes, video_id, video_notes)
+
+            partial = False
+            if notes_inputs['doubts']:
+                weak_areas = note_service.stream_weak_areas(notes_inputs['doubts'], notes_inputs['doubt_chunks'])
+                separator_sent = False
+                try:
+                    async for text in iterate_in_threadpool(weak_areas):
+                        if not separator_sent:
+                            text = "\n\n" + text
+                            separator_sent = True
+                        parts.append(text)
+                        yield sse_event("delta", {"text": text})
+                except DeadlineExceeded:
+                    # Drop the unfinished review, the video-level sections are complete
+                    parts, partial = [video_notes], True
+
+            yield sse_event("done", NotesResponse(
+                session_id=session_id,
+                video_id=video_id,
+                note_content="".join(parts),
+                partial=partial
+            ).model_dump())
+        except Exception as e:
+            logger.error(f"Notes stream failed for session {session_id}: {e}")
+            yield sse_event("error", {"detail": f"Failed to generate notes: {str(e)}"})
+        finally:
+            # Stops the LLM calls still in flight (the stream may end because the client left)
+            watcher.cancel()
+            deadline.cancel()
+            await slot.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Releases the slot if the client disconnects before the stream starts (no-op otherwise)
+        background=BackgroundTask(slot.aclose)
+    )
+
+
+@router.get("/sessions/{session_id}/quiz/stream")
+async def stream_quiz(session_id: str, request: Request, background_tasks: BackgroundTasks, num_questions: int = 5):
+    """
+    Stream a quiz as Server-Sent Events, one question at a time.
+    - `question` events carry a QuizQuestion (without the answer) as soon as the model finishes it;
+      it is stored in the session right away, so answered questions can be submitted for grading
+    - a final `done` event carries {"session_id", "video_id", "total_questions", "weak_topics", "partial"};
+      `partial` quizzes were cut short by the deadline and have fewer questions
+    - an `error` event ({"detail": ...}) ends the stream if generation fails
+    """
+    if session_id not in sessions_store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+
+    video_id = sessions_store[session_id]['video_id']
+    deadline = start_deadline("quiz")
+
+    # Held until the stream ends, not just until this function returns
+    slot = await hold("quiz", session_id)
+    background_tasks.add_task(slot.aclose)  # Runs after the response, a no-op if already released
+    watcher = watch_disconnect(request, deadline)
+    try:
+        quiz_inputs = await bounded(prepare_quiz(session_id, video_id, num_questions, background_tasks))
+    except Exception:
+        watcher.cancel()
+        await slot.aclose()
+        raise
+
+    # Graded questions of the new quiz, filled as they stream
+    stored_questions = []
+    sessions_store[session_id]['quiz_questions'] = stored_questions
+
+    async def events():
+        try:
+            if quiz_inputs['quiz_data'] is not None:
+                questions = iter(quiz_inputs['quiz_data']['questions'])
+                weak_topics = quiz_inputs['quiz_data'].get('weak_topics', [])
+            else:
+                questions = quiz_service.stream_quiz(
+                    doubts=quiz_inputs['doubts'],
+                    video_chunks=quiz_inputs['video_chunks'],
+                    num_questions=num_questions,
+                    weak_topics=quiz_inputs['weak_topics']
+                )
+                weak_topics = quiz_inputs['weak_topics'] or []
+
+            async for question in iterate_in_threadpool(questions):
+                stored_questions.append(question)
+                yield sse_event("question", question_for_response(question).model_dump(exclude={"correct_answer"}))
+
+            yield sse_event("done", {
+                "session_id": session_id,
+                "video_id": video_id,
+                "total_questions": len(stored_questions),
+                "weak_topics": weak_topics,
+                "partial": len(stored_questions) < num_questions and deadline.expired
+            })
+        except Exception as e:
+            logger.error(f"Quiz stream failed for session {session_id}: {e}")
+            yield sse_event("error", {"detail": f"Failed to generate quiz: {str(e)}"})
+        finally:
+            # Stops the LLM call still in flight (the stream may end because the client left)
+            watcher.cancel()
+            deadline.cancel()
+            await slot.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,176 @@
+from typing import List, Dict
+from functools import lru_cache
+from app.config import settings
+from app.services.llm_service import provider_chain
+from app.utils.metrics import LLM_TOKENS
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# Shortest repeated text treated as chunk overlap
+MIN_OVERLAP_CHARS = 10
+
+
+class ContextService:
+    """
+    Shared context-assembly stage for every LLM prompt.
+    - Counts tokens for the configured model
+    - Drops the lowest scoring chunks until the context fits the budget
+    - Merges adjacent chunks and strips their duplicated CHUNK_OVERLAP text
+    """
+
+    def __init__(self):
+        self.tokenizer = self._load_tokenizer()
+
+    def _load_tokenizer(self):
+        """Load the tokenizer of the configured model when it is available locally"""
+        if provider_chain()[0] != "huggingface":
+            # Gemini/Azure tokenizers are remote-only, use the estimate instead
+            return None
+
+        try:
+            from transformers import AutoTokenizer
+            return AutoTokenizer.from_pretrained(
+                settings.HUGGINGFACE_MODEL,
+                token=settings.HUGGINGFACEHUB_API_TOKEN or None
+            )
+        except Exception as e:
+            logger.warning(f"Tokenizer for {settings.HUGGINGFACE_MODEL} unavailable, estimating token counts: {e}")
+            return None
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens of text for the configured model"""
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        # Roughly 4 characters per token for English text
+        return math.ceil(len(text) / 4)
+
+    def log_prompt(self, label: str, prompt: str) -> int:
+        """Log the token count of a prompt that is about to be sent to the LLM"""
+        tokens = self.count_tokens(prompt)
+        LLM_TOKENS.labels(service=label, kind="prompt").inc(tokens)
+        logger.info(f"[{label}] prompt tokens: {tokens}")
+        return tokens
+
+    def log_completion(self, label: str, response) -> int:
+        """Log the completion tokens of an LLM response (provider usage when reported)"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        tokens = usage.get("output_tokens") or self.count_tokens(response.content)
+        LLM_TOKENS.labels(service=label, kind="completion").inc(tokens)
+        logger.info(f"[{label}] completion tokens: {tokens}")
+        return tokens
+
+    @staticmethod
+    def _strip_overlap(previous: str, current: str) -> str:
+        """
+        Remove the start of `current` that repeats the end of `previous`.
+        The repeat must be at least MIN_OVERLAP_CHARS (or half of CHUNK_OVERLAP)
+        long and end on a word boundary, so chunks that merely end and start
+        with the same letters keep their text.
+        """
+        limit = min(len(previous), len(current), settings.CHUNK_OVERLAP)
+        minimum = max(min(MIN_OVERLAP_CHARS, settings.CHUNK_OVERLAP // 2), 1)
+        for size in range(limit, minimum - 1, -1):
+            if size < len(current) and not current[size].isspace():
+                continue
+            if previous.endswith(current[:size]):
+                return current[size:].lstrip()
+        return current
+
+    @staticmethod
+    def _dedupe(chunks: List[Dict]) -> List[Dict]:
+        """Keep one copy of each chunk_index, preferring the highest score"""
+        unique = {}
+        ordered = []
+        for chunk in chunks:
+            key = chunk.get('chunk_index')
+            if key is None:
+                ordered.append(chunk)
+                continue
+            existing = unique.get(key)
+            if existing is None:
+                unique[key] = chunk
+                ordered.append(chunk)
+            elif (chunk.get('score') or 0) > (existing.get('score') or 0):
+                ordered[ordered.index(existing)] = chunk
+                unique[key] = chunk
+        return ordered
+
+    def _select(self, chunks: List[Dict], budget_tokens: int) -> List[Dict]:
+        """Pick the chunks that fit in the budget"""
+        sizes = [self.count_tokens(chunk['text']) for chunk in chunks]
+        if sum(sizes) <= budget_tokens:
+            return chunks
+
+        if all(chunk.get('score') is None for chunk in chunks):
+            # Unscored (full transcript): keep an evenly spaced subset so the
+            # whole video stays represented instead of only its beginning
+            keep = max(1, int(len(chunks) * budget_tokens / sum(sizes)))
+            step = len(chunks) / keep
+            candidates = [int(i * step) for i in range(keep)]
+        else:
+            candidates = sorted(
+                range(len(chunks)),
+                key=lambda i: chunks[i].get('score') or 0,
+                reverse=True
+            )
+
+        selected = []
+        used = 0
+        for i in candidates:
+            if used + sizes[i] > budget_tokens:
+                continue
+            selected.append(i)
+            used += sizes[i]
+
+        return [chunks[i] for i in sorted(selected)]
+
+    def assemble(self, chunks: List[Dict], budget_tokens: int, label: str) -> List[Dict]:
+        """
+        Build the prompt context from retrieved chunks.
+
+        :param chunks: Chunks with text, start/end times and optionally chunk_index and score
+        :param budget_tokens: Maximum number of context tokens for this endpoint
+        :param label: Endpoint name used in the token log
+        :return: Merged segments in video order (text, start_time_sec, end_time_sec, score)
+        """
+        candidates = self._dedupe(chunks)
+        selected = self._select(candidates, budget_tokens)
+        selected = sorted(
+            selected,
+            key=lambda c: (c.get('chunk_index') is None, c.get('chunk_index') or 0, c['start_time_sec'])
+        )
+
+        segments = []
+        previous_index = None
+        for chunk in selected:
+            index = chunk.get('chunk_index')
+            if segments and index is not None and previous_index is not None and index == previous_index + 1:
+                segment = segments[-1]
+                segment['text'] = f"{segment['text']} {self._strip_overlap(segment['text'], chunk['text'])}".strip()
+                segment['end_time_sec'] = chunk['end_time_sec']
+                scores = [s for s in (segment['score'], chunk.get('score')) if s is not None]
+                segment['score'] = max(scores) if scores else None
+            else:
+                segments.append({
+                    "text": chunk['text'],
+                    "start_time_sec": chunk['start_time_sec'],
+                    "end_time_sec": chunk['end_time_sec'],
+                    "score": chunk.get('score')
+                })
+            previous_index = index
+
+        tokens = sum(self.count_tokens(segment['text']) for segment in segments)
+        logger.info(
+            f"[{label}] context: {len(chunks)} chunks -> {len(selected)} kept, "
+            f"{len(segments)} segments, {tokens}/{budget_tokens} tokens"
+        )
+        return segments
+
+
+@lru_cache()
+def get_context_service() -> ContextService:
+    return ContextService()
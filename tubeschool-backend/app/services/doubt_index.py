@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import itertools
+import threading
+
+
+class SessionDoubts:
+    """Doubts of one session with running per-topic counts and recency"""
+
+    def __init__(self):
+        self.doubts: List[Dict] = []
+        self.topic_counts: Dict[str, int] = {}
+        self.topic_last_seen: Dict[str, int] = {}
+        self.topic_labels: Dict[str, str] = {}
+
+    def add(self, doubt: Dict, sequence: int):
+        self.doubts.append(doubt)
+
+        label = (doubt.get('topic') or "").strip()
+        if not label:
+            return
+
+        # Case-insensitive aggregation, first spelling wins as the display label
+        key = label.lower()
+        self.topic_labels.setdefault(key, label)
+        self.topic_counts[key] = self.topic_counts.get(key, 0) + 1
+        self.topic_last_seen[key] = sequence
+
+
+class SessionDoubtIndex:
+    """
+    In-process index of session doubts, updated when a doubt is recorded.
+
+    A session is only served from the index once it is complete: either it was
+    registered at creation (no doubts can exist elsewhere) or warmed from Qdrant.
+    Least recently used sessions are evicted past `max_sessions`; they become
+    cold again and are re-warmed from Qdrant on their next read.
+    """
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionDoubts]" = OrderedDict()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _put(self, session_id: str, entry: SessionDoubts):
+        self._sessions[session_id] = entry
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def start_session(self, session_id: str):
+        """Register a brand new session (known to have no doubts yet)"""
+        with self._lock:
+            if session_id not in self._sessions:
+                self._put(session_id, SessionDoubts())
+
+    def warm(self, session_id: str, doubts: List[Dict]):
+        """Load a cold session from the full list of its stored doubts"""
+        entry = SessionDoubts()
+        for doubt in sorted(doubts, key=lambda d: d.get('created_at') or ""):
+            entry.add(doubt, next(self._sequence))
+        with self._lock:
+            self._put(session_id, entry)
+
+    def record(self, doubt: Dict):
+        """Add a new doubt to its session (ignored for cold sessions, they re-warm on read)"""
+        with self._lock:
+            entry = self._sessions.get(doubt['session_id'])
+            if entry is not None:
+                entry.add(doubt, next(self._sequence))
+
+    def get_doubts(self, session_id: str) -> Optional[List[Dict]]:
+        """Doubts of a session, or None if the session is cold"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return list(entry.doubts)
+
+    def get_weak_topics(self, session_id: str, limit: int) -> Optional[List[str]]:
+        """Most frequent doubt topics of a session (ties go to the most recent), None if cold"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            ranked = sorted(
+                entry.topic_counts,
+                key=lambda key: (entry.topic_counts[key], entry.topic_last_seen[key]),
+                reverse=True
+            )
+            return [entry.topic_labels[key] for key in ranked[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
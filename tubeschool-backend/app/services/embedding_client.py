@@ -0,0 +1,115 @@
+"""
+Client of the shared embedding process (see embedding_server.py).
+
+Kept apart from the server so workers using it don't import
+sentence_transformers (and torch) through this module.
+
+Wire format, both directions: 4-byte big-endian length + JSON header, then
+for successful encode responses 4-byte length + raw float32 matrix.
+"""
+from typing import Dict, Optional, Tuple
+from app.config import settings
+import json
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+_LENGTH = struct.Struct(">I")
+
+
+def _frame(data: bytes) -> bytes:
+    return _LENGTH.pack(len(data)) + data
+
+
+class RemoteEncoder:
+    """Drop-in for the parts of SentenceTransformer the services use (`encode`, dimension)"""
+
+    def __init__(self, model_name: str, socket_path: str):
+        self.model_name = model_name
+        self.socket_path = socket_path
+        self._local = threading.local()  # One connection per thread
+        self._dimension = None
+
+    def _connect(self) -> socket.socket:
+        # The server may still be loading its model when workers start
+        deadline = time.monotonic() + settings.EMBEDDING_SERVER_TIMEOUT_SEC
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(settings.EMBEDDING_SERVER_TIMEOUT_SEC)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    @staticmethod
+    def _read_exactly(sock: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            part = sock.recv(size - len(data))
+            if not part:
+                raise ConnectionError("Embedding server closed the connection")
+            data.extend(part)
+        return bytes(data)
+
+    def _read_frame(self, sock: socket.socket) -> bytes:
+        (size,) = _LENGTH.unpack(self._read_exactly(sock, _LENGTH.size))
+        return self._read_exactly(sock, size)
+
+    def _disconnect(self, sock: Optional[socket.socket]):
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def _call(self, request: Dict) -> Tuple[Dict, Optional[bytes]]:
+        payload = _frame(json.dumps(request).encode())
+
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                sock.sendall(payload)
+                header = json.loads(self._read_frame(sock))
+                body = self._read_frame(sock) if header.get("ok") and "shape" in header else None
+                break
+            except ConnectionError:
+                # Stale connection (server restarted): reconnect once
+                self._disconnect(sock)
+                if attempt == 1:
+                    raise
+            except OSError:
+                # Timed out (or other socket error): the server is busy, not gone, and a late answer would
+                # desync the connection, so drop it without resending the batch
+                self._disconnect(sock)
+                raise
+
+        if not header.get("ok"):
+            raise RuntimeError(f"Embedding server error: {header.get('error')}")
+        return header, body
+
+    def encode(self, sentences, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        header, body = self._call({
+            "op": "encode",
+            "model": self.model_name,
+            "texts": texts,
+            "normalize": normalize_embeddings
+        })
+        vectors = np.frombuffer(body, dtype=np.float32).reshape(header["shape"])
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            header, _ = self._call({"op": "dimension", "model": self.model_name})
+            self._dimension = header["dimension"]
+        return self._dimension
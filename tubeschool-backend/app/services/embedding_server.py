@@ -0,0 +1,150 @@
+"""
+Shared embedding process for multi-worker deployments.
+
+Every gunicorn worker otherwise loads its own SentenceTransformer. With
+EMBEDDING_SERVER_SOCKET set, workers use RemoteEncoder (embedding_client.py)
+instead, which sends encode requests over a Unix socket to one process
+holding the model(s).
+Concurrent requests are batched dynamically: the server waits up to
+EMBEDDING_BATCH_WAIT_MS for more texts (at most EMBEDDING_BATCH_MAX_SIZE)
+before running one forward pass.
+
+Run it with `python -m app.services.embedding_server` (gunicorn.conf.py
+starts it automatically). The wire format is described in embedding_client.py.
+"""
+from sentence_transformers import SentenceTransformer
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.embedding_client import _LENGTH, _frame
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingServer:
+    """Holds the models and batches encode requests from all workers"""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.models: Dict[str, SentenceTransformer] = {}
+        self.queue: asyncio.Queue = None
+        self._models_lock = threading.Lock()
+
+    def _model(self, name: str) -> SentenceTransformer:
+        with self._models_lock:
+            if name not in self.models:
+                logger.info(f"Loading embedding model {name}")
+                self.models[name] = SentenceTransformer(name)
+            return self.models[name]
+
+    async def _collect_batch(self) -> List[Tuple]:
+        """First waiting request, plus whatever arrives within the batching window"""
+        batch = [await self.queue.get()]
+        size = len(batch[0][2])
+        deadline = time.monotonic() + settings.EMBEDDING_BATCH_WAIT_MS / 1000
+
+        while size < settings.EMBEDDING_BATCH_MAX_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[2])
+
+        return batch
+
+    async def _batcher(self):
+        while True:
+            batch = await self._collect_batch()
+
+            # One forward pass per (model, normalize) group
+            groups: Dict[Tuple[str, bool], List[Tuple]] = {}
+            for item in batch:
+                groups.setdefault((item[0], item[1]), []).append(item)
+
+            for (model_name, normalize), items in groups.items():
+                texts = [text for item in items for text in item[2]]
+                try:
+                    model = await asyncio.to_thread(self._model, model_name)
+                    vectors = await asyncio.to_thread(
+                        model.encode, texts, normalize_embeddings=normalize, convert_to_numpy=True
+                    )
+                except Exception as e:
+                    for item in items:
+                        if not item[3].done():
+                            item[3].set_exception(e)
+                    continue
+
+                logger.debug(f"Encoded batch of {len(texts)} texts from {len(items)} requests")
+                offset = 0
+                for item in items:
+                    count = len(item[2])
+                    if not item[3].done():
+                        item[3].set_result(np.asarray(vectors[offset:offset + count], dtype=np.float32))
+                    offset += count
+
+    async def _handle(self, request: Dict) -> Tuple[Dict, Optional[bytes]]:
+        if request.get("op") == "dimension":
+            model = await asyncio.to_thread(self._model, request["model"])
+            return {"ok": True, "dimension": model.get_sentence_embedding_dimension()}, None
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request["model"], bool(request.get("normalize")), request["texts"], future))
+        vectors = await future
+        return {"ok": True, "shape": list(vectors.shape)}, vectors.tobytes()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                    request = json.loads(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    return  # Worker closed the connection
+
+                try:
+                    header, body = await self._handle(request)
+                except Exception as e:
+                    logger.error(f"Embedding request failed: {e}")
+                    header, body = {"ok": False, "error": str(e)}, None
+
+                writer.write(_frame(json.dumps(header).encode()))
+                if body is not None:
+                    writer.write(_frame(body))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.queue = asyncio.Queue()
+        self._model(settings.EMBEDDING_MODEL)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._serve_connection, path=self.socket_path)
+        batcher = asyncio.create_task(self._batcher())
+        logger.info(f"Embedding server listening on {self.socket_path}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    if not settings.EMBEDDING_SERVER_SOCKET:
+        raise SystemExit("Set EMBEDDING_SERVER_SOCKET to run the embedding server")
+    asyncio.run(EmbeddingServer(settings.EMBEDDING_SERVER_SOCKET).serve())
@@ -0,0 +1,305 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+from langchain_core.messages import AIMessage
+from app.config import settings
+from app.utils.deadline import Deadline, current_deadline
+from app.utils.metrics import LLM_CALLS, LLM_FAILOVERS, LLM_HEDGES, LLM_WINS
+from app.utils.resilience import CircuitBreaker, CircuitOpenError
+import logging
+import queue
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def provider_chain() -> List[str]:
+    """Configured LLM providers in priority order"""
+    return list(settings.LLM_PROVIDERS) or [settings.LLM_PROVIDER]
+
+
+def build_chat_model(provider: str):
+    """LangChain chat model of a provider"""
+    if provider == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            google_api_key=settings.GOOGLE_API_KEY,
+            model=settings.GEMINI_MODEL,
+            temperature=settings.TEMPERATURE,
+            max_output_tokens=settings.MAX_TOKENS,
+            convert_system_message_to_human=True
+        )
+    if provider == "huggingface":
+        from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+        llm = HuggingFaceEndpoint(
+            repo_id=settings.HUGGINGFACE_MODEL,
+            huggingfacehub_api_token=settings.HUGGINGFACEHUB_API_TOKEN,
+            temperature=settings.TEMPERATURE,
+            max_new_tokens=settings.MAX_TOKENS
+        )
+        return ChatHuggingFace(llm=llm)
+    if provider == "azure":
+        # Optional dependency: pip install langchain-openai
+        from langchain_openai import AzureChatOpenAI
+        return AzureChatOpenAI(
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT,
+            api_version=settings.AZURE_OPENAI_API_VERSION,
+            temperature=settings.TEMPERATURE,
+            max_tokens=settings.MAX_TOKENS
+        )
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+class _Attempt:
+    """One provider call of an LLM request"""
+
+    def __init__(self, provider: str, kind: str, deadline: Optional[Deadline] = None):
+        self.provider = provider
+        self.kind = kind  # primary, hedge or failover
+        self.deadline = deadline
+        self.started = time.perf_counter()
+        self.cancelled = threading.Event()
+        self.finished = False
+
+    @property
+    def stopped(self) -> bool:
+        """Lost the race, or its request is over (also when nobody consumes the stream anymore)"""
+        if self.cancelled.is_set():
+            return True
+        return self.deadline is not None and (self.deadline.cancelled or self.deadline.expired)
+
+
+class LLMService:
+    """
+    Chat model facade over an ordered provider chain (LLM_PROVIDERS).
+
+    Each call streams from the first provider whose circuit breaker is closed.
+    If no token arrives within the LLM_HEDGE_PERCENTILE first-token latency of
+    that provider and call site, the same prompt is sent to the next provider
+    as a hedge: the first attempt to produce a token wins and the other one is
+    cancelled. An attempt failing before its first token fails over to the
+    next provider; once tokens have been returned, errors are raised.
+
+    Calls made for a request stop at its deadline or when its client
+    disconnects (app.utils.deadline), cancelling every attempt in flight.
+
+    Cancelled attempts stop at their next token, a provider call blocked on
+    the network keeps its worker until it returns (LLM_MAX_WORKERS bounds them).
+    """
+
+    def __init__(self, providers: Optional[List[str]] = None, models: Optional[Dict] = None):
+        """
+        :param providers: Provider chain (default: provider_chain())
+        :param models: Provider -> chat model, to inject stand-ins (default: build_chat_model)
+        """
+        self.providers = providers or provider_chain()
+        self.models = models or {provider: build_chat_model(provider) for provider in self.providers}
+        self.breakers = {
+            provider: CircuitBreaker(
+                f"llm:{provider}",
+                failure_threshold=settings.LLM_BREAKER_THRESHOLD,
+                reset_timeout=settings.LLM_BREAKER_RESET_SEC
+            )
+            for provider in self.providers
+        }
+        self.executor = ThreadPoolExecutor(max_workers=settings.LLM_MAX_WORKERS, thread_name_prefix="llm")
+
+        # (provider, label) -> recent first-token latencies in seconds
+        self._latencies: Dict[tuple, deque] = {}
+        self._counts: Dict[str, int] = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+        self._wins: Dict[str, int] = {provider: 0 for provider in self.providers}
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, provider: str, label: str) -> Optional[float]:
+        """Seconds without a token before hedging a call, None until enough calls were seen"""
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        with self._lock:
+            samples = list(self._latencies.get((provider, label), ()))
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(samples, settings.LLM_HEDGE_PERCENTILE))
+
+    def _observe(self, provider: str, label: str, seconds: float):
+        with self._lock:
+            latencies = self._latencies.setdefault((provider, label), deque(maxlen=settings.LLM_LATENCY_WINDOW))
+            latencies.append(seconds)
+
+    def _run(self, model, prompt, attempt: _Attempt, events: queue.Queue):
+        """Stream one attempt into `events` as (attempt, kind, payload) until done or cancelled"""
+        breaker = self.breakers[attempt.provider]
+        first = True
+        try:
+            chunks = model.stream(prompt)
+            try:
+                for chunk in chunks:
+                    if attempt.stopped:
+                        break
+                    if first:
+                        breaker.record_success()
+                        first = False
+                    events.put((attempt, "chunk", chunk))
+            finally:
+                # Closing the stream releases the provider connection
+                if hasattr(chunks, "close"):
+                    chunks.close()
+        except Exception as e:
+            if attempt.stopped:
+                breaker.abandon_trial()
+            else:
+                breaker.record_failure()
+            events.put((attempt, "error", e))
+            return
+
+        if first and attempt.stopped:
+            breaker.abandon_trial()
+        elif first:
+            breaker.record_success()
+        events.put((attempt, "done", None))
+
+    def stream(self, prompt, label: str = "llm") -> Iterator:
+        """Stream message chunks of the first provider to answer (see the class docstring)"""
+        events = queue.Queue()
+        remaining = list(self.providers)
+        attempts: List[_Attempt] = []
+        last_error: Optional[BaseException] = None
+        deadline = current_deadline()
+
+        def launch(kind: str) -> Optional[_Attempt]:
+            nonlocal last_error
+            while remaining:
+                provider = remaining.pop(0)
+                try:
+                    self.breakers[provider].before_call()
+                except CircuitOpenError as e:
+                    last_error = e
+                    LLM_FAILOVERS.labels(provider=provider).inc()
+                    continue
+                attempt = _Attempt(provider, kind, deadline)
+                attempts.append(attempt)
+                self.executor.submit(self._run, self.models[provider], prompt, attempt, events)
+                return attempt
+            return None
+
+        if deadline is not None:
+            deadline.check()
+
+        LLM_CALLS.labels(service=label).inc()
+        with self._lock:
+            self._counts["calls"] += 1
+
+        primary = launch("primary")
+        if primary is None:
+            raise last_error
+        hedge_delay = self.hedge_delay(primary.provider, label)
+        winner: Optional[_Attempt] = None
+
+        try:
+            while True:
+                hedge_in = None
+                if winner is None and hedge_delay is not None and remaining and len(attempts) == 1:
+                    hedge_in = max(hedge_delay - (time.perf_counter() - primary.started), 0)
+                timeout = hedge_in
+                if deadline is not None:
+                    # Wake up regularly, the request may be cancelled while no token arrives
+                    timeout = settings.DEADLINE_POLL_SEC if hedge_in is None else min(hedge_in, settings.DEADLINE_POLL_SEC)
+
+                try:
+                    attempt, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    if deadline is not None:
+                        deadline.check()
+                    if hedge_in is not None and time.perf_counter() - primary.started >= hedge_delay:
+                        # Slow first token: race the next provider
+                        if launch("hedge") is not None:
+                            LLM_HEDGES.labels(service=label).inc()
+                            with self._lock:
+                                self._counts["hedged"] += 1
+                    continue
+
+                if deadline is not None:
+                    deadline.check()
+
+                if winner is not None:
+                    if attempt is not winner:
+                        continue
+                    if kind == "error":
+                        raise payload
+                    if kind == "done":
+                        return
+                    yield payload
+                    continue
+
+                if kind == "error":
+                    attempt.finished = True
+                    last_error = payload
+                    LLM_FAILOVERS.labels(provider=attempt.provider).inc()
+                    logger.warning(f"[{label}] {attempt.provider} failed: {payload}")
+                    with self._lock:
+                        self._counts["failovers"] += 1
+                    if any(not a.finished for a in attempts) or launch("failover") is not None:
+                        continue
+                    raise last_error
+
+                # First token (or an empty answer): this attempt wins, cancel the others
+                winner = attempt
+                self._observe(attempt.provider, label, time.perf_counter() - attempt.started)
+                for other in attempts:
+                    if other is not winner and not other.finished:
+                        other.cancelled.set()
+                        # Lower bound of the loser's latency, keeps its percentile honest
+                        self._observe(other.provider, label, time.perf_counter() - other.started)
+
+                LLM_WINS.labels(service=label, provider=attempt.provider, attempt=attempt.kind).inc()
+                with self._lock:
+                    self._wins[attempt.provider] += 1
+                    if attempt.kind == "hedge":
+                        self._counts["hedge_wins"] += 1
+
+                if kind == "done":
+                    return
+                yield payload
+        finally:
+            # Also reached when the caller stops consuming early or the deadline passes
+            for attempt in attempts:
+                attempt.cancelled.set()
+
+    def invoke(self, prompt, label: str = "llm"):
+        """Complete message of the first provider to answer"""
+        response = None
+        for chunk in self.stream(prompt, label=label):
+            response = chunk if response is None else response + chunk
+        return response if response is not None else AIMessage(content="")
+
+    def stats(self) -> Dict:
+        """Hedge rate, hedge win rate and per-provider wins since startup"""
+        with self._lock:
+            counts = dict(self._counts)
+            wins = dict(self._wins)
+            labels = sorted({label for _, label in self._latencies})
+
+        calls = counts["calls"]
+        return {
+            **counts,
+            "hedge_rate": counts["hedged"] / calls if calls else 0.0,
+            "hedge_win_rate": counts["hedge_wins"] / counts["hedged"] if counts["hedged"] else 0.0,
+            "providers": [
+                {
+                    "provider": provider,
+                    "wins": wins[provider],
+                    "circuit_open": self.breakers[provider].is_open,
+                    "hedge_delay_sec": {label: self.hedge_delay(provider, label) for label in labels}
+                }
+                for provider in self.providers
+            ]
+        }
+
+
+@lru_cache()
+def get_llm_service() -> LLMService:
+    return LLMService()
@@ -1,56 +1,71 @@
-from typing import List, Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEndpoint, ChatHuggingFace
+from typing import Iterator, List, Dict, Any
 from app.config import settings
+from app.services.context_service import get_context_service
+from app.services.llm_service import get_llm_service
+from app.utils.metrics import STAGE_LATENCY, track_stage
+import re
+import time
 
 
-class NoteService:
+class FenceStripper:
+    """
+    Removes a Markdown code fence wrapped around streamed LLM output, on the fly.
+    The opening fence line is dropped once seen, and a few trailing characters
+    that could be the start of the closing fence are held back until more text
+    (or the end of the stream) shows what they are.
+    """
+
+    _POSSIBLE_CLOSING_FENCE = re.compile(r"\s*`{0,3}\s*$")
+
     def __init__(self):
-        self.llm_provider = settings.LLM_PROVIDER
-
-        if self.llm_provider == "google":
-            self.model = ChatGoogleGenerativeAI(
-                google_api_key=settings.GOOGLE_API_KEY,
-                model=settings.GEMINI_MODEL,
-                temperature=settings.TEMPERATURE,
-                max_output_tokens=settings.MAX_TOKENS,
-                convert_system_message_to_human=True
-            )
-        elif self.llm_provider == "huggingface":
-            llm = HuggingFaceEndpoint(
-                repo_id=settings.HUGGINGFACE_MODEL,
-                huggingfacehub_api_token=settings.HUGGINGFACEHUB_API_TOKEN,
-                temperature=settings.TEMPERATURE,
-                max_new_tokens=settings.MAX_TOKENS
-            )
-            self.model = ChatHuggingFace(llm=llm)
-
-    def generate_notes(self, video_chunks: List[Dict], doubts: List[Dict]) -> str:
-        """
-        Generate comprehensive study notes including:
-        1. Full video summary (point-wise)
-        2. Specific review of weak areas (based on user doubts), ONLY if doubts exist.
-        """
+        self._head = ""
+        self._started = False
+        self._tail = ""
+
+    def feed(self, text: str) -> str:
+        if not self._started:
+            self._head += text
+            head = self._head.lstrip()
+            if len(head) < 3 and "```".startswith(head):
+                return ""  # Can't tell yet whether this is an opening fence
+            if head.startswith("```"):
+                if "\n" not in head:
+                    return ""  # Wait for the end of the fence line (```markdown)
+                head = head.split("\n", 1)[1].lstrip()
+            self._started = True
+            text = head
+
+        text = self._tail + text
+        cut = self._POSSIBLE_CLOSING_FENCE.search(text).start()
+        self._tail = text[cut:]
+        return text[:cut]
+
+    def finish(self) -> str:
+        if not self._started:
+            head = self._head.strip()
+            return "" if head.startswith("```") else head
+
+        tail = self._tail.strip()
+        return "" if tail == "```" else tail
 
-        # 1. Prepare full transcript text
-        transcript_text = "\n".join([chunk['text'] for chunk in video_chunks])
 
-        # 2. Prepare doubt context (Conditional)
-        weak_areas_instruction = ""
+class NoteService:
+    def __init__(self):
+        self.model = get_llm_service()
 
-        if doubts:
-            questions = [f"- {d['question']}" for d in doubts]
-            doubt_list = "\n".join(questions)
+        self.context_service = get_context_service()
 
-            weak_areas_instruction = f"""
-## 3. 💡 Weak Areas Review
-(Review the video content to address the following student doubts:
-{doubt_list}
-IMPORTANT: Only address doubts that are actually relevant to the provided video transcript. If a doubt is unrelated to the video, ignore it. If no doubts are relevant, omit this entire section.)
-"""
+    def _build_video_prompt(self, video_chunks: List[Dict]) -> str:
+        """Prompt for the sections shared by every student of the video"""
+        # Full transcript text (overlap removed, trimmed to the notes budget)
+        segments = self.context_service.assemble(
+            video_chunks,
+            budget_tokens=settings.NOTES_CONTEXT_TOKEN_BUDGET,
+            label="notes"
+        )
+        transcript_text = "\n".join([segment['text'] for segment in segments])
 
-        # 3. Construct Prompt
-        prompt = f"""You are an expert AI tutor creating study notes for a student.
+        return f"""You are an expert AI tutor creating study notes for a student.
 
 Based on the provided Video Transcript, create a set of high-quality study notes.
 
@@ -63,7 +78,6 @@ The notes must follow this exact Markdown structure:
 
 ## 2. 🔑 Key Concepts & Summary
 (A detailed, point-wise summary of the video content. Break down complex topics into bullet points.)
-{weak_areas_instruction}
 
 ---
 **Video Transcript:**
@@ -72,19 +86,98 @@ The notes must follow this exact Markdown structure:
 **Constraint:** Return ONLY the raw Markdown content. Do not wrap it in markdown code blocks (```markdown). Do not include any conversational text like "Here are your notes".
 """
 
-        try:
-            response = self.model.invoke(prompt)
-            content = response.content.strip()
+    def _build_weak_areas_prompt(self, doubts: List[Dict], doubt_chunks: List[Dict]) -> str:
+        """Prompt for the per-session section, from the doubts and the transcript parts they retrieved"""
+        segments = self.context_service.assemble(
+            doubt_chunks,
+            budget_tokens=settings.WEAK_AREAS_CONTEXT_TOKEN_BUDGET,
+            label="notes_weak_areas"
+        )
+        context_text = "\n".join([segment['text'] for segment in segments])
+        doubt_list = "\n".join([f"- {d['question']}" for d in doubts])
+
+        return f"""You are an expert AI tutor writing one section of a student's study notes.
+
+The student asked these questions (doubts) while watching a video lecture:
+{doubt_list}
+
+Relevant parts of the video transcript:
+<VideoContentContext>
+{context_text}
+</VideoContentContext>
+
+Write this exact Markdown section, reviewing the video content to address the doubts:
+
+## 3. 💡 Weak Areas Review
+
+IMPORTANT: Only address doubts that are actually relevant to the provided video transcript. If a doubt is unrelated to the video, ignore it. If no doubts are relevant, return an empty response.
+
+**Constraint:** Return ONLY the raw Markdown content. Do not wrap it in markdown code blocks (```markdown). Do not include any conversational text.
+"""
+
+    @staticmethod
+    def _strip_fences(content: str) -> str:
+        """Post-processing to ensure clean Markdown"""
+        content = content.strip()
+        if content.startswith("```markdown"):
+            content = content.split("```markdown")[1]
+        if content.startswith("```"):
+            content = content.split("```")[1]
+        if content.endswith("```"):
+            content = content.rsplit("```", 1)[0]
+        return content.strip()
+
+    def _generate(self, label: str, prompt: str) -> str:
+        self.context_service.log_prompt(label, prompt)
+        with track_stage(f"llm_{label}"):
+            response = self.model.invoke(prompt, label=label)
+        self.context_service.log_completion(label, response)
+        return self._strip_fences(response.content)
+
+    def _stream(self, label: str, prompt: str) -> Iterator[str]:
+        """Yield Markdown fragments while the model writes them (code fences stripped on the fly)"""
+        stripper = FenceStripper()
+        response = None
+
+        self.context_service.log_prompt(label, prompt)
+        with track_stage(f"llm_{label}"):
+            started = time.perf_counter()
+            for chunk in self.model.stream(prompt, label=label):
+                if response is None:
+                    STAGE_LATENCY.labels(stage=f"llm_{label}_first_chunk").observe(time.perf_counter() - started)
+                response = chunk if response is None else response + chunk
+
+                text = stripper.feed(chunk.content)
+                if text:
+                    yield text
+
+        if response is not None:
+            self.context_service.log_completion(label, response)
+
+        text = stripper.finish()
+        if text:
+            yield text
+
+    def generate_video_notes(self, video_chunks: List[Dict]) -> str:
+        """
+        Executive Summary and Key Concepts of a video.
+        The same for every session, so generated once per video and persisted.
+        """
+        return self._generate("notes", self._build_video_prompt(video_chunks))
+
+    def stream_video_notes(self, video_chunks: List[Dict]) -> Iterator[str]:
+        return self._stream("notes", self._build_video_prompt(video_chunks))
 
-            # Post-processing to ensure clean Markdown
-            if content.startswith("```markdown"):
-                content = content.split("```markdown")[1]
-            if content.startswith("```"):
-                content = content.split("```")[1]
-            if content.endswith("```"):
-                content = content.rsplit("```", 1)[0]
+    def generate_weak_areas(self, doubts: List[Dict], doubt_chunks: List[Dict]) -> str:
+        """Weak Areas Review of a session (empty if no doubt is relevant to the video)"""
+        return self._generate("notes_weak_areas", self._build_weak_areas_prompt(doubts, doubt_chunks))
 
-            return content.strip()
+    def stream_weak_areas(self, doubts: List[Dict], doubt_chunks: List[Dict]) -> Iterator[str]:
+        return self._stream("notes_weak_areas", self._build_weak_areas_prompt(doubts, doubt_chunks))
 
-        except Exception as e:
-            return f"# Error\nCould not generate notes: {str(e)}"
\ No newline at end of file
+    @staticmethod
+    def assemble_notes(video_notes: str, weak_areas: str) -> str:
+        """Full study notes: the video-level sections, then the session's weak areas"""
+        if not weak_areas.strip():
+            return video_notes.strip()
+        return f"{video_notes.strip()}\n\n{weak_areas.strip()}"
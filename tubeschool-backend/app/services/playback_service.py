@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.context_service import get_context_service
+from app.utils.metrics import record_cache, track_stage
+import asyncio
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PlaybackContext:
+    """
+    Warm retrieval state of one playback connection.
+
+    Position heartbeats keep the chunks around the student's position loaded,
+    with their embeddings (at most PLAYBACK_MAX_CHUNKS), so a question asked
+    at that moment is matched locally instead of searched in Qdrant. Assembled
+    prompt contexts are cached per chunk selection (PLAYBACK_CONTEXT_CACHE_SIZE),
+    starting with the chunks at the playhead.
+    """
+
+    def __init__(self, vector_service, video_id: str, top_k: int):
+        self.vector_service = vector_service
+        self.video_id = video_id
+        self.top_k = top_k
+        self.context_service = get_context_service()
+
+        self.position: Optional[float] = None
+        self.loaded_position: Optional[float] = None
+        self.index_version: Optional[str] = None
+        self.chunks: List[Dict] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)  # Normalized, one row per chunk
+
+        # Chunk indexes of a selection -> assembled segments
+        self._contexts: "OrderedDict[Tuple[int, ...], List[Dict]]" = OrderedDict()
+        self._contexts_lock = threading.Lock()
+        self._refresh: Optional[asyncio.Task] = None
+
+    def _stale(self) -> bool:
+        if self.loaded_position is None or self.index_version != self.vector_service.index.version:
+            return True
+        return abs(self.position - self.loaded_position) >= settings.PLAYBACK_WINDOW_AHEAD_SEC / 2
+
+    def move(self, position: float):
+        """Record a heartbeat; reload the window in the background once the position has moved far enough"""
+        self.position = max(0.0, position)
+        if self._stale() and (self._refresh is None or self._refresh.done()):
+            self._refresh = asyncio.create_task(self._load(self.position))
+
+    async def _load(self, position: float):
+        try:
+            index_version = self.vector_service.index.version
+            chunks, vectors = await self.vector_service.aget_chunks_in_window(
+                self.video_id,
+                position - settings.PLAYBACK_WINDOW_BEHIND_SEC,
+                position + settings.PLAYBACK_WINDOW_AHEAD_SEC,
+                settings.PLAYBACK_MAX_CHUNKS * 2
+            )
+        except Exception as e:
+            logger.warning(f"Playback window load failed for {self.video_id}: {e}")
+            return
+
+        if len(chunks) > settings.PLAYBACK_MAX_CHUNKS:
+            # Keep the chunks closest to the playhead
+            distances = [abs((c['start_time_sec'] + c['end_time_sec']) / 2 - position) for c in chunks]
+            keep = sorted(np.argsort(distances)[:settings.PLAYBACK_MAX_CHUNKS])
+            chunks, vectors = [chunks[i] for i in keep], vectors[keep]
+
+        if len(chunks):
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self.chunks, self.vectors = chunks, vectors
+        self.loaded_position, self.index_version = position, index_version
+        with self._contexts_lock:
+            self._contexts.clear()
+
+        # Likeliest selection: the chunks at the playhead
+        at_playhead = [c for c in chunks if c['start_time_sec'] <= position][-self.top_k:]
+        if at_playhead:
+            await asyncio.to_thread(self.assembled, at_playhead)
+
+    def search(self, query_vector: List[float], top_k: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        The best window chunks for a question (scored by cosine similarity like
+        Qdrant), or None when the window is cold or does not cover the question.
+        """
+        top_k = top_k or self.top_k
+        if not self.chunks or self.index_version != self.vector_service.index.version:
+            record_cache("playback_window", hit=False)
+            return None
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = self.vectors @ (query / max(np.linalg.norm(query), 1e-12))
+        best = np.argsort(-scores)[:top_k]
+
+        hit = bool(scores[best[0]] >= settings.PLAYBACK_MIN_SCORE)
+        record_cache("playback_window", hit=hit)
+        if not hit:
+            return None
+        return [{**self.chunks[i], "score": float(scores[i])} for i in best]
+
+    def assembled(self, chunks: List[Dict]) -> List[Dict]:
+        """Prompt context segments of a chunk selection, assembled once per selection"""
+        key = tuple(sorted(c['chunk_index'] for c in chunks))
+        with self._contexts_lock:
+            segments = self._contexts.get(key)
+            if segments is not None:
+                self._contexts.move_to_end(key)
+        record_cache("playback_context", hit=segments is not None)
+
+        if segments is None:
+            with track_stage("context_assembly"):
+                segments = self.context_service.assemble(chunks, budget_tokens=settings.QA_CONTEXT_TOKEN_BUDGET, label="qa")
+            with self._contexts_lock:
+                self._contexts[key] = segments
+                while len(self._contexts) > settings.PLAYBACK_CONTEXT_CACHE_SIZE:
+                    self._contexts.popitem(last=False)
+
+        # Callers may annotate segments, keep the cached ones intact
+        return [dict(segment) for segment in segments]
+
+    def close(self):
+        if self._refresh is not None:
+            self._refresh.cancel()
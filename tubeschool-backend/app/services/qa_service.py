@@ -2,41 +2,35 @@ from typing import List, Dict, Optional
 from app.config import settings
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+from app.services.context_service import get_context_service
+from app.services.llm_service import get_llm_service
+from app.utils.metrics import track_stage
 
 class QAService:
     def __init__(self):
 
-        self.llm_provider = settings.LLM_PROVIDER
-
-        if self.llm_provider == "google":
-            self.model = ChatGoogleGenerativeAI(google_api_key=settings.GOOGLE_API_KEY,
-                model=settings.GEMINI_MODEL,
-                temperature=settings.TEMPERATURE,
-                max_output_tokens=settings.MAX_TOKENS,
-                convert_system_message_to_human=True)
-        elif self.llm_provider == "huggingface":
-            llm = HuggingFaceEndpoint(
-                repo_id=settings.HUGGINGFACE_MODEL,
-                huggingfacehub_api_token=settings.HUGGINGFACEHUB_API_TOKEN,
-                temperature=settings.TEMPERATURE,
-                max_new_tokens=settings.MAX_TOKENS
-            )
-            self.model = ChatHuggingFace(llm=llm)
-        # Add other providers as needed
+        self.model = get_llm_service()
+
+        self.context_service = get_context_service()
 
     def generate_answer(
             self,
             question: str,
-            context_chunks: List[Dict]
+            context_chunks: List[Dict],
+            segments: Optional[List[Dict]] = None
     ) -> str:
-        """Generate answer using LLM with retrieved context"""
-
-        # Prepare context from chunks
+        """Generate answer using LLM with retrieved context (pass already assembled segments to skip assembly)"""
+
+        # Prepare context from chunks (merged and trimmed to the QA budget)
+        if segments is None:
+            segments = self.context_service.assemble(
+                context_chunks,
+                budget_tokens=settings.QA_CONTEXT_TOKEN_BUDGET,
+                label="qa"
+            )
         context = "\n\n".join([
-            f"[{chunk['start_time_sec']:.0f}s - {chunk['end_time_sec']:.0f}s]\n{chunk['text']}"
-            for chunk in context_chunks
+            f"[{segment['start_time_sec']:.0f}s - {segment['end_time_sec']:.0f}s]\n{segment['text']}"
+            for segment in segments
         ])
 
         prompt = f"""You are an AI teaching assistant helping a student understand a YouTube video lecture.
@@ -57,7 +51,10 @@ NOTE:
     
 Answer:"""
 
-        response = self.model.invoke(prompt)
+        self.context_service.log_prompt("qa", prompt)
+        with track_stage("llm_qa"):
+            response = self.model.invoke(prompt, label="qa")
+        self.context_service.log_completion("qa", response)
         return response.content
 
 
@@ -71,8 +68,11 @@ Answer: {answer}
 
 Topic:"""
 
+        self.context_service.log_prompt("topic", prompt)
         try:
-            response = self.model.invoke(prompt)
+            with track_stage("llm_topic"):
+                response = self.model.invoke(prompt, label="topic")
+            self.context_service.log_completion("topic", response)
             return response.content.strip()
         except:
             return None
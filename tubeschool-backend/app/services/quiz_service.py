@@ -1,33 +1,36 @@
-from typing import List, Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEndpoint, ChatHuggingFace
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 from app.config import settings
+from app.services.context_service import get_context_service
+from app.services.llm_service import get_llm_service
+from app.utils.deadline import ClientDisconnected, RequestAborted
+from app.utils.metrics import SHORT_ANSWER_GRADES, track_stage
+from app.utils.json_stream import ArrayItemParser
 import json
 import uuid
+import random
 import re
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 
 class QuizService:
-    def __init__(self):
-        self.llm_provider = settings.LLM_PROVIDER
-
-        if self.llm_provider == "google":
-            self.model = ChatGoogleGenerativeAI(
-                google_api_key=settings.GOOGLE_API_KEY,
-                model=settings.GEMINI_MODEL,
-                temperature=settings.TEMPERATURE,
-                max_output_tokens=settings.MAX_TOKENS,
-                convert_system_message_to_human=True
-            )
-        elif self.llm_provider == "huggingface":
-            llm = HuggingFaceEndpoint(
-                repo_id=settings.HUGGINGFACE_MODEL,
-                huggingfacehub_api_token=settings.HUGGINGFACEHUB_API_TOKEN,
-                temperature=settings.TEMPERATURE,
-                max_new_tokens=settings.MAX_TOKENS
-            )
-            self.model = ChatHuggingFace(llm=llm)
+    def __init__(self, vector_service=None):
+        """
+        :param vector_service: VectorService whose live encoder grades clear-cut short answers
+                               locally (read per call, so it follows index switches)
+        """
+        self.vector_service = vector_service
+        self.model = get_llm_service()
+
+        self.context_service = get_context_service()
+
+    @property
+    def encoder(self):
+        return self.vector_service.encoder if self.vector_service is not None else None
 
+    @track_stage("json_parse")
     def _sanitize_and_parse_json(self, text: str) -> Dict[str, Any]:
         """
         Robustly parses JSON even if it is truncated or contains markdown.
@@ -50,58 +53,13 @@ class QuizService:
             pass  # Continue to repair logic
 
         # 3. Handle Truncated JSON
-        # If the string ends abruptly, we try to find the last complete object in the "questions" array.
-        try:
-            # Find the start of the questions array
-            start_idx = text.find('[')
-            if start_idx == -1:
-                return {"questions": []}
-
-            # Find the last "}," pattern which typically indicates the end of a valid question object
-            last_object_end = text.rfind('},')
-
-            if last_object_end != -1:
-                # Construct a valid JSON string by closing the array and object
-                # text[:last_object_end+1] gives us "... }"
-                # Then we add "]}" to close the array and root object
-                repaired_text = text[:last_object_end + 1] + "]}"
-                return json.loads(repaired_text)
-
-            # If we only have one object and it's cut off, or weird structure
-            return {"questions": []}
-
-        except Exception:
-            # If repair fails, return empty to trigger fallback
-            return {"questions": []}
-
-    def generate_quiz(
-            self,
-            doubts: List[Dict],
-            video_chunks: List[Dict],
-            num_questions: int = 5
-    ) -> Dict[str, Any]:
-        """
-        Generate personalized quiz.
-        If doubts exist: Generate num_questions MCQs while prioritising the topics with doubts.
-        If no doubts: Generate num_questions MCQs from general video content.
-        """
-
-        # Extract weak topics from doubts (if any)
-        weak_topics = list(set([
-            doubt.get('topic', 'general')
-            for doubt in doubts
-            if doubt.get('topic')
-        ]))
-
-        # Prepare context from video chunks
-        context_text = "\n".join([
-            chunk['text']
-            for chunk in video_chunks
-        ])
+        # Keep every question object that closed before the cut (an empty list triggers the fallback)
+        return {"questions": ArrayItemParser("questions").feed(text)}
 
-        if not doubts:
-            # --- CASE 1: No Doubts (General Quiz) ---
-            prompt = f"""Generate a quiz based on the following video lecture content.
+    @staticmethod
+    def _build_general_prompt(context_text: str, num_questions: int) -> str:
+        """Prompt for MCQs covering the whole video (no doubts)"""
+        return f"""Generate a quiz based on the following video lecture content.
 
 Video content context:
 <VideoContentContext>
@@ -132,6 +90,38 @@ Return ONLY a valid JSON object with this exact structure:
 
 Generate the quiz now:"""
 
+    def _build_quiz_prompt(
+            self,
+            doubts: List[Dict],
+            video_chunks: List[Dict],
+            num_questions: int,
+            weak_topics: Optional[List[str]]
+    ) -> Tuple[str, str, List[str]]:
+        """Returns (prompt, context_text, weak_topics)"""
+
+        # Extract weak topics from doubts (if any)
+        if weak_topics is None:
+            weak_topics = list(set([
+                doubt.get('topic', 'general')
+                for doubt in doubts
+                if doubt.get('topic')
+            ]))
+
+        # Prepare context from video chunks (merged and trimmed to the quiz budget)
+        segments = self.context_service.assemble(
+            video_chunks,
+            budget_tokens=settings.QUIZ_CONTEXT_TOKEN_BUDGET,
+            label="quiz"
+        )
+        context_text = "\n".join([
+            segment['text']
+            for segment in segments
+        ])
+
+        if not doubts:
+            # --- CASE 1: No Doubts (General Quiz) ---
+            prompt = self._build_general_prompt(context_text, num_questions)
+
         else:
             # --- CASE 2: Doubts Exist (Personalized Quiz) ---
             doubt_summary = "\n".join([
@@ -178,8 +168,28 @@ Return ONLY a valid JSON object with this exact structure:
 
 Generate the quiz now:"""
 
+        return prompt, context_text, weak_topics
+
+    def generate_quiz(
+            self,
+            doubts: List[Dict],
+            video_chunks: List[Dict],
+            num_questions: int = 5,
+            weak_topics: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate personalized quiz.
+        If doubts exist: Generate num_questions MCQs while prioritising the topics with doubts.
+        If no doubts: Generate num_questions MCQs from general video content.
+        weak_topics: pre-ranked weak topics (e.g. from the session doubt index)
+        """
+        prompt, context_text, weak_topics = self._build_quiz_prompt(doubts, video_chunks, num_questions, weak_topics)
+
+        self.context_service.log_prompt("quiz", prompt)
         try:
-            response = self.model.invoke(prompt)
+            with track_stage("llm_quiz"):
+                response = self.model.invoke(prompt, label="quiz")
+            self.context_service.log_completion("quiz", response)
             quiz_text = response.content.strip()
 
             # Use robust parser
@@ -199,10 +209,100 @@ Generate the quiz now:"""
                 "weak_topics": weak_topics
             }
 
+        except ClientDisconnected:
+            raise
         except Exception as e:
+            # Also past the deadline: the fallback quiz needs no LLM
             print(f"Quiz Generation Error: {e}")
             return self._generate_fallback_quiz(doubts, num_questions, context_text)
 
+    def stream_quiz(
+            self,
+            doubts: List[Dict],
+            video_chunks: List[Dict],
+            num_questions: int = 5,
+            weak_topics: Optional[List[str]] = None
+    ) -> Iterator[Dict]:
+        """
+        Same quiz as generate_quiz, yielding each question as soon as the model
+        has finished writing it. If the model fails before producing any valid
+        question, the fallback quiz is yielded instead; a failure later only
+        loses the question being written.
+        """
+        prompt, context_text, weak_topics = self._build_quiz_prompt(doubts, video_chunks, num_questions, weak_topics)
+        parser = ArrayItemParser("questions")
+        seen_ids = set()
+        response = None
+
+        self.context_service.log_prompt("quiz", prompt)
+        try:
+            with track_stage("llm_quiz"):
+                for chunk in self.model.stream(prompt, label="quiz"):
+                    response = chunk if response is None else response + chunk
+
+                    for question in parser.feed(chunk.content):
+                        if not question.get('question_text'):
+                            continue
+                        # Streamed questions are graded by ID, so IDs must be unique
+                        if not question.get('question_id') or question['question_id'] in seen_ids:
+                            question['question_id'] = str(uuid.uuid4())
+                        question.setdefault('question_type', 'mcq')
+                        seen_ids.add(question['question_id'])
+                        yield question
+
+                        if len(seen_ids) >= num_questions:
+                            return
+        except ClientDisconnected:
+            raise
+        except Exception as e:
+            logger.error(f"Quiz stream error after {len(seen_ids)} questions: {e}")
+        finally:
+            if response is not None:
+                self.context_service.log_completion("quiz", response)
+
+        if not seen_ids:
+            yield from self._generate_fallback_quiz(doubts, num_questions, context_text)['questions']
+
+    def generate_question_pool(self, video_chunks: List[Dict], pool_size: int) -> List[Dict]:
+        """
+        Generate the general (no doubts) question pool of a video.
+        Runs once per video in the background; general quizzes are then sampled from it.
+        """
+        segments = self.context_service.assemble(
+            video_chunks,
+            budget_tokens=settings.QUIZ_CONTEXT_TOKEN_BUDGET,
+            label="quiz_pool"
+        )
+        context_text = "\n".join([segment['text'] for segment in segments])
+
+        prompt = self._build_general_prompt(context_text, pool_size)
+        self.context_service.log_prompt("quiz_pool", prompt)
+
+        with track_stage("llm_quiz_pool"):
+            response = self.model.invoke(prompt, label="quiz_pool")
+        self.context_service.log_completion("quiz_pool", response)
+        quiz_data = self._sanitize_and_parse_json(response.content.strip())
+
+        questions = [
+            q for q in quiz_data.get('questions', [])
+            if q.get('question_text') and q.get('options') and q.get('correct_answer')
+        ]
+
+        # Pooled questions are shared across sessions, so IDs must be truly unique
+        for q in questions:
+            q['question_id'] = str(uuid.uuid4())
+            q['question_type'] = 'mcq'
+
+        return questions
+
+    @staticmethod
+    def sample_from_pool(pool: List[Dict], num_questions: int) -> Dict[str, Any]:
+        """Serve a general quiz from a video's question pool"""
+        return {
+            "questions": random.sample(pool, min(num_questions, len(pool))),
+            "weak_topics": []
+        }
+
     def _generate_fallback_quiz(self, doubts: List[Dict], num_questions: int, context_text: str) -> Dict:
         """Generate a simple fallback quiz if LLM fails"""
         questions = []
@@ -236,13 +336,22 @@ Generate the quiz now:"""
             questions: List[Dict],
             answers: List[Dict]
     ) -> Dict[str, Any]:
-        """Evaluate quiz submission"""
+        """
+        Evaluate quiz submission.
+        Short answers the LLM has to grade after the request deadline has passed
+        are left pending (is_correct None) instead of failing the whole submission.
+        """
 
         # Create answer map
         answer_map = {ans['question_id']: ans['answer'] for ans in answers}
 
         feedback = []
         correct_count = 0
+        pending_count = 0
+
+        # Decide clear accepts/rejects locally, only borderline answers go to the LLM
+        short_answers = [q for q in questions if q['question_type'] != 'mcq']
+        pregrades = self._pregrade_short_answers(short_answers, answer_map)
 
         for question in questions:
             q_id = question['question_id']
@@ -272,12 +381,20 @@ Generate the quiz now:"""
                     "explanation": f"The correct answer is: {correct_answer}"
                 })
 
-            else:  # short_answer - use LLM to evaluate
-                is_correct, explanation = self._evaluate_short_answer(
-                    question['question_text'],
-                    user_answer,
-                    correct_answer
-                )
+            else:  # short_answer - graded locally if clear-cut, otherwise by the LLM
+                pregrade = pregrades.get(q_id)
+                if pregrade is not None:
+                    is_correct, explanation = pregrade
+                else:
+                    try:
+                        is_correct, explanation = self._evaluate_short_answer(
+                            question['question_text'],
+                            user_answer,
+                            correct_answer
+                        )
+                    except RequestAborted:
+                        is_correct, explanation = None, "Grading is pending, submit again to grade this answer."
+                        pending_count += 1
 
                 if is_correct:
                     correct_count += 1
@@ -293,13 +410,66 @@ Generate the quiz now:"""
         total = len(questions)
         score = (correct_count / total * 100) if total > 0 else 0
 
+        graded_locally = len(pregrades)
+        SHORT_ANSWER_GRADES.labels(grader="local").inc(graded_locally)
+        SHORT_ANSWER_GRADES.labels(grader="llm").inc(len(short_answers) - graded_locally - pending_count)
+        local_fraction = graded_locally / len(short_answers) if short_answers else 0.0
+        logger.info(
+            f"Short answers graded locally: {graded_locally}/{len(short_answers)} ({local_fraction:.0%})"
+        )
+
         return {
             "score": round(score, 2),
             "total_questions": total,
             "correct_answers": correct_count,
-            "feedback": feedback
+            "feedback": feedback,
+            "grading_stats": {
+                "short_answers": len(short_answers),
+                "graded_locally": graded_locally,
+                "local_fraction": round(local_fraction, 2)
+            },
+            "pending_answers": pending_count
         }
 
+    def _pregrade_short_answers(
+            self,
+            questions: List[Dict],
+            answer_map: Dict[str, str]
+    ) -> Dict[str, tuple[bool, str]]:
+        """
+        Grade short answers by embedding similarity to the expected answer.
+        Returns verdicts only for clear accepts/rejects; borderline answers are left out.
+        """
+        verdicts = {}
+        to_score = []
+        encoder = self.encoder  # Read once, so a batch never mixes two models
+
+        for question in questions:
+            user_answer = answer_map.get(question['question_id'], "").strip()
+            if not user_answer:
+                verdicts[question['question_id']] = (False, "No answer was provided.")
+            elif encoder is not None and question.get('correct_answer'):
+                to_score.append((question['question_id'], user_answer, question['correct_answer']))
+
+        if not to_score:
+            return verdicts
+
+        # One encoder pass for all student and expected answers
+        texts = [user for _, user, _ in to_score] + [expected for _, _, expected in to_score]
+        with track_stage("encode"):
+            embeddings = encoder.encode(texts, normalize_embeddings=True)
+        user_vectors = embeddings[:len(to_score)]
+        expected_vectors = embeddings[len(to_score):]
+        similarities = np.sum(user_vectors * expected_vectors, axis=1)
+
+        for (q_id, _, expected), similarity in zip(to_score, similarities):
+            if similarity >= settings.SHORT_ANSWER_ACCEPT_THRESHOLD:
+                verdicts[q_id] = (True, "Correct - your answer matches the expected answer.")
+            elif similarity <= settings.SHORT_ANSWER_REJECT_THRESHOLD:
+                verdicts[q_id] = (False, f"Incorrect. The expected answer was: {expected}")
+
+        return verdicts
+
     def _evaluate_short_answer(
             self,
             question: str,
@@ -321,13 +491,18 @@ Respond with a JSON object:
     "explanation": "brief feedback for the student"
 }}"""
 
+        self.context_service.log_prompt("quiz_grading", prompt)
         try:
-            response = self.model.invoke(prompt)
+            with track_stage("llm_quiz_grading"):
+                response = self.model.invoke(prompt, label="quiz_grading")
+            self.context_service.log_completion("quiz_grading", response)
             result_text = response.content.strip()
 
             result = self._sanitize_and_parse_json(result_text)
             return result.get('is_correct', False), result.get('explanation', "Could not evaluate.")
 
+        except RequestAborted:
+            raise
         except:
             # Fallback: simple string matching
             is_correct = user_answer.lower() in expected_answer.lower() or \
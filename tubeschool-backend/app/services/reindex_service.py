@@ -0,0 +1,195 @@
+from youtube_transcript_api import FetchedTranscriptSnippet
+from typing import Dict, Set
+from app.config import settings
+from app.services.vector_service import IndexVersion
+import asyncio
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ReindexService:
+    """
+    Zero-downtime migration to the index version of the current config.
+
+    When EMBEDDING_MODEL, CHUNK_SIZE or CHUNK_OVERLAP change, the new version's
+    collections are built next to the live ones while the live version keeps
+    serving:
+    - videos are re-chunked (and re-sectioned) from the stored transcripts (fetched once more,
+      paced, if a video predates the transcript store, or copied as they are if that fails);
+      when only the embedding model changed, chunks are copied with re-encoded vectors
+    - doubts and quiz pools are copied with re-encoded vectors
+    - topic vocabularies are copied when the embedding model is unchanged, and
+      are otherwise rebuilt lazily on the next question of each video
+    Then every alias is switched in one update. Videos ingested and doubts
+    asked during the build are picked up by catch-up passes before the switch.
+
+    One process builds at a time (lease in the index version registry); the
+    others follow the switch by polling the aliases. A process whose config is
+    older than the live version follows it instead of switching back.
+    """
+
+    def __init__(self, vector_service, transcript_service):
+        self.vector_service = vector_service
+        self.transcript_service = transcript_service
+        self.owner = str(uuid.uuid4())
+        self.started_at = time.time()
+        self.progress: Dict = {"state": "idle"}
+        self._task = None
+        self._last_fetch = 0.0
+
+    @property
+    def pending(self) -> bool:
+        return self.vector_service.index.version != self.vector_service.target.version
+
+    def claim(self) -> bool:
+        """Take the build lease of the target version unless another process holds a fresh one"""
+        target = self.vector_service.target
+        record = self.vector_service.get_version_record(target.version) or {}
+
+        lease_expired = time.time() - record.get('heartbeat', 0) > settings.REINDEX_LEASE_SEC
+        if record.get('state') == "building" and record.get('owner') != self.owner and not lease_expired:
+            return False
+
+        self.vector_service.write_version_record(target, state="building", owner=self.owner, heartbeat=time.time())
+        return True
+
+    def _heartbeat(self):
+        self.vector_service.write_version_record(self.vector_service.target, heartbeat=time.time())
+
+    def _load_transcript(self, video_id: str):
+        segments = self.vector_service.get_transcript(video_id)
+        if segments is not None:
+            return [FetchedTranscriptSnippet(**segment) for segment in segments]
+
+        # One video after the other would otherwise be a burst that opens the transcript breaker
+        wait = self._last_fetch + settings.REINDEX_FETCH_INTERVAL_SEC - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_fetch = time.monotonic()
+
+        try:
+            transcript = self.transcript_service.fetch_transcript(video_id)
+        except Exception as e:
+            logger.warning(f"Re-index: no transcript for {video_id}, copying its chunks as they are: {e}")
+            return None
+
+        self.vector_service.store_transcript(video_id, transcript)
+        return transcript
+
+    def _reindex_video(self, source: IndexVersion, target: IndexVersion, video_id: str):
+        # Same chunking: re-chunking would give the same chunks, no transcript needed
+        transcript = None if source.same_chunking(target) else self._load_transcript(video_id)
+        if transcript:
+            chunks = self.transcript_service.chunk_transcript(transcript, target.chunk_size, target.chunk_overlap)
+            self.vector_service.store_video_chunks(video_id, chunks, index=target)
+        else:
+            self.vector_service.copy_points(
+                source, target, "chunks", "text",
+                scroll_filter=self.vector_service._match("video_id", video_id)
+            )
+            self.vector_service.build_video_sections(video_id, index=target)
+
+    def _reindex_videos(self, source: IndexVersion, target: IndexVersion, done: Set[str]):
+        """Index every known video into the target until a pass finds nothing new"""
+        while True:
+            pending = (
+                self.vector_service.list_video_ids(source) | self.vector_service.list_transcript_video_ids()
+            ) - done
+            if not pending:
+                return
+
+            self.progress["videos_total"] = len(done) + len(pending)
+            for video_id in sorted(pending):
+                self._reindex_video(source, target, video_id)
+                done.add(video_id)
+                self.progress["videos_done"] = len(done)
+                self._heartbeat()
+
+    def run(self):
+        """Build the target version from the live one and switch the aliases to it"""
+        vector_service = self.vector_service
+        source, target = vector_service.index, vector_service.target
+        started = time.perf_counter()
+
+        logger.info(f"Re-indexing {source.version} -> {target.version} ({target.embedding_model}, "
+                    f"chunk size {target.chunk_size}, overlap {target.chunk_overlap})")
+        self.progress = {"state": "building", "source": source.version, "target": target.version}
+
+        vector_service.ensure_index_collections(target)
+
+        # Resumable: videos already in the target (from an interrupted run) are skipped
+        done = vector_service.list_video_ids(target)
+        self._reindex_videos(source, target, done)
+
+        self.progress["state"] = "copying"
+        doubt_ids = vector_service.copy_points(source, target, "doubts", "question")
+        pool_ids = vector_service.copy_points(source, target, "quiz_pool", "question_text")
+        if source.same_embeddings(target):
+            vector_service.copy_points(source, target, "topics", None)
+
+        # Catch up with what arrived during the build, then switch right away
+        self.progress["state"] = "switching"
+        self._reindex_videos(source, target, done)
+        vector_service.flush_doubts()
+        doubt_ids |= vector_service.copy_points(source, target, "doubts", "question", skip_ids=doubt_ids)
+        vector_service.copy_points(source, target, "quiz_pool", "question_text", skip_ids=pool_ids)
+        vector_service.switch_index(target)
+
+        self.progress = {"state": "done", "source": source.version, "target": target.version}
+        logger.info(f"Switched to index version {target.version} in {time.perf_counter() - started:.0f}s")
+
+        # Other processes write to the old version until they poll the switch
+        time.sleep(settings.INDEX_POLL_INTERVAL_SEC * 2)
+        self._reindex_videos(source, target, done)
+        if source.version == "legacy":
+            # The legacy names are aliases of the target now: late doubts of other processes
+            # reach it directly and are re-encoded by their flush once they follow the switch
+            return
+        vector_service.copy_points(source, target, "doubts", "question", skip_ids=doubt_ids)
+        logger.info(f"Index version {source.version} is retired and can be dropped once no process serves it")
+
+    def superseded(self) -> bool:
+        """The live version was switched to after this process started: its config is the older one"""
+        record = self.vector_service.get_version_record(self.vector_service.index.version) or {}
+        return record.get('switched_at', 0) > self.started_at
+
+    async def _maintain(self):
+        # Every process polls the aliases, also when its own config is live: a newer deployment
+        # may switch away from it, and this process must then stop writing to the old version
+        while True:
+            try:
+                building = (
+                    self.pending and settings.AUTO_REINDEX
+                    and not await asyncio.to_thread(self.superseded)
+                    and await asyncio.to_thread(self.claim)
+                )
+                if building:
+                    await asyncio.to_thread(self.run)
+                else:
+                    await asyncio.to_thread(self.vector_service.refresh_index)
+            except Exception as e:
+                logger.error(f"Re-index failed, will retry: {e}")
+                self.progress = {"state": "failed", "error": str(e)}
+
+            await asyncio.sleep(settings.INDEX_POLL_INTERVAL_SEC)
+
+    def start(self):
+        """Start the background re-index, if the config changed, and switch polling (called on application startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> Dict:
+        return {
+            "live_version": self.vector_service.index.version,
+            "target_version": self.vector_service.target.version,
+            "embedding_model": self.vector_service.target.embedding_model,
+            "reindex": self.progress
+        }
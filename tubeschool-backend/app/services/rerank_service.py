@@ -0,0 +1,85 @@
+from sentence_transformers import CrossEncoder
+from collections import OrderedDict
+from typing import Dict, List
+from app.config import settings
+from app.utils.metrics import record_cache, track_stage
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RerankService:
+    """
+    Cross-encoder rescoring of retrieved chunks.
+
+    Cosine top-k is cheap but coarse, so search over-fetches RERANK_CANDIDATES
+    chunks and this service scores every (question, chunk) pair with a small
+    local cross-encoder, in one batched forward pass, keeping the best few.
+    Scores are cached per (question, chunk text) since the same questions are
+    asked of the same chunks again (retries, students of the same video).
+    """
+
+    def __init__(self):
+        logger.info(f"Loading reranker {settings.RERANK_MODEL}")
+        self.model = CrossEncoder(settings.RERANK_MODEL, max_length=settings.RERANK_MAX_LENGTH)
+
+        # sha1(question, chunk text) -> cross-encoder score
+        self._scores: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str, text: str) -> bytes:
+        return hashlib.sha1(f"{query}\0{text}".encode()).digest()
+
+    def _cached(self, keys: List[bytes]) -> Dict[bytes, float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[key] = self._scores[key]
+        return found
+
+    def _cache(self, scores: Dict[bytes, float]):
+        with self._lock:
+            self._scores.update(scores)
+            for key in scores:
+                self._scores.move_to_end(key)
+            while len(self._scores) > settings.RERANK_CACHE_SIZE:
+                self._scores.popitem(last=False)
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Cross-encoder relevance of each text to the query (higher is better)"""
+        keys = [self._key(query, text) for text in texts]
+        scores = self._cached(keys)
+        for key in keys:
+            record_cache("rerank_scores", hit=key in scores)
+
+        missing = [(key, text) for key, text in zip(keys, texts) if key not in scores]
+        if missing:
+            with track_stage("rerank"):
+                predicted = self.model.predict(
+                    [(query, text) for _, text in missing],
+                    batch_size=settings.RERANK_BATCH_SIZE,
+                    show_progress_bar=False
+                )
+            computed = {key: float(value) for (key, _), value in zip(missing, predicted)}
+            self._cache(computed)
+            scores.update(computed)
+
+        return [scores[key] for key in keys]
+
+    def rerank(self, query: str, chunks: List[Dict], top_k: int) -> List[Dict]:
+        """The top_k chunks by cross-encoder score, each with a 'rerank_score' added"""
+        if not chunks:
+            return []
+
+        scores = self.score(query, [chunk['text'] for chunk in chunks])
+        ranked = sorted(
+            ({**chunk, "rerank_score": score} for chunk, score in zip(chunks, scores)),
+            key=lambda c: c['rerank_score'],
+            reverse=True
+        )
+        return ranked[:top_k]
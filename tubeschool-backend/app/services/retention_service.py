@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.config import settings
+import asyncio
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionService:
+    """
+    Keeps the doubts collection bounded.
+
+    Sessions only live in the memory of the process that created them, so a
+    doubt is dead once it is past DOUBT_TTL_DAYS, or older than every running
+    process (its session was lost in a restart). Each process heartbeats a
+    liveness record; the oldest live process compacts every
+    DOUBT_COMPACTION_INTERVAL_SEC by deleting all doubts created before the
+    later of both cutoffs in one filtered delete, after folding their topics
+    into per-video summaries (DOUBT_TOPIC_SUMMARY).
+    """
+
+    def __init__(self, vector_service):
+        self.vector_service = vector_service
+        self.owner = str(uuid.uuid4())
+        self.started_at = time.time()
+        self.last_compaction: Dict = {}
+        self._task = None
+
+    @property
+    def stale_after(self) -> float:
+        return settings.PROCESS_HEARTBEAT_SEC * 3
+
+    def heartbeat(self):
+        self.vector_service.register_process(self.owner, self.started_at)
+
+    def is_leader(self, processes: List[Dict]) -> bool:
+        """Only the oldest live process compacts, so summaries are not counted twice"""
+        oldest = min(processes, key=lambda p: (p['started_at'], p['process_id']), default=None)
+        return oldest is not None and oldest['process_id'] == self.owner
+
+    @staticmethod
+    def cutoff(processes: List[Dict]) -> Optional[datetime]:
+        """Doubts created before this are expired or orphaned, None if retention is disabled"""
+        cutoffs = []
+        if settings.DOUBT_TTL_DAYS > 0:
+            cutoffs.append(time.time() - settings.DOUBT_TTL_DAYS * 86400)
+        if settings.DOUBT_COMPACT_ORPHANS and processes:
+            oldest_start = min(process['started_at'] for process in processes)
+            cutoffs.append(oldest_start - settings.DOUBT_ORPHAN_GRACE_SEC)
+
+        return datetime.fromtimestamp(max(cutoffs), tz=timezone.utc) if cutoffs else None
+
+    def compact(self) -> int:
+        """Delete expired and orphaned doubts if this process is the leader, returns the number deleted"""
+        processes = self.vector_service.get_live_processes(self.stale_after)
+        if not self.is_leader(processes):
+            return 0
+
+        cutoff = self.cutoff(processes)
+        if cutoff is None:
+            return 0
+
+        # Doubts still in this process's write buffer are never older than the cutoff
+        self.vector_service.flush_doubts()
+        started = time.perf_counter()
+        deleted = self.vector_service.compact_doubts(cutoff, summarize=settings.DOUBT_TOPIC_SUMMARY)
+
+        self.last_compaction = {"at": time.time(), "cutoff": cutoff.isoformat(), "deleted": deleted}
+        if deleted:
+            logger.info(f"Compacted {deleted} doubts created before {cutoff.isoformat()} "
+                        f"in {time.perf_counter() - started:.1f}s")
+        return deleted
+
+    async def _maintain(self):
+        # The first compaction waits one interval, so the other processes have registered
+        last_compaction = time.monotonic()
+
+        while True:
+            try:
+                await asyncio.to_thread(self.heartbeat)
+                if time.monotonic() - last_compaction >= settings.DOUBT_COMPACTION_INTERVAL_SEC:
+                    last_compaction = time.monotonic()
+                    await asyncio.to_thread(self.compact)
+            except Exception as e:
+                logger.error(f"Doubt retention failed, will retry: {e}")
+
+            await asyncio.sleep(settings.PROCESS_HEARTBEAT_SEC)
+
+    def start(self):
+        """Start heartbeats and periodic compaction (called on application startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,158 @@
+from typing import List, Dict, Optional
+from collections import OrderedDict
+from app.config import settings
+from app.services.context_service import get_context_service
+from app.services.llm_service import get_llm_service
+from app.utils.metrics import record_cache, track_stage
+import json
+import logging
+import math
+import re
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TopicService:
+    """
+    Local topic labeling.
+    - At ingestion, chunk embeddings are clustered (k-means, NumPy) and each
+      cluster is named in a single LLM call; the centroids are persisted.
+    - At question time, the question embedding is assigned to the nearest
+      centroid, so no LLM call is needed and labels are shared by all students.
+    """
+
+    def __init__(self, vector_service):
+        self.vector_service = vector_service
+        self.model = get_llm_service()
+
+        self.context_service = get_context_service()
+
+        # (index version, video_id) -> (labels, normalized centroids); small, so kept in memory.
+        # Keyed by version since centroids live in the embedding space of that version.
+        self._vocabularies: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def _kmeans(vectors: np.ndarray, k: int, iterations: int = 25) -> tuple:
+        """Spherical k-means with k-means++ seeding; returns (centroids, assignments)"""
+        rng = np.random.default_rng(0)  # Deterministic vocabulary for a given video
+
+        centroids = [vectors[rng.integers(len(vectors))]]
+        for _ in range(1, k):
+            distances = 1 - np.max(vectors @ np.array(centroids).T, axis=1)
+            distances = np.clip(distances, 0, None) ** 2
+            total = distances.sum()
+            index = rng.choice(len(vectors), p=distances / total) if total > 0 else rng.integers(len(vectors))
+            centroids.append(vectors[index])
+        centroids = np.array(centroids)
+
+        assignments = np.zeros(len(vectors), dtype=int)
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            updated = np.array([
+                vectors[assignments == c].mean(axis=0) if np.any(assignments == c) else centroids[c]
+                for c in range(k)
+            ])
+            updated = TopicService._normalize(updated)
+            if np.allclose(updated, centroids):
+                break
+            centroids = updated
+
+        return centroids, assignments
+
+    def _label_clusters(self, chunks: List[Dict], vectors: np.ndarray, centroids: np.ndarray) -> List[str]:
+        """Name every cluster in one LLM call from its most central chunks (raises on an unusable answer)"""
+        excerpts = []
+        for c, centroid in enumerate(centroids):
+            nearest = np.argsort(-(vectors @ centroid))[:2]
+            text = " ... ".join(chunks[i]['text'][:300] for i in nearest)
+            excerpts.append(f"Cluster {c + 1}:\n{text}")
+
+        prompt = f"""Below are excerpts from {len(centroids)} clusters of a video lecture transcript.
+Give each cluster a short topic name (2-4 words) describing the concept it covers.
+
+{chr(10).join(excerpts)}
+
+Return ONLY a JSON array of {len(centroids)} strings, in cluster order."""
+
+        self.context_service.log_prompt("topic_labels", prompt)
+        with track_stage("llm_topic_labels"):
+            response = self.model.invoke(prompt, label="topic_labels")
+        self.context_service.log_completion("topic_labels", response)
+
+        # No placeholder names: the error leaves the video without a vocabulary, so a later build retries
+        match = re.search(r'\[.*\]', response.content, re.DOTALL)
+        if not match:
+            raise ValueError("Topic labels response has no JSON array")
+        labels = [str(label).strip() for label in json.loads(match.group(0)) if str(label).strip()]
+        if len(labels) != len(centroids):
+            raise ValueError(f"Expected {len(centroids)} topic labels, got {len(labels)}")
+        return labels
+
+    def build_vocabulary(self, video_id: str) -> List[str]:
+        """Cluster the chunk embeddings of a video, label and persist the topics"""
+        chunks, vectors = self.vector_service.get_chunk_vectors(video_id)
+        if len(chunks) == 0:
+            return []
+
+        vectors = self._normalize(vectors)
+        k = int(min(settings.TOPIC_MAX_CLUSTERS, max(1, round(math.sqrt(len(chunks) / 2)))))
+
+        with track_stage("topic_clustering"):
+            centroids, _ = self._kmeans(vectors, k)
+
+        labels = self._label_clusters(chunks, vectors, centroids)
+        self.vector_service.store_video_topics(video_id, centroids, labels)
+        self._cache(video_id, labels, centroids)
+
+        logger.info(f"Topic vocabulary for {video_id}: {labels}")
+        return labels
+
+    def _cache(self, video_id: str, labels: List[str], centroids: np.ndarray):
+        key = (self.vector_service.index.version, video_id)
+        with self._lock:
+            self._vocabularies[key] = (labels, centroids)
+            self._vocabularies.move_to_end(key)
+            while len(self._vocabularies) > settings.TOPIC_CACHE_MAX_VIDEOS:
+                self._vocabularies.popitem(last=False)
+
+    def get_vocabulary(self, video_id: str) -> Optional[tuple]:
+        """(labels, centroids) of a video, or None if no vocabulary exists yet"""
+        with self._lock:
+            vocabulary = self._vocabularies.get((self.vector_service.index.version, video_id))
+        record_cache("topic_vocabulary", hit=vocabulary is not None)
+        if vocabulary is not None:
+            return vocabulary
+
+        labels, centroids = self.vector_service.get_video_topics(video_id)
+        if not labels:
+            return None
+
+        centroids = self._normalize(centroids)
+        self._cache(video_id, labels, centroids)
+        return labels, centroids
+
+    def assign_topic(self, video_id: str, query_vector: List[float]) -> Optional[str]:
+        """
+        Nearest-centroid topic of a question.
+        Returns None when the question is not close to any topic of the video.
+        Raises LookupError if the video has no vocabulary yet.
+        """
+        vocabulary = self.get_vocabulary(video_id)
+        if vocabulary is None:
+            raise LookupError(f"No topic vocabulary for video {video_id}")
+
+        labels, centroids = vocabulary
+        similarities = centroids @ self._normalize(np.asarray(query_vector, dtype=np.float32))
+        best = int(np.argmax(similarities))
+
+        if similarities[best] < settings.TOPIC_MIN_SIMILARITY:
+            return None
+        return labels[best]
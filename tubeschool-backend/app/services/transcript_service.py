@@ -1,13 +1,40 @@
-from youtube_transcript_api import YouTubeTranscriptApi
+from youtube_transcript_api import (
+    YouTubeTranscriptApi, AgeRestricted, InvalidVideoId, NoTranscriptFound,
+    TranscriptsDisabled, VideoUnavailable, VideoUnplayable
+)
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 import re
 from app.config import settings
+from app.utils.metrics import track_stage
+from app.utils.resilience import CircuitBreaker, call_with_resilience
+
+# The video has no usable captions: retrying won't help and YouTube is not degraded
+PERMANENT_TRANSCRIPT_ERRORS = (
+    AgeRestricted, InvalidVideoId, NoTranscriptFound,
+    TranscriptsDisabled, VideoUnavailable, VideoUnplayable
+)
 
 
 class TranscriptService:
-    def __init__(self):
-        """Initialize the YouTube Transcript API client"""
-        self.api = YouTubeTranscriptApi()
+    def __init__(self, source=None):
+        """
+        Initialize the transcript source
+
+        :param source: Object with the YouTubeTranscriptApi `fetch(video_id, languages, preserve_formatting)`
+                       interface (default: YouTubeTranscriptApi). Inject a local stand-in for tests.
+        """
+        self.api = source if source is not None else YouTubeTranscriptApi()
+        self.breaker = CircuitBreaker(
+            "transcript_source",
+            failure_threshold=settings.TRANSCRIPT_BREAKER_THRESHOLD,
+            reset_timeout=settings.TRANSCRIPT_BREAKER_RESET_SEC
+        )
+        # Bounds how many hung upstream calls can accumulate
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.TRANSCRIPT_MAX_WORKERS,
+            thread_name_prefix="transcript"
+        )
 
     @staticmethod
     def extract_video_id(youtube_url: str) -> Optional[str]:
@@ -24,9 +51,13 @@ class TranscriptService:
                 return match.group(1)
         return None
 
+    @track_stage("transcript_fetch")
     def fetch_transcript(self, video_id: str, languages: List[str] = None) -> List[Dict]:
         """
-        Fetch transcript from YouTube using the new API
+        Fetch transcript from YouTube using the new API.
+        Each attempt is bounded by TRANSCRIPT_TIMEOUT_SEC and transient failures are
+        retried with backoff; while the circuit breaker is open it fails fast with
+        CircuitOpenError.
 
         :param video_id: YouTube video ID
         :param languages: List of language codes in priority order (default: ['en'])
@@ -35,25 +66,24 @@ class TranscriptService:
         if languages is None:
             languages = ['en']
 
-        try:
-            # Use the new fetch() method with language preference
-            transcript = self.api.fetch(
+        # fetch() already lists the transcripts and picks the preferred language,
+        # so there is no second list/find_transcript round trip on failure
+        return call_with_resilience(
+            lambda: self.api.fetch(
                 video_id=video_id,
                 languages=languages,
                 preserve_formatting=False
-            )
-            return transcript
-        except Exception as e:
-            # Try alternative: list all transcripts and pick the first available
-            try:
-                transcript_list = self.api.list(video_id)
-                # Try to find transcript in preferred languages
-                transcript = transcript_list.find_transcript(languages)
-                return transcript.fetch()
-            except Exception as inner_e:
-                raise Exception(f"Failed to fetch transcript: {str(e)}. Alternative attempt: {str(inner_e)}")
+            ),
+            executor=self.executor,
+            breaker=self.breaker,
+            timeout=settings.TRANSCRIPT_TIMEOUT_SEC,
+            retries=settings.TRANSCRIPT_RETRIES,
+            backoff=settings.TRANSCRIPT_RETRY_BACKOFF_SEC,
+            permanent_errors=PERMANENT_TRANSCRIPT_ERRORS
+        )
 
     @staticmethod
+    @track_stage("chunking")
     def chunk_transcript(
             transcript: List[Dict],
             chunk_size: int = None,
@@ -1,244 +1,1550 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, Range, FilterSelector
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Optional
+from datetime import datetime
+from typing import Any, List, Dict, Optional, Set, Tuple
+import asyncio
+import hashlib
+import httpx
+import logging
+import numpy as np
+import threading
+import time
 import uuid
 from app.config import settings
 from app.models.schemas import VideoChunk, UserDoubt
+from app.services.doubt_index import SessionDoubtIndex
+from app.services.embedding_client import RemoteEncoder
+from app.services.rerank_service import RerankService
+from app.utils.metrics import record_cache, track_stage
+
+logger = logging.getLogger(__name__)
+
+# Model of the collections created before versioning (vector size was hard-coded to it)
+LEGACY_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class IndexVersion:
+    """
+    One generation of the embedding-dependent collections (chunks, sections,
+    doubts, quiz pool, topics), identified by the embedding model and chunking config.
+
+    Collections are named `<alias>__<version>` and the aliases (the configured
+    collection names) point at the live generation. The legacy generation is
+    the unversioned collections created before aliases existed.
+    """
+
+    def __init__(
+            self,
+            version: str,
+            embedding_model: str,
+            chunk_size: Optional[int],
+            chunk_overlap: Optional[int],
+            encoder=None
+    ):
+        self.version = version
+        self.embedding_model = embedding_model
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoder = encoder
+
+        suffix = "" if version == "legacy" else f"__{version}"
+        self.chunks = settings.VIDEO_CHUNKS_COLLECTION + suffix
+        self.sections = settings.VIDEO_SECTIONS_COLLECTION + suffix
+        self.doubts = settings.USER_DOUBTS_COLLECTION + suffix
+        self.quiz_pool = settings.QUIZ_POOL_COLLECTION + suffix
+        self.topics = settings.VIDEO_TOPICS_COLLECTION + suffix
+
+    @staticmethod
+    def name_for(embedding_model: str, chunk_size: int, chunk_overlap: int) -> str:
+        key = f"{embedding_model}|{chunk_size}|{chunk_overlap}"
+        return "v" + hashlib.sha1(key.encode()).hexdigest()[:10]
+
+    @classmethod
+    def from_settings(cls) -> "IndexVersion":
+        """The generation described by EMBEDDING_MODEL, CHUNK_SIZE and CHUNK_OVERLAP"""
+        return cls(
+            cls.name_for(settings.EMBEDDING_MODEL, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP),
+            settings.EMBEDDING_MODEL,
+            settings.CHUNK_SIZE,
+            settings.CHUNK_OVERLAP
+        )
+
+    @classmethod
+    def legacy(cls) -> "IndexVersion":
+        return cls("legacy", LEGACY_EMBEDDING_MODEL, None, None)
+
+    @property
+    def collections(self) -> Dict[str, str]:
+        """Alias -> physical collection name"""
+        return {
+            settings.VIDEO_CHUNKS_COLLECTION: self.chunks,
+            settings.VIDEO_SECTIONS_COLLECTION: self.sections,
+            settings.USER_DOUBTS_COLLECTION: self.doubts,
+            settings.QUIZ_POOL_COLLECTION: self.quiz_pool,
+            settings.VIDEO_TOPICS_COLLECTION: self.topics,
+        }
+
+    @property
+    def vector_size(self) -> int:
+        return self.encoder.get_sentence_embedding_dimension()
+
+    def same_embeddings(self, other: "IndexVersion") -> bool:
+        """Vectors of both generations are comparable (can be copied as is)"""
+        return self.embedding_model == other.embedding_model
+
+    def same_chunking(self, other: "IndexVersion") -> bool:
+        """Both generations split transcripts the same way (unknown for legacy)"""
+        if self.chunk_size is None:
+            return False
+        return (self.chunk_size, self.chunk_overlap) == (other.chunk_size, other.chunk_overlap)
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "embedding_model": self.embedding_model,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+        }
+
+
+class _SerializedClient:
+    """Embedded Qdrant is not thread-safe: run one call at a time"""
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
 
 
 class VectorService:
+    """
+    Qdrant operations for transcripts, doubts and quiz pools.
+
+    Every method used on the request path has an async twin prefixed with `a`
+    (`search_video_chunks` / `asearch_video_chunks`, ...). With QDRANT_ASYNC the
+    twins use AsyncQdrantClient; otherwise they run the sync method in a thread.
+
+    With QDRANT_PATH set, Qdrant runs embedded in the process (on disk, or in
+    memory for ":memory:") instead of behind QDRANT_URL. Only the sync client
+    exists then, so the async twins always use the thread path.
+
+    Requests are served from the live IndexVersion (`self.index`), with the
+    encoder it was built with. `self.target` is the generation of the current
+    config; when they differ, ReindexService builds the target in the background
+    and switches to it.
+    """
+
     def __init__(self):
-        self.client = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
-        )
-        self.encoder = SentenceTransformer(settings.EMBEDDING_MODEL)
-        self.vector_size = 384  # all-MiniLM-L6-v2 dimension
+        self.local = bool(settings.QDRANT_PATH)
+        if self.local:
+            # A second client could not share the storage (in-memory data, or the lock of the directory)
+            self.client = _SerializedClient(QdrantClient(**self._client_options()))
+            self.async_client = None
+        else:
+            client_options = self._client_options()
+            self.client = QdrantClient(**client_options)
+            self.async_client = AsyncQdrantClient(**client_options) if settings.QDRANT_ASYNC else None
 
-        # Initialize collections
-        self._ensure_collections()
+        self._encoders: Dict[str, SentenceTransformer] = {}
+        self.target = IndexVersion.from_settings()
+        self.target.encoder = self._load_encoder(self.target.embedding_model)
 
-    def _ensure_collections(self):
-        """Create collections if they don't exist"""
-        from qdrant_client.models import PayloadSchemaType
+        # Write-behind buffer of doubts not yet stored in Qdrant
+        self._doubt_lock = threading.Lock()
+        # (index version the vector was encoded for, point)
+        self._pending_doubts: List[Tuple[IndexVersion, PointStruct]] = []
+        self._flushing_doubts: List[Tuple[IndexVersion, PointStruct]] = []
+        self._flush_task = None
+        self._background_flushes = set()
 
-        collections = [c.name for c in self.client.get_collections().collections]
+        # Per-session doubts and weak topics; Qdrant is only read for cold sessions
+        self.doubt_index = SessionDoubtIndex(settings.DOUBT_INDEX_MAX_SESSIONS)
 
-        if settings.VIDEO_CHUNKS_COLLECTION not in collections:
-            self.client.create_collection(
-                collection_name=settings.VIDEO_CHUNKS_COLLECTION,
-                vectors_config=VectorParams(
-                    size=self.vector_size,
-                    distance=Distance.COSINE
-                )
-            )
-            # Create payload index for video_id filtering
-            self.client.create_payload_index(
-                collection_name=settings.VIDEO_CHUNKS_COLLECTION,
-                field_name="video_id",
-                field_schema=PayloadSchemaType.KEYWORD
-            )
+        # (index version, video_id) -> whether the video has a section layer
+        self._sectioned_videos: Dict[Tuple[str, str], bool] = {}
+
+        # Optional cross-encoder stage for searches that ask for it
+        self.reranker = RerankService() if settings.RERANK_ENABLED else None
+
+        # Initialize collections
+        self._ensure_store_collections()
+        self.index = self._resolve_live_index()
+        if self.index is None:
+            # Fresh deployment: the configured generation is live from the start
+            self.ensure_index_collections(self.target)
+            self.switch_index(self.target)
         else:
-            # If collection exists, ensure index exists
-            try:
-                self.client.create_payload_index(
-                    collection_name=settings.VIDEO_CHUNKS_COLLECTION,
-                    field_name="video_id",
-                    field_schema=PayloadSchemaType.KEYWORD
-                )
-            except:
-                pass  # Index might already exist
-
-        if settings.USER_DOUBTS_COLLECTION not in collections:
-            self.client.create_collection(
-                collection_name=settings.USER_DOUBTS_COLLECTION,
-                vectors_config=VectorParams(
-                    size=self.vector_size,
-                    distance=Distance.COSINE
-                )
-            )
-            # Create payload indexes for filtering
-            self.client.create_payload_index(
-                collection_name=settings.USER_DOUBTS_COLLECTION,
-                field_name="session_id",
-                field_schema=PayloadSchemaType.KEYWORD
+            # Adds collection kinds introduced after the live version was built
+            self.ensure_index_collections(self.index)
+
+    @property
+    def encoder(self) -> SentenceTransformer:
+        """Encoder of the live index version"""
+        return self.index.encoder
+
+    def _load_encoder(self, model_name: str) -> SentenceTransformer:
+        """Local model, or a client of the shared embedding process when EMBEDDING_SERVER_SOCKET is set"""
+        if model_name not in self._encoders:
+            if settings.EMBEDDING_SERVER_SOCKET:
+                self._encoders[model_name] = RemoteEncoder(model_name, settings.EMBEDDING_SERVER_SOCKET)
+            else:
+                self._encoders[model_name] = SentenceTransformer(model_name)
+        return self._encoders[model_name]
+
+    @staticmethod
+    def _client_options() -> Dict[str, Any]:
+        """Connection settings shared by the sync and async clients"""
+        if settings.QDRANT_PATH == ":memory:":
+            return {"location": ":memory:"}
+        if settings.QDRANT_PATH:
+            # Request threads share the SQLite connection; _SerializedClient keeps them in turn
+            return {"path": settings.QDRANT_PATH, "force_disable_check_same_thread": True}
+
+        options = {
+            "url": settings.QDRANT_URL,
+            "api_key": settings.QDRANT_API_KEY,
+            "timeout": settings.QDRANT_TIMEOUT,
+            "prefer_grpc": settings.QDRANT_PREFER_GRPC,
+            "grpc_port": settings.QDRANT_GRPC_PORT,
+        }
+        if not settings.QDRANT_PREFER_GRPC:
+            # REST: keep a pool of keep-alive connections instead of reconnecting per call
+            options["limits"] = httpx.Limits(
+                max_connections=settings.QDRANT_POOL_SIZE,
+                max_keepalive_connections=settings.QDRANT_POOL_SIZE
             )
-            self.client.create_payload_index(
-                collection_name=settings.USER_DOUBTS_COLLECTION,
-                field_name="video_id",
-                field_schema=PayloadSchemaType.KEYWORD
+        return options
+
+    async def aclose(self):
+        """Flush buffered doubts and close pooled connections (called on application shutdown)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            # Let an interrupted flush put its batch back before the final one
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self._background_flushes:
+            await asyncio.gather(*self._background_flushes, return_exceptions=True)
+        await self.aflush_doubts()
+
+        if self.async_client is not None:
+            await self.async_client.close()
+        self.client.close()
+
+    def _collection_names(self) -> List[str]:
+        return [c.name for c in self.client.get_collections().collections]
+
+    def _ensure_store_collections(self):
+        """Create the unversioned, vectorless collections (transcripts, video notes, registries, summaries)"""
+        from qdrant_client.models import PayloadSchemaType
+
+        existing = self._collection_names()
+        for name in self.store_collections():
+            if name not in existing:
+                self.client.create_collection(collection_name=name, vectors_config={})
+
+        if settings.TRANSCRIPTS_COLLECTION not in existing:
+            self._create_payload_index(settings.TRANSCRIPTS_COLLECTION, "video_id", PayloadSchemaType.KEYWORD)
+
+    @staticmethod
+    def store_collections() -> List[str]:
+        return [
+            settings.TRANSCRIPTS_COLLECTION,
+            settings.VIDEO_NOTES_COLLECTION,
+            settings.INDEX_VERSIONS_COLLECTION,
+            settings.DOUBT_SUMMARIES_COLLECTION,
+            settings.PROCESSES_COLLECTION,
+        ]
+
+    def ensure_index_collections(self, index: IndexVersion):
+        """Create the collections of an index version if they don't exist"""
+        from qdrant_client.models import PayloadSchemaType
+
+        existing = self._collection_names()
+        self._ensure_collection(index.chunks, existing, ["video_id"], index.vector_size, ["chunk_index"])
+        self._ensure_collection(index.sections, existing, ["video_id"], index.vector_size)
+        self._ensure_collection(index.doubts, existing, ["session_id", "video_id"], index.vector_size)
+        # Retention deletes by created_at; also added to doubt collections created before it existed
+        self._create_payload_index(index.doubts, "created_at", PayloadSchemaType.DATETIME)
+        self._ensure_collection(index.quiz_pool, existing, ["video_id"], index.vector_size)
+        self._ensure_collection(index.topics, existing, ["video_id"], index.vector_size)
+
+    def _ensure_collection(
+            self,
+            name: str,
+            existing: List[str],
+            keyword_fields: List[str],
+            vector_size: int,
+            integer_fields: Tuple[str, ...] = ()
+    ):
+        """Create a collection with keyword (and integer range) indexes if it doesn't exist"""
+        from qdrant_client.models import PayloadSchemaType
+
+        if name in existing:
+            return
+
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=VectorParams(
+                size=vector_size,
+                distance=Distance.COSINE
             )
+        )
+        for field_name in keyword_fields:
+            self._create_payload_index(name, field_name, PayloadSchemaType.KEYWORD)
+        for field_name in integer_fields:
+            self._create_payload_index(name, field_name, PayloadSchemaType.INTEGER)
+
+    def _create_payload_index(self, collection_name: str, field_name: str, field_schema):
+        if self.local:
+            return  # Embedded Qdrant filters by scanning payloads, it has no payload indexes
+        self.client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema
+        )
+
+    # Index versions
+
+    @staticmethod
+    def _version_point_id(version: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"index-version:{version}"))
+
+    def get_version_record(self, version: str) -> Optional[Dict]:
+        points = self.client.retrieve(
+            collection_name=settings.INDEX_VERSIONS_COLLECTION,
+            ids=[self._version_point_id(version)]
+        )
+        return points[0].payload if points else None
+
+    def write_version_record(self, index: IndexVersion, **fields):
+        """Create or update the registry entry of an index version"""
+        record = self.get_version_record(index.version) or index.record()
+        record.update(fields)
+        self.client.upsert(
+            collection_name=settings.INDEX_VERSIONS_COLLECTION,
+            points=[PointStruct(id=self._version_point_id(index.version), vector={}, payload=record)]
+        )
+
+    def _live_version(self) -> Optional[str]:
+        """Version the chunks alias points at, "legacy" for pre-versioning collections, None if empty"""
+        aliases = {a.alias_name: a.collection_name for a in self.client.get_aliases().aliases}
+        collection = aliases.get(settings.VIDEO_CHUNKS_COLLECTION)
+        if collection is not None:
+            return collection.rsplit("__", 1)[-1]
+        if settings.VIDEO_CHUNKS_COLLECTION in self._collection_names():
+            return "legacy"
+        return None
+
+    def _resolve_live_index(self) -> Optional[IndexVersion]:
+        version = self._live_version()
+        if version is None:
+            return None
+        if version == self.target.version:
+            return self.target
+
+        if version == "legacy":
+            index = IndexVersion.legacy()
         else:
-            # If collection exists, ensure indexes exist
-            try:
-                self.client.create_payload_index(
-                    collection_name=settings.USER_DOUBTS_COLLECTION,
-                    field_name="session_id",
-                    field_schema=PayloadSchemaType.KEYWORD
-                )
-                self.client.create_payload_index(
-                    collection_name=settings.USER_DOUBTS_COLLECTION,
-                    field_name="video_id",
-                    field_schema=PayloadSchemaType.KEYWORD
-                )
-            except:
-                pass  # Indexes might already exist
+            record = self.get_version_record(version)
+            if record is None:
+                raise RuntimeError(f"Live index version {version} is not registered in {settings.INDEX_VERSIONS_COLLECTION}")
+            index = IndexVersion(version, record['embedding_model'], record['chunk_size'], record['chunk_overlap'])
+
+        index.encoder = self._load_encoder(index.embedding_model)
+        return index
+
+    def refresh_index(self) -> bool:
+        """Follow an alias switch made by another process, returns True if the live version changed"""
+        version = self._live_version()
+        if version is None or version == self.index.version:
+            return False
+
+        index = self._resolve_live_index()
+        logger.info(f"Index version switched from {self.index.version} to {index.version}")
+        self.index = index
+        return True
+
+    def switch_index(self, index: IndexVersion):
+        """Point every alias at the collections of `index` in one atomic alias update"""
+        from qdrant_client.models import (
+            CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+        )
+
+        existing_aliases = {a.alias_name for a in self.client.get_aliases().aliases}
+        existing_collections = self._collection_names()
+
+        operations = []
+        for alias, collection in index.collections.items():
+            create = CreateAliasOperation(create_alias=CreateAlias(collection_name=collection, alias_name=alias))
+            if alias in existing_collections:
+                # One-time migration: a pre-versioning collection holds the alias name (its data has
+                # been copied into `index` by the re-indexer). An alias can't share the name of a
+                # collection, so each one is replaced right away, keeping the gap to one call per name.
+                self.client.delete_collection(alias)
+                self.client.update_collection_aliases(change_aliases_operations=[create])
+                continue
+            if alias in existing_aliases:
+                operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+            operations.append(create)
+
+        if operations:
+            self.client.update_collection_aliases(change_aliases_operations=operations)
+        self.write_version_record(index, state="live", switched_at=time.time())
+        self.index = index
+
+    def drop_index_version(self, version: str):
+        """Delete the collections of a retired index version"""
+        if version in (self.index.version, self.target.version):
+            raise ValueError(f"Index version {version} is in use")
+        serving = [
+            process['process_id'] for process in self.get_live_processes(settings.PROCESS_HEARTBEAT_SEC * 3)
+            if process.get('index_version') == version
+        ]
+        if serving:
+            raise ValueError(f"Index version {version} is still served by {len(serving)} process(es)")
+
+        record = self.get_version_record(version)
+        if record is None:
+            raise LookupError(f"Unknown index version {version}")
+
+        index = IndexVersion(version, record['embedding_model'], record['chunk_size'], record['chunk_overlap'])
+        for collection in index.collections.values():
+            self.client.delete_collection(collection)
+        self.client.delete(
+            collection_name=settings.INDEX_VERSIONS_COLLECTION,
+            points_selector=[self._version_point_id(version)]
+        )
 
     def reset_collections(self):
         """Delete and recreate collections (useful for development/testing)"""
-        try:
-            self.client.delete_collection(settings.VIDEO_CHUNKS_COLLECTION)
-        except:
-            pass
+        from qdrant_client.models import DeleteAlias, DeleteAliasOperation
 
-        try:
-            self.client.delete_collection(settings.USER_DOUBTS_COLLECTION)
-        except:
-            pass
+        aliases = [a.alias_name for a in self.client.get_aliases().aliases]
+        if aliases:
+            self.client.update_collection_aliases(change_aliases_operations=[
+                DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)) for alias in aliases
+            ])
+
+        bases = list(self.target.collections) + self.store_collections()
+        for name in self._collection_names():
+            if name in bases or name.split("__")[0] in bases:
+                try:
+                    self.client.delete_collection(name)
+                except:
+                    pass
 
-        self._ensure_collections()
+        self._ensure_store_collections()
+        self.ensure_index_collections(self.target)
+        self.switch_index(self.target)
+        self.doubt_index.clear()
         print("✅ Collections reset successfully!")
 
+    @staticmethod
+    def _match(key: str, value: Any) -> Filter:
+        """Filter on a single keyword payload field"""
+        return Filter(
+            must=[
+                FieldCondition(
+                    key=key,
+                    match=MatchValue(value=value)
+                )
+            ]
+        )
+
+    def _encode(self, texts, index: Optional[IndexVersion] = None):
+        encoder = (index or self.index).encoder
+        with track_stage("encode"):
+            return encoder.encode(texts)
+
+    async def _aencode(self, texts, index: Optional[IndexVersion] = None):
+        # Encoding is CPU-bound, keep it off the event loop
+        encoder = (index or self.index).encoder
+        with track_stage("encode"):
+            return await asyncio.to_thread(encoder.encode, texts)
+
+    def _scroll_all(self, collection_name: str, scroll_filter: Filter) -> List[Dict]:
+        """Fetch the payloads of every point matching the filter, 100 at a time"""
+        payloads = []
+        next_page_offset = None
+
+        while True:
+            with track_stage("qdrant_scroll"):
+                results, next_page_offset = self.client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=scroll_filter,
+                    limit=100,
+                    offset=next_page_offset,
+                    with_payload=True
+                )
+
+            payloads.extend([point.payload for point in results])
+
+            if next_page_offset is None:
+                break
+
+        return payloads
+
+    async def _ascroll_all(self, collection_name: str, scroll_filter: Filter) -> List[Dict]:
+        payloads = []
+        next_page_offset = None
+
+        while True:
+            with track_stage("qdrant_scroll"):
+                results, next_page_offset = await self.async_client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=scroll_filter,
+                    limit=100,
+                    offset=next_page_offset,
+                    with_payload=True
+                )
+
+            payloads.extend([point.payload for point in results])
+
+            if next_page_offset is None:
+                break
+
+        return payloads
+
     def check_video_exists(self, video_id: str) -> bool:
         """Check if video transcript is already indexed"""
         try:
-            results = self.client.scroll(
-                collection_name=settings.VIDEO_CHUNKS_COLLECTION,
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="video_id",
-                            match=MatchValue(value=video_id)
-                        )
-                    ]
-                ),
-                limit=1
-            )
+            with track_stage("qdrant_scroll"):
+                results = self.client.scroll(
+                    collection_name=self.index.chunks,
+                    scroll_filter=self._match("video_id", video_id),
+                    limit=1
+                )
             return len(results[0]) > 0
         except:
             return False
 
-    def store_video_chunks(self, video_id: str, chunks: List[Dict]):
-        """Store video transcript chunks in Qdrant"""
-        points = []
+    async def acheck_video_exists(self, video_id: str) -> bool:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.check_video_exists, video_id)
+        try:
+            with track_stage("qdrant_scroll"):
+                results = await self.async_client.scroll(
+                    collection_name=self.index.chunks,
+                    scroll_filter=self._match("video_id", video_id),
+                    limit=1
+                )
+            return len(results[0]) > 0
+        except:
+            return False
 
-        for chunk in chunks:
-            text = chunk['text']
-            vector = self.encoder.encode(text).tolist()
+    @staticmethod
+    def _chunk_point_id(video_id: str, chunk_index: int) -> str:
+        # Deterministic, so re-ingesting or re-indexing a video overwrites instead of duplicating
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"chunk:{video_id}:{chunk_index}"))
 
-            point = PointStruct(
-                id=str(uuid.uuid4()),
-                vector=vector,
+    def _chunk_points(self, video_id: str, chunks: List[Dict], vectors) -> List[PointStruct]:
+        return [
+            PointStruct(
+                id=self._chunk_point_id(video_id, chunk['chunk_index']),
+                vector=vector.tolist(),
                 payload={
                     "video_id": video_id,
                     "chunk_index": chunk['chunk_index'],
-                    "text": text,
+                    "text": chunk['text'],
                     "start_time_sec": chunk['start_time_sec'],
                     "end_time_sec": chunk['end_time_sec']
                 }
             )
-            points.append(point)
+            for chunk, vector in zip(chunks, vectors)
+        ]
 
-        self.client.upsert(
-            collection_name=settings.VIDEO_CHUNKS_COLLECTION,
-            points=points
+    def store_video_chunks(self, video_id: str, chunks: List[Dict], index: Optional[IndexVersion] = None):
+        """Store video transcript chunks in Qdrant (in the live index version unless given)"""
+        index = index or self.index
+        vectors = self._encode([chunk['text'] for chunk in chunks], index)
+        points = self._chunk_points(video_id, chunks, vectors)
+
+        with track_stage("qdrant_upsert"):
+            self.client.upsert(
+                collection_name=index.chunks,
+                points=points
+            )
+            if len(chunks) >= settings.SECTION_MIN_CHUNKS > 0:
+                self.client.upsert(
+                    collection_name=index.sections,
+                    points=self._section_points(video_id, chunks, vectors)
+                )
+
+    async def astore_video_chunks(self, video_id: str, chunks: List[Dict]):
+        if self.async_client is None:
+            return await asyncio.to_thread(self.store_video_chunks, video_id, chunks)
+
+        vectors = await self._aencode([chunk['text'] for chunk in chunks])
+        points = self._chunk_points(video_id, chunks, vectors)
+
+        with track_stage("qdrant_upsert"):
+            await self.async_client.upsert(
+                collection_name=self.index.chunks,
+                points=points
+            )
+            if len(chunks) >= settings.SECTION_MIN_CHUNKS > 0:
+                await self.async_client.upsert(
+                    collection_name=self.index.sections,
+                    points=self._section_points(video_id, chunks, vectors)
+                )
+
+    # Section layer (long videos only)
+
+    def _section_points(self, video_id: str, chunks: List[Dict], vectors) -> List[PointStruct]:
+        """
+        Group contiguous chunks (sorted by index) into sections of SECTION_SIZE chunks.
+        A section's vector is the normalized mean of its chunk embeddings.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        points = []
+        for section_index, start in enumerate(range(0, len(chunks), settings.SECTION_SIZE)):
+            group = chunks[start:start + settings.SECTION_SIZE]
+            centroid = vectors[start:start + settings.SECTION_SIZE].mean(axis=0)
+            centroid /= max(np.linalg.norm(centroid), 1e-12)
+
+            points.append(PointStruct(
+                id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"section:{video_id}:{section_index}")),
+                vector=centroid.tolist(),
+                payload={
+                    "video_id": video_id,
+                    "section_index": section_index,
+                    "start_chunk": group[0]['chunk_index'],
+                    "end_chunk": group[-1]['chunk_index'],
+                    "start_time_sec": group[0]['start_time_sec'],
+                    "end_time_sec": group[-1]['end_time_sec']
+                }
+            ))
+        return points
+
+    def build_video_sections(self, video_id: str, index: Optional[IndexVersion] = None):
+        """(Re)build the section layer of a video from its stored chunk embeddings"""
+        index = index or self.index
+        chunks, vectors = self.get_chunk_vectors(video_id, index)
+        if len(chunks) >= settings.SECTION_MIN_CHUNKS > 0:
+            with track_stage("qdrant_upsert"):
+                self.client.upsert(
+                    collection_name=index.sections,
+                    points=self._section_points(video_id, chunks, vectors)
+                )
+
+    def _has_sections(self, video_id: str) -> Optional[bool]:
+        """Cached section-layer lookup, None when not known yet"""
+        if settings.SECTION_MIN_CHUNKS <= 0:
+            return False
+        return self._sectioned_videos.get((self.index.version, video_id))
+
+    def _section_filter(self, video_id: str, sections) -> Filter:
+        """Chunks of the video inside any of the given sections"""
+        if not sections:
+            return self._match("video_id", video_id)
+
+        return Filter(
+            must=[FieldCondition(key="video_id", match=MatchValue(value=video_id))],
+            should=[
+                FieldCondition(
+                    key="chunk_index",
+                    range=Range(gte=section.payload['start_chunk'], lte=section.payload['end_chunk'])
+                )
+                for section in sections
+            ]
         )
 
+    def _section_requests(self, video_id: str, query_vectors) -> List:
+        from qdrant_client.models import QueryRequest
+
+        video_filter = self._match("video_id", video_id)
+        return [
+            QueryRequest(
+                query=np.asarray(vector).tolist(),
+                filter=video_filter,
+                limit=settings.SECTION_TOP_K,
+                with_payload=True
+            )
+            for vector in query_vectors
+        ]
+
+    def _chunk_filters(self, video_id: str, query_vectors) -> List[Filter]:
+        """
+        Per-query chunk filters. For videos with a section layer, the best
+        SECTION_TOP_K sections of each query are picked first and chunk search
+        is restricted to them, so search cost stays flat as videos get longer.
+        """
+        has_sections = self._has_sections(video_id)
+        if has_sections is False:
+            return [self._match("video_id", video_id)] * len(query_vectors)
+
+        with track_stage("qdrant_section_search"):
+            responses = self.client.query_batch_points(
+                collection_name=self.index.sections,
+                requests=self._section_requests(video_id, query_vectors)
+            )
+
+        self._sectioned_videos[(self.index.version, video_id)] = any(r.points for r in responses)
+        return [self._section_filter(video_id, response.points) for response in responses]
+
+    async def _achunk_filters(self, video_id: str, query_vectors) -> List[Filter]:
+        has_sections = self._has_sections(video_id)
+        if has_sections is False:
+            return [self._match("video_id", video_id)] * len(query_vectors)
+
+        with track_stage("qdrant_section_search"):
+            responses = await self.async_client.query_batch_points(
+                collection_name=self.index.sections,
+                requests=self._section_requests(video_id, query_vectors)
+            )
+
+        self._sectioned_videos[(self.index.version, video_id)] = any(r.points for r in responses)
+        return [self._section_filter(video_id, response.points) for response in responses]
+
+    def encode_query(self, query: str) -> List[float]:
+        """Embed a question once so retrieval and doubt storage can share the vector"""
+        return self._encode(query).tolist()
+
+    async def aencode_query(self, query: str) -> List[float]:
+        return (await self._aencode(query)).tolist()
+
+    def _search_limit(self, top_k: int, rerank: bool) -> int:
+        """Chunks to fetch from Qdrant: over-fetch when the reranker will cut them down"""
+        if rerank and self.reranker is not None:
+            return max(top_k, settings.RERANK_CANDIDATES)
+        return top_k
+
     def search_video_chunks(
             self,
             video_id: str,
             query: str,
-            top_k: int = 3
+            top_k: int = 3,
+            query_vector: Optional[List[float]] = None,
+            rerank: bool = False
     ) -> List[Dict]:
-        """Search relevant chunks for a question"""
-        from qdrant_client.models import QueryRequest
+        """
+        Search relevant chunks for a question (pass query_vector to skip encoding).
+        With rerank (and RERANK_ENABLED), RERANK_CANDIDATES chunks are fetched and
+        the top_k by cross-encoder score are returned.
+        """
+        if query_vector is None:
+            query_vector = self.encode_query(query)
 
-        query_vector = self.encoder.encode(query).tolist()
+        chunk_filter = self._chunk_filters(video_id, [query_vector])[0]
 
-        results = self.client.query_points(
-            collection_name=settings.VIDEO_CHUNKS_COLLECTION,
-            query=query_vector,
-            query_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="video_id",
-                        match=MatchValue(value=video_id)
-                    )
-                ]
-            ),
-            limit=top_k,
-            with_payload=True
-        )
+        with track_stage("qdrant_search"):
+            results = self.client.query_points(
+                collection_name=self.index.chunks,
+                query=query_vector,
+                query_filter=chunk_filter,
+                limit=self._search_limit(top_k, rerank),
+                with_payload=True
+            )
+
+        chunks = [self._point_to_chunk(point) for point in results.points]
+        if rerank and self.reranker is not None:
+            return self.reranker.rerank(query, chunks, top_k)
+        return chunks
+
+    async def asearch_video_chunks(
+            self,
+            video_id: str,
+            query: str,
+            top_k: int = 3,
+            query_vector: Optional[List[float]] = None,
+            rerank: bool = False
+    ) -> List[Dict]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.search_video_chunks, video_id, query, top_k, query_vector, rerank)
+
+        if query_vector is None:
+            query_vector = await self.aencode_query(query)
+
+        chunk_filter = (await self._achunk_filters(video_id, [query_vector]))[0]
+
+        with track_stage("qdrant_search"):
+            results = await self.async_client.query_points(
+                collection_name=self.index.chunks,
+                query=query_vector,
+                query_filter=chunk_filter,
+                limit=self._search_limit(top_k, rerank),
+                with_payload=True
+            )
+
+        chunks = [self._point_to_chunk(point) for point in results.points]
+        if rerank and self.reranker is not None:
+            # Cross-encoder inference is CPU-bound, keep it off the event loop
+            return await asyncio.to_thread(self.reranker.rerank, query, chunks, top_k)
+        return chunks
+
+    @staticmethod
+    def _batch_requests(query_vectors, chunk_filters: List[Filter], top_k_per_query: int) -> List:
+        from qdrant_client.models import QueryRequest
 
         return [
-            {
-                "text": point.payload['text'],
-                "start_time_sec": point.payload['start_time_sec'],
-                "end_time_sec": point.payload['end_time_sec'],
-                "score": point.score
-            }
-            for point in results.points
+            QueryRequest(
+                query=vector.tolist(),
+                filter=chunk_filter,
+                limit=top_k_per_query,
+                with_payload=True
+            )
+            for vector, chunk_filter in zip(query_vectors, chunk_filters)
         ]
 
-    def store_user_doubt(self, doubt: UserDoubt):
-        """Store user's question in doubts collection"""
-        vector = self.encoder.encode(doubt.question).tolist()
+    def _merge_batch_results(self, responses) -> List[Dict]:
+        """Deduplicate batched results by chunk_index, keeping the best score"""
+        merged = {}
+        for response in responses:
+            for point in response.points:
+                chunk = self._point_to_chunk(point)
+                existing = merged.get(chunk['chunk_index'])
+                if existing is None or chunk['score'] > existing['score']:
+                    merged[chunk['chunk_index']] = chunk
+
+        return sorted(merged.values(), key=lambda c: c['score'], reverse=True)
+
+    def search_video_chunks_batch(
+            self,
+            video_id: str,
+            queries: List[str],
+            top_k_per_query: int = 2
+    ) -> List[Dict]:
+        """
+        Search relevant chunks for several questions at once.
+        All queries are encoded in one forward pass and sent as one Qdrant batch,
+        each query contributes at most top_k_per_query chunks, and results are
+        deduplicated by chunk_index (keeping the best score).
+        """
+        if not queries:
+            return []
+
+        query_vectors = self._encode(queries)
+        chunk_filters = self._chunk_filters(video_id, query_vectors)
+
+        with track_stage("qdrant_search"):
+            responses = self.client.query_batch_points(
+                collection_name=self.index.chunks,
+                requests=self._batch_requests(query_vectors, chunk_filters, top_k_per_query)
+            )
+
+        return self._merge_batch_results(responses)
+
+    async def asearch_video_chunks_batch(
+            self,
+            video_id: str,
+            queries: List[str],
+            top_k_per_query: int = 2
+    ) -> List[Dict]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.search_video_chunks_batch, video_id, queries, top_k_per_query)
+        if not queries:
+            return []
+
+        query_vectors = await self._aencode(queries)
+        chunk_filters = await self._achunk_filters(video_id, query_vectors)
+
+        with track_stage("qdrant_search"):
+            responses = await self.async_client.query_batch_points(
+                collection_name=self.index.chunks,
+                requests=self._batch_requests(query_vectors, chunk_filters, top_k_per_query)
+            )
+
+        return self._merge_batch_results(responses)
+
+    @staticmethod
+    def _point_to_chunk(point) -> Dict:
+        """Convert a scored Qdrant point into a chunk dict"""
+        return {
+            "chunk_index": point.payload['chunk_index'],
+            "text": point.payload['text'],
+            "start_time_sec": point.payload['start_time_sec'],
+            "end_time_sec": point.payload['end_time_sec'],
+            "score": point.score
+        }
 
-        point = PointStruct(
+    def _doubt_point(self, doubt: UserDoubt, vector) -> PointStruct:
+        return PointStruct(
             id=str(uuid.uuid4()),
             vector=vector,
-            payload=doubt.dict()
+            payload=doubt.model_dump(mode="json")
         )
 
-        self.client.upsert(
-            collection_name=settings.USER_DOUBTS_COLLECTION,
-            points=[point]
-        )
+    def store_user_doubt(self, doubt: UserDoubt, vector: Optional[List[float]] = None):
+        """
+        Queue user's question for the doubts collection (write-behind).
+        Pass the query vector already computed for retrieval to skip re-encoding.
+        Buffered doubts are flushed in batches and are visible to get_session_doubts immediately.
+        """
+        index = self.index
+        if vector is None:
+            vector = self._encode(doubt.question, index).tolist()
 
-    def get_session_doubts(self, session_id: str) -> List[Dict]:
-        """Retrieve all doubts for a session"""
-        results = self.client.scroll(
-            collection_name=settings.USER_DOUBTS_COLLECTION,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="session_id",
-                        match=MatchValue(value=session_id)
+        point = self._doubt_point(doubt, vector)
+        self.doubt_index.record(point.payload)
+        if self._buffer_doubt(index, point):
+            self.flush_doubts()
+
+    async def astore_user_doubt(self, doubt: UserDoubt, vector: Optional[List[float]] = None):
+        index = self.index
+        if vector is None:
+            vector = (await self._aencode(doubt.question, index)).tolist()
+
+        point = self._doubt_point(doubt, vector)
+        self.doubt_index.record(point.payload)
+        if self._buffer_doubt(index, point):
+            # Flush in the background, the request does not wait for Qdrant
+            task = asyncio.create_task(self.aflush_doubts())
+            self._background_flushes.add(task)
+            task.add_done_callback(self._background_flushes.discard)
+
+    def _buffer_doubt(self, index: IndexVersion, point: PointStruct) -> bool:
+        """Add a doubt (with the index version its vector comes from) to the write buffer, returns True when a flush is due"""
+        with self._doubt_lock:
+            self._pending_doubts.append((index, point))
+            return len(self._pending_doubts) >= settings.DOUBT_FLUSH_BATCH_SIZE
+
+    def _take_pending_doubts(self) -> List[Tuple[IndexVersion, PointStruct]]:
+        """Move the buffer into the in-flight batch (one flush at a time)"""
+        with self._doubt_lock:
+            if self._flushing_doubts or not self._pending_doubts:
+                return []
+            self._flushing_doubts = self._pending_doubts
+            self._pending_doubts = []
+            return self._flushing_doubts
+
+    @staticmethod
+    def _stale_doubts(batch: List[Tuple[IndexVersion, PointStruct]], index: IndexVersion) -> List[PointStruct]:
+        """Doubts buffered before a switch to an index with other embeddings (their vectors don't fit it)"""
+        return [point for version, point in batch if not version.same_embeddings(index)]
+
+    @staticmethod
+    def _with_vectors(
+            batch: List[Tuple[IndexVersion, PointStruct]],
+            index: IndexVersion,
+            stale: List[PointStruct],
+            vectors
+    ) -> List[Tuple[IndexVersion, PointStruct]]:
+        """The batch with the stale doubts re-encoded for `index`"""
+        reencoded = {
+            str(point.id): point.model_copy(update={"vector": vector.tolist()})
+            for point, vector in zip(stale, vectors)
+        }
+        return [(index, reencoded.get(str(point.id), point)) for _, point in batch]
+
+    @staticmethod
+    def _is_permanent_error(error: Exception) -> bool:
+        """Qdrant rejected the request itself (4xx, invalid argument): retrying fails the same way"""
+        from qdrant_client.http.exceptions import UnexpectedResponse
+
+        if isinstance(error, UnexpectedResponse):
+            # Not 404: an alias is briefly missing while legacy collections are migrated
+            return error.status_code is not None and 400 <= error.status_code < 500 and error.status_code not in (404, 408, 429)
+        if isinstance(error, ValueError):
+            return True  # Embedded Qdrant and request validation
+        code = getattr(error, "code", None)
+        if callable(code):  # gRPC
+            return getattr(code(), "name", None) in ("INVALID_ARGUMENT", "FAILED_PRECONDITION")
+        return False
+
+    def _finish_doubt_flush(self, batch: List[Tuple[IndexVersion, PointStruct]], succeeded: bool, rejected: bool = False):
+        """End the in-flight batch; a failed one is kept for the next flush unless Qdrant rejected it"""
+        with self._doubt_lock:
+            self._flushing_doubts = []
+            if not succeeded and not rejected:
+                # Point IDs make the retry idempotent
+                self._pending_doubts = batch + self._pending_doubts
+
+    def flush_doubts(self):
+        """Write buffered doubts to the live index in one upsert"""
+        batch = self._take_pending_doubts()
+        if not batch:
+            return
+
+        succeeded = rejected = False
+        try:
+            index = self.index
+            stale = self._stale_doubts(batch, index)
+            if stale:
+                vectors = self._encode([point.payload['question'] for point in stale], index)
+                batch = self._with_vectors(batch, index, stale, vectors)
+
+            try:
+                with track_stage("qdrant_upsert"):
+                    self.client.upsert(
+                        collection_name=index.doubts,
+                        points=[point for _, point in batch]
                     )
-                ]
-            ),
-            limit=100
-        )
+            except Exception as e:
+                # Rejected because another process switched the index (alias now has other vectors):
+                # keep the batch, the next flush re-encodes it for the new index
+                rejected = self._is_permanent_error(e) and not self.refresh_index()
+                raise
+            succeeded = True
+        except Exception as e:
+            action = "dropping them" if rejected else "will retry"
+            logger.error(f"Failed to flush {len(batch)} doubts, {action}: {e}")
+        finally:
+            self._finish_doubt_flush(batch, succeeded, rejected)
+
+    async def aflush_doubts(self):
+        if self.async_client is None:
+            return await asyncio.to_thread(self.flush_doubts)
+
+        batch = self._take_pending_doubts()
+        if not batch:
+            return
+
+        succeeded = rejected = False
+        try:
+            index = self.index
+            stale = self._stale_doubts(batch, index)
+            if stale:
+                vectors = await self._aencode([point.payload['question'] for point in stale], index)
+                batch = self._with_vectors(batch, index, stale, vectors)
+
+            try:
+                with track_stage("qdrant_upsert"):
+                    await self.async_client.upsert(
+                        collection_name=index.doubts,
+                        points=[point for _, point in batch]
+                    )
+            except Exception as e:
+                rejected = self._is_permanent_error(e) and not await asyncio.to_thread(self.refresh_index)
+                raise
+            succeeded = True
+        except Exception as e:
+            action = "dropping them" if rejected else "will retry"
+            logger.error(f"Failed to flush {len(batch)} doubts, {action}: {e}")
+        finally:
+            # Also on cancellation (shutdown), so the batch goes back to the buffer
+            self._finish_doubt_flush(batch, succeeded, rejected)
+
+    async def _flush_doubts_periodically(self):
+        while True:
+            await asyncio.sleep(settings.DOUBT_FLUSH_INTERVAL_SEC)
+            await self.aflush_doubts()
+
+    def start_doubt_flusher(self):
+        """Start the interval flush of the doubt buffer (called on application startup)"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_doubts_periodically())
+
+    def _with_buffered_doubts(self, session_id: str, stored: Dict[str, Dict]) -> List[Dict]:
+        """Merge doubts still in the write buffer so a session reads its own writes"""
+        with self._doubt_lock:
+            buffered = self._flushing_doubts + self._pending_doubts
+        for _, point in buffered:
+            if point.payload['session_id'] == session_id:
+                stored.setdefault(str(point.id), point.payload)
+        return list(stored.values())
+
+    def _scroll_session_doubts(self, session_id: str) -> Dict[str, Dict]:
+        """All stored doubts of a session keyed by point ID (no page cap)"""
+        stored = {}
+        next_page_offset = None
+
+        while True:
+            with track_stage("qdrant_scroll"):
+                results, next_page_offset = self.client.scroll(
+                    collection_name=self.index.doubts,
+                    scroll_filter=self._match("session_id", session_id),
+                    limit=100,
+                    offset=next_page_offset
+                )
+            stored.update({str(point.id): point.payload for point in results})
+            if next_page_offset is None:
+                return stored
+
+    async def _ascroll_session_doubts(self, session_id: str) -> Dict[str, Dict]:
+        stored = {}
+        next_page_offset = None
+
+        while True:
+            with track_stage("qdrant_scroll"):
+                results, next_page_offset = await self.async_client.scroll(
+                    collection_name=self.index.doubts,
+                    scroll_filter=self._match("session_id", session_id),
+                    limit=100,
+                    offset=next_page_offset
+                )
+            stored.update({str(point.id): point.payload for point in results})
+            if next_page_offset is None:
+                return stored
+
+    def get_session_doubts(self, session_id: str) -> List[Dict]:
+        """Retrieve all doubts for a session (from the doubt index, Qdrant for cold sessions)"""
+        doubts = self.doubt_index.get_doubts(session_id)
+        record_cache("session_doubts", hit=doubts is not None)
+        if doubts is not None:
+            return doubts
+
+        doubts = self._with_buffered_doubts(session_id, self._scroll_session_doubts(session_id))
+        self.doubt_index.warm(session_id, doubts)
+        return doubts
+
+    async def aget_session_doubts(self, session_id: str) -> List[Dict]:
+        doubts = self.doubt_index.get_doubts(session_id)
+        record_cache("session_doubts", hit=doubts is not None)
+        if doubts is not None:
+            return doubts
+
+        if self.async_client is None:
+            stored = await asyncio.to_thread(self._scroll_session_doubts, session_id)
+        else:
+            stored = await self._ascroll_session_doubts(session_id)
+
+        doubts = self._with_buffered_doubts(session_id, stored)
+        self.doubt_index.warm(session_id, doubts)
+        return doubts
 
-        return [point.payload for point in results[0]]
+    async def aget_weak_topics(self, session_id: str) -> List[str]:
+        """Most frequent doubt topics of a session, maintained incrementally"""
+        weak_topics = self.doubt_index.get_weak_topics(session_id, settings.WEAK_TOPICS_LIMIT)
+        if weak_topics is None:
+            await self.aget_session_doubts(session_id)  # Warms the index
+            weak_topics = self.doubt_index.get_weak_topics(session_id, settings.WEAK_TOPICS_LIMIT) or []
+        return weak_topics
 
     def get_all_video_chunks(self, video_id: str) -> List[Dict]:
         """Retrieve all transcript chunks for a video, sorted by index"""
-        chunks = []
+        chunks = self._scroll_all(self.index.chunks, self._match("video_id", video_id))
+
+        # Sort by chunk_index to ensure order so the transcript is continuous
+        return sorted(chunks, key=lambda x: x['chunk_index'])
+
+    async def aget_all_video_chunks(self, video_id: str) -> List[Dict]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.get_all_video_chunks, video_id)
+
+        chunks = await self._ascroll_all(self.index.chunks, self._match("video_id", video_id))
+        return sorted(chunks, key=lambda x: x['chunk_index'])
+
+    def _window_filter(self, video_id: str, start_sec: float, end_sec: float) -> Filter:
+        return Filter(must=[
+            FieldCondition(key="video_id", match=MatchValue(value=video_id)),
+            FieldCondition(key="end_time_sec", range=Range(gte=start_sec)),
+            FieldCondition(key="start_time_sec", range=Range(lte=end_sec)),
+        ])
+
+    @staticmethod
+    def _window_chunks(points) -> Tuple[List[Dict], np.ndarray]:
+        points = sorted(points, key=lambda point: point.payload['chunk_index'])
+        vectors = np.array([point.vector for point in points], dtype=np.float32)
+        return [point.payload for point in points], vectors
+
+    def get_chunks_in_window(
+            self,
+            video_id: str,
+            start_sec: float,
+            end_sec: float,
+            limit: int
+    ) -> Tuple[List[Dict], np.ndarray]:
+        """Chunks overlapping [start_sec, end_sec] (at most `limit`) with their vectors, in video order"""
+        with track_stage("qdrant_scroll"):
+            points, _ = self.client.scroll(
+                collection_name=self.index.chunks,
+                scroll_filter=self._window_filter(video_id, start_sec, end_sec),
+                limit=limit,
+                with_payload=True,
+                with_vectors=True
+            )
+        return self._window_chunks(points)
+
+    async def aget_chunks_in_window(
+            self,
+            video_id: str,
+            start_sec: float,
+            end_sec: float,
+            limit: int
+    ) -> Tuple[List[Dict], np.ndarray]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.get_chunks_in_window, video_id, start_sec, end_sec, limit)
+
+        with track_stage("qdrant_scroll"):
+            points, _ = await self.async_client.scroll(
+                collection_name=self.index.chunks,
+                scroll_filter=self._window_filter(video_id, start_sec, end_sec),
+                limit=limit,
+                with_payload=True,
+                with_vectors=True
+            )
+        return self._window_chunks(points)
+
+    @staticmethod
+    def _pool_point_id(video_id: str, slot: int) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"quiz-pool:{video_id}:{slot}"))
+
+    def store_quiz_pool(self, video_id: str, questions: List[Dict], first_slot: int = 0):
+        """
+        Store pre-generated general quiz questions of a video in pool slots
+        first_slot, first_slot + 1, ... (a rebuild of the same slots overwrites them)
+        """
+        if not questions:
+            return
+
+        vectors = self._encode([q['question_text'] for q in questions])
+
+        points = [
+            PointStruct(
+                id=self._pool_point_id(video_id, first_slot + i),
+                vector=vector.tolist(),
+                payload={"video_id": video_id, **question}
+            )
+            for i, (question, vector) in enumerate(zip(questions, vectors))
+        ]
+
+        with track_stage("qdrant_upsert"):
+            self.client.upsert(
+                collection_name=self.index.quiz_pool,
+                points=points
+            )
+
+    @staticmethod
+    def _pool_question(payload: Dict) -> Dict:
+        return {k: v for k, v in payload.items() if k != "video_id"}
+
+    def get_quiz_pool(self, video_id: str) -> List[Dict]:
+        """Retrieve the pre-generated general quiz questions of a video"""
+        payloads = self._scroll_all(self.index.quiz_pool, self._match("video_id", video_id))
+        return [self._pool_question(payload) for payload in payloads]
+
+    async def aget_quiz_pool(self, video_id: str) -> List[Dict]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.get_quiz_pool, video_id)
+
+        payloads = await self._ascroll_all(self.index.quiz_pool, self._match("video_id", video_id))
+        return [self._pool_question(payload) for payload in payloads]
+
+    def get_chunk_vectors(self, video_id: str, index: Optional[IndexVersion] = None) -> Tuple[List[Dict], np.ndarray]:
+        """All chunks of a video (sorted by index) with their stored embeddings"""
+        index = index or self.index
+        points = []
         next_page_offset = None
 
-        # Qdrant scroll API to fetch all records
         while True:
-            results, next_page_offset = self.client.scroll(
-                collection_name=settings.VIDEO_CHUNKS_COLLECTION,
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="video_id",
-                            match=MatchValue(value=video_id)
-                        )
-                    ]
-                ),
-                limit=100,  # Fetch 100 at a time
-                offset=next_page_offset,
-                with_payload=True
+            with track_stage("qdrant_scroll"):
+                results, next_page_offset = self.client.scroll(
+                    collection_name=index.chunks,
+                    scroll_filter=self._match("video_id", video_id),
+                    limit=100,
+                    offset=next_page_offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+            points.extend(results)
+            if next_page_offset is None:
+                break
+
+        points.sort(key=lambda point: point.payload['chunk_index'])
+        vectors = np.array([point.vector for point in points], dtype=np.float32)
+        return [point.payload for point in points], vectors
+
+    @staticmethod
+    def _topic_point_id(video_id: str, topic_index: int) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"topic:{video_id}:{topic_index}"))
+
+    def store_video_topics(self, video_id: str, centroids: np.ndarray, labels: List[str]):
+        """Store the topic vocabulary of a video (one point per topic centroid), replacing a previous one"""
+        points = [
+            PointStruct(
+                id=self._topic_point_id(video_id, i),
+                vector=centroid.tolist(),
+                payload={"video_id": video_id, "topic_index": i, "label": label}
+            )
+            for i, (centroid, label) in enumerate(zip(centroids, labels))
+        ]
+
+        with track_stage("qdrant_upsert"):
+            self.client.upsert(
+                collection_name=self.index.topics,
+                points=points
             )
 
-            chunks.extend([point.payload for point in results])
+        # A previous vocabulary may have had more topics than this one
+        stale = Filter(must=[
+            FieldCondition(key="video_id", match=MatchValue(value=video_id)),
+            FieldCondition(key="topic_index", range=Range(gte=len(points)))
+        ])
+        with track_stage("qdrant_delete"):
+            self.client.delete(
+                collection_name=self.index.topics,
+                points_selector=FilterSelector(filter=stale)
+            )
+
+    def get_video_topics(self, video_id: str) -> Tuple[List[str], np.ndarray]:
+        """Topic labels and centroids of a video (empty if not built yet)"""
+        points = []
+        next_page_offset = None
 
+        while True:
+            with track_stage("qdrant_scroll"):
+                results, next_page_offset = self.client.scroll(
+                    collection_name=self.index.topics,
+                    scroll_filter=self._match("video_id", video_id),
+                    limit=100,
+                    offset=next_page_offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+            points.extend(results)
             if next_page_offset is None:
                 break
 
-        # Sort by chunk_index to ensure order so the transcript is continuous
-        return sorted(chunks, key=lambda x: x['chunk_index'])
\ No newline at end of file
+        points.sort(key=lambda point: point.payload['topic_index'])
+        centroids = np.array([point.vector for point in points], dtype=np.float32)
+        return [point.payload['label'] for point in points], centroids
+
+    # Transcript store (unversioned, source of truth for re-indexing)
+
+    @staticmethod
+    def _transcript_point_id(video_id: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"transcript:{video_id}"))
+
+    def store_transcript(self, video_id: str, transcript):
+        """Keep the raw transcript segments so the video can be re-chunked without refetching"""
+        segments = [
+            {"text": entry.text, "start": entry.start, "duration": entry.duration}
+            for entry in transcript
+        ]
+
+        with track_stage("qdrant_upsert"):
+            self.client.upsert(
+                collection_name=settings.TRANSCRIPTS_COLLECTION,
+                points=[PointStruct(
+                    id=self._transcript_point_id(video_id),
+                    vector={},
+                    payload={"video_id": video_id, "segments": segments}
+                )]
+            )
+
+    def get_transcript(self, video_id: str) -> Optional[List[Dict]]:
+        """Stored transcript segments of a video, or None if it was never stored"""
+        points = self.client.retrieve(
+            collection_name=settings.TRANSCRIPTS_COLLECTION,
+            ids=[self._transcript_point_id(video_id)]
+        )
+        return points[0].payload['segments'] if points else None
+
+    # Video-level study notes (shared by every session of a video)
+
+    @staticmethod
+    def _notes_point_id(video_id: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"notes:{video_id}"))
+
+    def store_video_notes(self, video_id: str, content: str):
+        with track_stage("qdrant_upsert"):
+            self.client.upsert(
+                collection_name=settings.VIDEO_NOTES_COLLECTION,
+                points=[PointStruct(
+                    id=self._notes_point_id(video_id),
+                    vector={},
+                    payload={"video_id": video_id, "content": content}
+                )]
+            )
+
+    def get_video_notes(self, video_id: str) -> Optional[str]:
+        """Persisted video-level notes, or None if not generated yet"""
+        with track_stage("qdrant_retrieve"):
+            points = self.client.retrieve(
+                collection_name=settings.VIDEO_NOTES_COLLECTION,
+                ids=[self._notes_point_id(video_id)]
+            )
+        return points[0].payload['content'] if points else None
+
+    async def aget_video_notes(self, video_id: str) -> Optional[str]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.get_video_notes, video_id)
+
+        with track_stage("qdrant_retrieve"):
+            points = await self.async_client.retrieve(
+                collection_name=settings.VIDEO_NOTES_COLLECTION,
+                ids=[self._notes_point_id(video_id)]
+            )
+        return points[0].payload['content'] if points else None
+
+    # Doubt retention
+
+    @staticmethod
+    def _process_point_id(process_id: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"process:{process_id}"))
+
+    def register_process(self, process_id: str, started_at: float):
+        """Create or refresh the liveness record of an application process (with the index version it serves)"""
+        self.client.upsert(
+            collection_name=settings.PROCESSES_COLLECTION,
+            points=[PointStruct(
+                id=self._process_point_id(process_id),
+                vector={},
+                payload={
+                    "process_id": process_id,
+                    "started_at": started_at,
+                    "heartbeat": time.time(),
+                    "index_version": self.index.version
+                }
+            )]
+        )
+
+    def get_live_processes(self, stale_after: float) -> List[Dict]:
+        """Processes with a recent heartbeat; records of dead ones are removed"""
+        records = self._scroll_all(settings.PROCESSES_COLLECTION, None)
+        now = time.time()
+
+        stale = [record for record in records if now - record['heartbeat'] > stale_after]
+        if stale:
+            self.client.delete(
+                collection_name=settings.PROCESSES_COLLECTION,
+                points_selector=[self._process_point_id(record['process_id']) for record in stale]
+            )
+        return [record for record in records if now - record['heartbeat'] <= stale_after]
+
+    @staticmethod
+    def _doubt_summary_point_id(video_id: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"doubt-summary:{video_id}"))
+
+    def get_doubt_summary(self, video_id: str) -> Optional[Dict]:
+        """Doubt and per-topic counts of a video's compacted doubts, or None if none were compacted"""
+        points = self.client.retrieve(
+            collection_name=settings.DOUBT_SUMMARIES_COLLECTION,
+            ids=[self._doubt_summary_point_id(video_id)]
+        )
+        return points[0].payload if points else None
+
+    def _summarize_doubts(self, scroll_filter: Filter):
+        """Add the topic counts of the matching doubts to the per-video summaries"""
+        counts: Dict[str, Dict] = {}
+        next_page_offset = None
+
+        while True:
+            with track_stage("qdrant_scroll"):
+                results, next_page_offset = self.client.scroll(
+                    collection_name=self.index.doubts,
+                    scroll_filter=scroll_filter,
+                    limit=1000,
+                    offset=next_page_offset,
+                    with_payload=["video_id", "topic"]
+                )
+            for point in results:
+                video = counts.setdefault(point.payload['video_id'], {"doubts": 0, "topics": {}})
+                video["doubts"] += 1
+                topic = (point.payload.get('topic') or "").strip()
+                if topic:
+                    video["topics"][topic] = video["topics"].get(topic, 0) + 1
+            if next_page_offset is None:
+                break
+
+        points = []
+        for video_id, video in counts.items():
+            summary = self.get_doubt_summary(video_id) or {"video_id": video_id, "doubts": 0, "topics": {}}
+            summary["doubts"] += video["doubts"]
+            for topic, count in video["topics"].items():
+                summary["topics"][topic] = summary["topics"].get(topic, 0) + count
+            summary["updated_at"] = time.time()
+            points.append(PointStruct(id=self._doubt_summary_point_id(video_id), vector={}, payload=summary))
+
+        for start in range(0, len(points), 100):
+            self.client.upsert(collection_name=settings.DOUBT_SUMMARIES_COLLECTION, points=points[start:start + 100])
+
+    def compact_doubts(self, cutoff: datetime, summarize: bool) -> int:
+        """
+        Delete every doubt created before `cutoff` in one filtered delete
+        (summarizing their topics per video first). Returns the number deleted.
+        """
+        from qdrant_client.models import DatetimeRange
+
+        expired = Filter(must=[FieldCondition(key="created_at", range=DatetimeRange(lt=cutoff))])
+        count = self.client.count(collection_name=self.index.doubts, count_filter=expired, exact=True).count
+        if count == 0:
+            return 0
+
+        if summarize:
+            self._summarize_doubts(expired)
+        with track_stage("qdrant_delete"):
+            self.client.delete(
+                collection_name=self.index.doubts,
+                points_selector=FilterSelector(filter=expired)
+            )
+        return count
+
+    # Re-indexing helpers
+
+    def _video_ids(self, collection_name: str) -> Set[str]:
+        video_ids = set()
+        next_page_offset = None
+
+        while True:
+            results, next_page_offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=1000,
+                offset=next_page_offset,
+                with_payload=["video_id"]
+            )
+            video_ids.update(point.payload['video_id'] for point in results)
+            if next_page_offset is None:
+                return video_ids
+
+    def list_video_ids(self, index: IndexVersion) -> Set[str]:
+        """Videos that have chunks in an index version"""
+        return self._video_ids(index.chunks)
+
+    def list_transcript_video_ids(self) -> Set[str]:
+        return self._video_ids(settings.TRANSCRIPTS_COLLECTION)
+
+    def copy_points(
+            self,
+            source: IndexVersion,
+            target: IndexVersion,
+            kind: str,
+            text_field: Optional[str],
+            scroll_filter: Optional[Filter] = None,
+            skip_ids: Optional[Set[str]] = None
+    ) -> Set[str]:
+        """
+        Copy the points of one collection kind ("chunks", "doubts", "quiz_pool",
+        "topics") between index versions, keeping point IDs and payloads.
+        Vectors are reused when both versions share the embedding model,
+        otherwise `text_field` is re-encoded with the target encoder.
+        Returns the IDs of the copied points.
+        """
+        source_collection = getattr(source, kind)
+        target_collection = getattr(target, kind)
+        reuse_vectors = source.same_embeddings(target)
+        skip_ids = skip_ids or set()
+
+        copied = set()
+        next_page_offset = None
+
+        while True:
+            results, next_page_offset = self.client.scroll(
+                collection_name=source_collection,
+                scroll_filter=scroll_filter,
+                limit=100,
+                offset=next_page_offset,
+                with_payload=True,
+                with_vectors=reuse_vectors
+            )
+            results = [point for point in results if str(point.id) not in skip_ids]
+
+            if results:
+                if reuse_vectors:
+                    vectors = [point.vector for point in results]
+                else:
+                    vectors = self._encode([point.payload[text_field] for point in results], target).tolist()
+
+                self.client.upsert(
+                    collection_name=target_collection,
+                    points=[
+                        PointStruct(id=point.id, vector=vector, payload=point.payload)
+                        for point, vector in zip(results, vectors)
+                    ]
+                )
+                copied.update(str(point.id) for point in results)
+
+            if next_page_offset is None:
+                return copied
@@ -0,0 +1,134 @@
+"""
+Admission control for LLM-bound endpoints.
+
+Each endpoint gets a concurrency limit and a bounded wait queue, and every
+session may only have a few requests in flight. Work beyond that is rejected
+immediately with 429 (session limit) or 503 (queue full / queue wait too long)
+and a Retry-After header, so the service degrades predictably at saturation.
+
+Usage, as a route dependency:
+
+    @router.get("/sessions/{session_id}/quiz", dependencies=[Depends(admission("quiz"))])
+
+Streaming responses outlive the route function, so they take the slot with
+`hold()` and release it when the stream ends.
+"""
+from collections import defaultdict
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import HTTPException, status
+from prometheus_client import Counter, Gauge
+from app.config import settings
+import asyncio
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "tubeschool_admission_queue_depth",
+    "Requests waiting for an execution slot",
+    ["endpoint"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "tubeschool_admission_in_flight",
+    "Requests currently executing",
+    ["endpoint"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "tubeschool_admission_rejections_total",
+    "Requests rejected by admission control",
+    ["endpoint", "reason"]
+)
+
+
+class AdmissionController:
+    def __init__(self, endpoint: str, max_concurrent: int, max_queue: int):
+        self.endpoint = endpoint
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.active = 0
+        self.session_in_flight = defaultdict(int)
+
+    def _reject(self, reason: str, status_code: int, detail: str):
+        ADMISSION_REJECTIONS.labels(endpoint=self.endpoint, reason=reason).inc()
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SEC)}
+        )
+
+    @asynccontextmanager
+    async def admit(self, session_id: str):
+        """Hold an execution slot for the duration of the request, or reject fast"""
+        if self.session_in_flight.get(session_id, 0) >= settings.ADMISSION_SESSION_IN_FLIGHT:
+            self._reject(
+                "session_limit",
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Too many requests in progress for this session"
+            )
+
+        # Checked and counted before the first await, so concurrent arrivals can't overshoot
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            self._reject(
+                "queue_full",
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Server is busy, please retry shortly"
+            )
+
+        self.session_in_flight[session_id] += 1
+        try:
+            self.waiting += 1
+            ADMISSION_QUEUE_DEPTH.labels(endpoint=self.endpoint).inc()
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=settings.ADMISSION_QUEUE_TIMEOUT_SEC)
+            except asyncio.TimeoutError:
+                self._reject(
+                    "queue_timeout",
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Server is busy, please retry shortly"
+                )
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUE_DEPTH.labels(endpoint=self.endpoint).dec()
+
+            self.active += 1
+            ADMISSION_IN_FLIGHT.labels(endpoint=self.endpoint).inc()
+            try:
+                yield
+            finally:
+                self.active -= 1
+                ADMISSION_IN_FLIGHT.labels(endpoint=self.endpoint).dec()
+                self.semaphore.release()
+        finally:
+            self.session_in_flight[session_id] -= 1
+            if self.session_in_flight[session_id] <= 0:
+                del self.session_in_flight[session_id]
+
+
+controllers = {
+    endpoint: AdmissionController(endpoint, max_concurrent, settings.ADMISSION_QUEUE_SIZE)
+    for endpoint, max_concurrent in settings.ADMISSION_CONCURRENCY.items()
+}
+
+
+def admission(endpoint: str):
+    """Route dependency enforcing the admission limits of an endpoint"""
+    controller = controllers[endpoint]
+
+    async def dependency(session_id: str):
+        async with controller.admit(session_id):
+            yield
+
+    return dependency
+
+
+async def hold(endpoint: str, session_id: str) -> AsyncExitStack:
+    """
+    Admit a request whose work continues after the route returns (streaming).
+    Rejects like `admission()`; the caller releases the slot with `await stack.aclose()`.
+    """
+    stack = AsyncExitStack()
+    await stack.enter_async_context(controllers[endpoint].admit(session_id))
+    return stack
@@ -0,0 +1,174 @@
+"""
+Per-request deadlines and cancellation.
+
+Each LLM-bound request gets a time budget (REQUEST_DEADLINE_SEC per endpoint).
+The Deadline lives in a context variable, so it follows the request into
+run_in_threadpool / iterate_in_threadpool workers, and the services check it
+between units of upstream work (retrieval stages, LLM tokens, grading calls).
+A client disconnect cancels it the same way, so abandoned requests stop
+instead of running to completion.
+
+Usage, as a route dependency:
+
+    @router.get("/sessions/{session_id}/notes", dependencies=[Depends(request_deadline("notes"))])
+
+Streaming routes call `start_deadline()` and `watch_disconnect()` themselves
+and cancel both when the stream ends, since their work outlives the route
+function.
+"""
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Coroutine, Optional, TypeVar
+from fastapi import Request
+from prometheus_client import Counter
+from app.config import settings
+import asyncio
+import threading
+import time
+
+T = TypeVar("T")
+
+REQUESTS_ABORTED = Counter(
+    "tubeschool_requests_aborted_total",
+    "Requests whose upstream work was cut short, by reason (deadline/disconnect)",
+    ["endpoint", "reason"]
+)
+
+
+class RequestAborted(Exception):
+    """The work of the current request was abandoned"""
+    status_code = 503
+    reason = "aborted"
+
+
+class DeadlineExceeded(RequestAborted):
+    status_code = 504
+    reason = "deadline"
+
+
+class ClientDisconnected(RequestAborted):
+    status_code = 499  # Client Closed Request (nginx convention), nobody reads it
+    reason = "disconnect"
+
+
+class Deadline:
+    """Time budget and cancellation flag of one request, safe to check from any thread"""
+
+    def __init__(self, endpoint: str, seconds: Optional[float]):
+        self.endpoint = endpoint
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self._cancelled = threading.Event()
+        self._recorded = False
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, None without a budget"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Stop all remaining work of the request (client gone or response complete)"""
+        self._cancelled.set()
+
+    def check(self):
+        """Raise if the request's work must stop"""
+        if self._cancelled.is_set():
+            self._abort(ClientDisconnected(f"{self.endpoint}: client disconnected"))
+        if self.expired:
+            self._abort(DeadlineExceeded(f"{self.endpoint}: deadline of {self.seconds:g}s exceeded"))
+
+    def _abort(self, error: RequestAborted):
+        if not self._recorded:
+            self._recorded = True
+            REQUESTS_ABORTED.labels(endpoint=self.endpoint, reason=error.reason).inc()
+        raise error
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the current request, None outside of requests (background work)"""
+    return _current.get()
+
+
+def check_deadline():
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def start_deadline(endpoint: str) -> Deadline:
+    """Give the current request the time budget of an endpoint"""
+    deadline = Deadline(endpoint, settings.REQUEST_DEADLINE_SEC.get(endpoint))
+    _current.set(deadline)
+    return deadline
+
+
+def detached(fn: Callable[..., T]) -> Callable[..., T]:
+    """Run fn without the deadline of the request that scheduled it (background work)"""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current.set(None)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return wrapper
+
+
+async def bounded(coro: Coroutine[object, object, T]) -> T:
+    """Await within the remaining time of the current request"""
+    deadline = _current.get()
+    if deadline is None:
+        return await coro
+
+    try:
+        deadline.check()
+    except RequestAborted:
+        coro.close()  # Never started
+        raise
+    try:
+        return await asyncio.wait_for(coro, deadline.remaining())
+    except asyncio.TimeoutError:
+        deadline.check()
+        raise
+
+
+async def _wait_for_disconnect(request: Request, deadline: Deadline):
+    # The body has been read by now, the next message can only be the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            deadline.cancel()
+            return
+
+
+def watch_disconnect(request: Request, deadline: Deadline) -> asyncio.Task:
+    """Cancel the deadline when the client disconnects, until the returned task is cancelled"""
+    return asyncio.create_task(_wait_for_disconnect(request, deadline))
+
+
+def request_deadline(endpoint: str):
+    """Route dependency: endpoint time budget, cancelled when the client disconnects"""
+
+    async def dependency(request: Request):
+        deadline = start_deadline(endpoint)
+        watcher = watch_disconnect(request, deadline)
+        try:
+            yield deadline
+        finally:
+            watcher.cancel()
+
+    return dependency
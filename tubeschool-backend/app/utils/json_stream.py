@@ -0,0 +1,112 @@
+"""
+Incremental JSON parsing of streamed LLM output.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ArrayItemParser:
+    """
+    Yields the objects of a JSON array in a text stream as soon as each one closes.
+
+    The array read is the one under `key` (`{"questions": [{...}, ...]}`), or
+    a top-level array of objects; without a key, the first array whose first
+    element is an object. Other arrays (`"options": ["A", "B"]`, `[5]` in
+    prose) are passed over.
+
+    Works on raw model output: text before the JSON (prose, ```json fences) is
+    skipped, so `{"questions": [{...}, {...}` yields every complete question
+    and a truncated stream only loses the object that was cut off.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string: List[str] = []  # Characters of the string being read
+        self._last_string = None  # Last string read, a key if a colon follows
+        self._value_key = None  # Key of the value about to start
+        self._array_depth = None  # Depth of the target array once it is opened
+        self._needs_object = False  # Target array opened, its first element must be an object
+        self._done = False
+        self._item: List[str] = None  # Characters of the object being read
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume the next piece of text, return the objects it completed"""
+        items = []
+
+        for char in text:
+            if self._done:
+                break
+            if self._item is not None:
+                self._item.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._string)
+                    continue
+                self._string.append(char)
+                continue
+
+            if char.isspace():
+                continue
+            if char == ":" and self._started:
+                self._value_key, self._last_string = self._last_string, None
+                continue
+            value_key, self._value_key, self._last_string = self._value_key, None, None
+
+            if self._needs_object and self._depth == self._array_depth and char != "{":
+                # Not an array of objects: keep looking
+                self._array_depth = None
+                self._needs_object = False
+
+            if char in "{[":
+                self._started = True
+                self._depth += 1
+                if char == "[" and self._array_depth is None:
+                    if self.key is not None and value_key == self.key:
+                        self._array_depth = self._depth
+                    elif self.key is None or self._depth == 1:
+                        self._array_depth = self._depth
+                        self._needs_object = True
+                elif char == "{" and self._item is None and self._array_depth is not None \
+                        and self._depth == self._array_depth + 1:
+                    self._item = [char]
+                    self._needs_object = False
+            elif not self._started:
+                continue  # Prose or fences before the JSON starts
+            elif char == '"':
+                self._in_string = True
+                self._string = []
+            elif char in "}]":
+                if self._array_depth is None:
+                    pass
+                elif char == "}" and self._item is not None and self._depth == self._array_depth + 1:
+                    item = self._parse_item("".join(self._item))
+                    if item is not None:
+                        items.append(item)
+                    self._item = None
+                elif char == "]" and self._depth == self._array_depth:
+                    self._done = True
+                self._depth -= 1
+
+        return items
+
+    @staticmethod
+    def _parse_item(text: str):
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed array item: {e}")
+            return None
+        return item if isinstance(item, dict) else None
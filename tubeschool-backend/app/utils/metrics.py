@@ -0,0 +1,109 @@
+"""
+Prometheus metrics for the TubeSchool pipeline.
+
+Stages are timed with `track_stage`, which works both as a context manager
+and as a decorator:
+
+    with track_stage("qdrant_search"):
+        ...
+"""
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from app.utils.profiling import record_timing, sample_worker
+import os
+import time
+
+# Pipeline stages span sub-millisecond cache lookups to multi-second LLM calls
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_LATENCY = Histogram(
+    "tubeschool_stage_duration_seconds",
+    "Latency of each pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+REQUEST_LATENCY = Histogram(
+    "tubeschool_request_duration_seconds",
+    "End-to-end latency per endpoint",
+    ["method", "endpoint"],
+    buckets=STAGE_BUCKETS
+)
+
+REQUEST_ERRORS = Counter(
+    "tubeschool_request_errors_total",
+    "Error responses per endpoint",
+    ["method", "endpoint", "status"]
+)
+
+LLM_TOKENS = Counter(
+    "tubeschool_llm_tokens_total",
+    "Prompt and completion tokens per LLM call site",
+    ["service", "kind"]
+)
+
+LLM_CALLS = Counter(
+    "tubeschool_llm_calls_total",
+    "LLM calls per call site (hedges and failovers not counted)",
+    ["service"]
+)
+
+LLM_HEDGES = Counter(
+    "tubeschool_llm_hedges_total",
+    "LLM calls hedged to the next provider after a slow first token",
+    ["service"]
+)
+
+LLM_WINS = Counter(
+    "tubeschool_llm_wins_total",
+    "LLM calls answered per provider and attempt (primary, hedge, failover)",
+    ["service", "provider", "attempt"]
+)
+
+LLM_FAILOVERS = Counter(
+    "tubeschool_llm_failovers_total",
+    "LLM provider attempts that failed or were skipped by the circuit breaker",
+    ["provider"]
+)
+
+CACHE_REQUESTS = Counter(
+    "tubeschool_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ["cache", "result"]
+)
+
+SHORT_ANSWER_GRADES = Counter(
+    "tubeschool_short_answer_grades_total",
+    "Short answers graded locally vs by the LLM",
+    ["grader"]
+)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Observe the duration of a pipeline stage (and add it to Server-Timing when profiling)"""
+    start = time.perf_counter()
+    try:
+        with sample_worker():
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=stage).observe(duration)
+        record_timing(stage, duration)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # gunicorn: aggregate the samples written by every worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
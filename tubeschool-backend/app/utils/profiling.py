@@ -0,0 +1,143 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries the PROFILE_HEADER header or is picked by
+PROFILE_SAMPLE_RATE. Profiled requests get a `Server-Timing` header with the
+time spent in each pipeline stage, and when they exceed PROFILE_SLOW_THRESHOLD_SEC
+a sampling-profiler report (pyinstrument, if installed) is written to PROFILE_DIR.
+
+The report covers the event loop and the worker threads the request hands work
+to (run_in_threadpool / asyncio.to_thread): every `track_stage` running off the
+loop is sampled by a profiler of its own thread, merged into the report. For
+streamed responses it is written once the body has been sent.
+
+Unprofiled requests only pay for a header lookup and a random draw.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer
+    from pyinstrument.session import Session
+except ImportError:  # Optional dependency, Server-Timing works without it
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+# Profile of the current request, None when it is not profiled (follows it into worker threads)
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+# Worker threads already sampled by a stage profiler (pyinstrument allows one per thread)
+_sampling = threading.local()
+
+
+def record_timing(stage: str, duration: float):
+    """Attach a stage duration to the current request if it is being profiled"""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.timings.append((stage, duration))
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@contextmanager
+def sample_worker():
+    """Sample this worker thread into the current request's report (no-op unless it is profiled)"""
+    profile = _current_profile.get()
+    if profile is None or profile.profiler is None or getattr(_sampling, "active", False) or _on_event_loop():
+        yield
+        return
+
+    profiler = Profiler(async_mode="disabled")
+    _sampling.active = True
+    profiler.start()
+    try:
+        yield
+    finally:
+        session = profiler.stop()
+        _sampling.active = False
+        profile.worker_sessions.append(session)
+
+
+def should_profile(headers) -> bool:
+    """Profile on explicit request header or for a sampled fraction of traffic"""
+    if headers.get(settings.PROFILE_HEADER):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+class RequestProfile:
+    """Timings (and optionally a sampling profile) of a single request"""
+
+    def __init__(self):
+        self.timings: List[Tuple[str, float]] = []
+        self.profiler = None
+        self.worker_sessions = []  # Samples of the worker threads (see sample_worker)
+        self._token = None
+
+    def start(self):
+        self._token = _current_profile.set(self)
+        if Profiler is not None and settings.PROFILE_DIR:
+            # async_mode only samples this request's task, not its neighbours
+            self.profiler = Profiler(async_mode="enabled")
+            self.profiler.start()
+
+    def stop(self):
+        if self.profiler is not None and self.profiler.is_running:
+            self.profiler.stop()
+        if self._token is not None:
+            try:
+                _current_profile.reset(self._token)
+            except ValueError:
+                pass  # Stopped by the task sending a streamed body, the request's context ends with it
+            self._token = None
+
+    def server_timing(self, total: float) -> str:
+        """Build the Server-Timing header value (durations in milliseconds)"""
+        totals: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        for stage, duration in self.timings:
+            totals[stage] = totals.get(stage, 0.0) + duration
+            counts[stage] = counts.get(stage, 0) + 1
+
+        entries = [
+            f'{stage};dur={seconds * 1000:.1f};desc="x{counts[stage]}"'
+            for stage, seconds in totals.items()
+        ]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def save_report(self, method: str, path: str, total: float) -> Optional[str]:
+        """Write the profiler report for a slow request"""
+        if self.profiler is None or total < settings.PROFILE_SLOW_THRESHOLD_SEC:
+            return None
+
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_') or "root"
+        filename = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}_{method}_{slug}.html"
+        report_path = os.path.join(settings.PROFILE_DIR, filename)
+
+        session = self.profiler.last_session
+        for worker_session in self.worker_sessions:
+            session = Session.combine(session, worker_session)
+        with open(report_path, "w") as f:
+            f.write(HTMLRenderer().render(session))
+
+        logger.warning(f"Slow request {method} {path} ({total:.2f}s), profile saved to {report_path}")
+        return report_path
@@ -0,0 +1,122 @@
+"""
+Timeouts, retries and circuit breaking for calls to slow upstreams.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Tuple, Type
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is currently failing"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+    - closed: calls go through, consecutive failures are counted
+    - open: calls fail fast for `reset_timeout` seconds after `failure_threshold` failures
+    - half-open: one trial call decides between closed and open
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be attempted"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout or self.trial_in_progress:
+                raise CircuitOpenError(self.name, max(self.reset_timeout - elapsed, 1))
+            # Half-open: let this one call through as a trial
+            self.trial_in_progress = True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_progress or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_in_progress:
+                    logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self.trial_in_progress = False
+
+    def abandon_trial(self):
+        """The call was cancelled without an outcome: let the next call be the trial"""
+        with self._lock:
+            self.trial_in_progress = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None
+
+
+def call_with_resilience(
+        fn: Callable,
+        *,
+        executor: ThreadPoolExecutor,
+        breaker: CircuitBreaker,
+        timeout: float,
+        retries: int,
+        backoff: float,
+        permanent_errors: Tuple[Type[BaseException], ...] = ()
+):
+    """
+    Call fn() with a timeout per attempt, bounded retries with exponential
+    backoff (plus jitter) and a circuit breaker.
+
+    Errors in `permanent_errors` are raised immediately and do not count as
+    upstream failures. A timed-out attempt keeps running in its worker thread,
+    so the executor size bounds how many hung calls can pile up.
+    """
+    last_error = None
+
+    for attempt in range(retries + 1):
+        breaker.before_call()
+
+        future = executor.submit(fn)
+        try:
+            result = future.result(timeout=timeout)
+        except permanent_errors:
+            breaker.record_success()  # Upstream answered, the answer is just "no"
+            raise
+        except FutureTimeoutError:
+            future.cancel()
+            last_error = TimeoutError(f"{breaker.name} did not respond within {timeout}s")
+        except Exception as e:
+            last_error = e
+        else:
+            breaker.record_success()
+            return result
+
+        breaker.record_failure()
+        logger.warning(f"{breaker.name} attempt {attempt + 1}/{retries + 1} failed: {last_error}")
+
+        if attempt < retries:
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.5))
+
+    raise last_error
@@ -0,0 +1,148 @@
+"""
+Recall vs latency of cosine retrieval with and without cross-encoder reranking.
+
+    python -m benchmarks.rerank --videos 5 --samples 40
+    python -m benchmarks.rerank --queries labeled.jsonl --candidates 10,20,40 --top-k 1,2,3
+
+Labeled queries are JSONL lines {"video_id": ..., "question": ..., "relevant": [chunk_index, ...]}.
+Without them, queries are sampled from the indexed chunks: a phrase from the
+middle of a chunk is the question and every chunk containing it is relevant.
+Sampled phrases favour lexical overlap, so prefer real questions when available.
+
+Reranking is measured cold (score cache disabled); cached scores cost ~nothing.
+"""
+from app.config import settings
+from app.services.rerank_service import RerankService
+from app.services.vector_service import VectorService
+from dotenv import load_dotenv
+from typing import Dict, List
+import argparse
+import json
+import random
+import time
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+PHRASE_WORDS = 12
+
+
+def sample_queries(vector_service: VectorService, videos: int, samples: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    video_ids = sorted(vector_service.list_video_ids(vector_service.index))
+    queries = []
+
+    for video_id in rng.sample(video_ids, min(videos, len(video_ids))):
+        chunks = vector_service.get_all_video_chunks(video_id)
+        candidates = [c for c in chunks if len(c['text'].split()) >= PHRASE_WORDS * 2]
+
+        for chunk in rng.sample(candidates, min(samples, len(candidates))):
+            words = chunk['text'].split()
+            start = len(words) // 3
+            phrase = " ".join(words[start:start + PHRASE_WORDS])
+            relevant = [c['chunk_index'] for c in chunks if phrase in " ".join(c['text'].split())]
+            queries.append({"video_id": video_id, "question": phrase, "relevant": relevant})
+
+    return queries
+
+
+def load_queries(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def run(vector_service: VectorService, reranker: RerankService, queries: List[Dict],
+        candidates: List[int], top_ks: List[int]) -> List[Dict]:
+    limits = sorted(set(top_ks) | set(candidates))
+    hits = {}  # (method, candidates, k) -> hit count
+    latencies = {}  # (method, candidates) -> seconds per query
+
+    for query in queries:
+        relevant = set(query['relevant'])
+        vector = vector_service.encode_query(query['question'])
+
+        # Qdrant time per fetch size (the over-fetch is part of the rerank cost)
+        results, search_time = {}, {}
+        for limit in limits:
+            started = time.perf_counter()
+            results[limit] = vector_service.search_video_chunks(
+                query['video_id'], query['question'], top_k=limit, query_vector=vector
+            )
+            search_time[limit] = time.perf_counter() - started
+
+        for k in top_ks:
+            found = any(c['chunk_index'] in relevant for c in results[k][:k])
+            hits[("cosine", k, k)] = hits.get(("cosine", k, k), 0) + found
+            latencies.setdefault(("cosine", k), []).append(search_time[k])
+
+        for n in candidates:
+            started = time.perf_counter()
+            ranked = reranker.rerank(query['question'], results[n], max(top_ks))
+            rerank_time = time.perf_counter() - started
+            latencies.setdefault(("rerank", n), []).append(search_time[n] + rerank_time)
+
+            for k in top_ks:
+                found = any(c['chunk_index'] in relevant for c in ranked[:k])
+                hits[("rerank", n, k)] = hits.get(("rerank", n, k), 0) + found
+
+    rows = []
+    for (method, n, k), count in sorted(hits.items()):
+        timings = latencies[(method, n)]
+        rows.append({
+            "method": method,
+            "candidates": n,
+            "top_k": k,
+            "recall": count / len(queries),
+            "p50_ms": percentile(timings, 50),
+            "p95_ms": percentile(timings, 95)
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", help="JSONL file of labeled queries")
+    parser.add_argument("--videos", type=int, default=5, help="Videos to sample queries from")
+    parser.add_argument("--samples", type=int, default=40, help="Sampled queries per video")
+    parser.add_argument("--candidates", default="10,20,40", help="Over-fetch sizes to rerank")
+    parser.add_argument("--top-k", default="1,2,3", help="Cut-offs to report recall at")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print rows as JSON")
+    args = parser.parse_args()
+
+    settings.RERANK_CACHE_SIZE = 0  # Measure cold scoring
+    vector_service = VectorService()
+    reranker = RerankService()
+
+    queries = load_queries(args.queries) if args.queries else \
+        sample_queries(vector_service, args.videos, args.samples, args.seed)
+    if not queries:
+        raise SystemExit("No queries: index some videos or pass --queries")
+
+    candidates = [int(n) for n in args.candidates.split(",")]
+    top_ks = [int(k) for k in args.top_k.split(",")]
+
+    # Load the models before timing anything
+    vector_service.encode_query("warm up")
+    reranker.model.predict([("warm up", "warm up")])
+
+    rows = run(vector_service, reranker, queries, candidates, top_ks)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{len(queries)} queries, embedding {vector_service.index.embedding_model}, reranker {settings.RERANK_MODEL}\n")
+    print(f"{'method':<8} {'cand':>5} {'k':>3} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in rows:
+        print(f"{row['method']:<8} {row['candidates']:>5} {row['top_k']:>3} {row['recall']:>7.3f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
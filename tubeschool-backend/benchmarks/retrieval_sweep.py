@@ -0,0 +1,293 @@
+"""
+Recall, MRR and search latency of chunk retrieval across chunk size, top_k,
+HNSW ef and quantization.
+
+    python -m benchmarks.retrieval_sweep                                   # synthetic corpus, embedded Qdrant
+    python -m benchmarks.retrieval_sweep --corpus store --videos 20 \\
+        --qdrant-url http://localhost:6333 --ef 16,64,256 --quantization none,scalar,binary
+    python -m benchmarks.retrieval_sweep --corpus transcripts.json --questions questions.jsonl --output sweep.json
+
+Corpus: "synthetic" (generated lectures), "store" (transcripts stored by the
+app, read from the configured Qdrant) or a JSON file {video_id: [{"text", "start", "duration"}, ...]}.
+Questions: JSONL lines {"video_id", "question", "start_sec", "end_sec"}, or
+sampled phrases of transcript segments. Ground truth is a time span, so it
+holds for every chunk size: a chunk is relevant if it overlaps the span.
+
+Each (chunk size, quantization) is indexed into its own collection of the
+benchmark Qdrant and searched like search_video_chunks (filtered by video).
+Embedded Qdrant (the default) searches exactly, so ef and quantization only
+matter against a server; with --qdrant-url, collections are HNSW-indexed
+before searching. Per-video searches below Qdrant's full_scan_threshold are
+exact as well, like in production.
+"""
+from app.config import settings
+from app.services.transcript_service import TranscriptService
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    BinaryQuantization, BinaryQuantizationConfig, CollectionStatus, Distance, FieldCondition, Filter,
+    HnswConfigDiff, MatchValue, OptimizersConfigDiff, PayloadSchemaType, PointStruct,
+    QuantizationSearchParams, ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams, VectorParams
+)
+from sentence_transformers import SentenceTransformer
+from youtube_transcript_api import FetchedTranscriptSnippet
+from typing import Dict, List, Optional
+import argparse
+import json
+import random
+import time
+import uuid
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+COLLECTION_PREFIX = "bench_sweep"
+PHRASE_WORDS = 8
+
+TOPICS = {
+    "gradient descent": "gradient descent learning rate step loss minimum slope converge update weights",
+    "photosynthesis": "photosynthesis chlorophyll light leaf glucose carbon dioxide oxygen energy plant",
+    "supply and demand": "supply demand price market equilibrium buyers sellers quantity curve shift",
+    "electric circuits": "circuit current voltage resistance ohm series parallel battery wire charge",
+    "cell division": "cell division mitosis chromosome nucleus spindle phase daughter cells dna",
+    "world war one": "war alliance trench empire treaty front soldiers archduke versailles battle",
+    "probability": "probability event outcome random chance dice coin independent expected value",
+    "plate tectonics": "plate tectonics crust mantle earthquake volcano fault boundary continent drift",
+}
+FILLER = "so now we look at how this works and why it matters in the example here you can see that".split()
+
+
+def synthetic_corpus(videos: int, seed: int) -> Dict[str, List[Dict]]:
+    """Lectures of consecutive topic blocks; segments mix topic terms with filler speech"""
+    rng = random.Random(seed)
+    corpus = {}
+
+    for v in range(videos):
+        topics = rng.sample(list(TOPICS), 4)
+        segments, start = [], 0.0
+        for topic in topics:
+            terms = TOPICS[topic].split()
+            for _ in range(rng.randint(60, 120)):
+                words = [rng.choice(terms) if rng.random() < 0.4 else rng.choice(FILLER) for _ in range(rng.randint(8, 16))]
+                duration = round(rng.uniform(2, 5), 2)
+                segments.append({"text": " ".join(words), "start": round(start, 2), "duration": duration})
+                start += duration
+        corpus[f"synthetic-{v}"] = segments
+
+    return corpus
+
+
+def stored_corpus(videos: int, seed: int) -> Dict[str, List[Dict]]:
+    from app.services.vector_service import VectorService
+
+    vector_service = VectorService()
+    video_ids = sorted(vector_service.list_transcript_video_ids())
+    sample = random.Random(seed).sample(video_ids, min(videos, len(video_ids)))
+    return {video_id: vector_service.get_transcript(video_id) for video_id in sample}
+
+
+def load_corpus(source: str, videos: int, seed: int) -> Dict[str, List[Dict]]:
+    if source == "synthetic":
+        return synthetic_corpus(videos, seed)
+    if source == "store":
+        return stored_corpus(videos, seed)
+    with open(source) as f:
+        return json.load(f)
+
+
+def sample_questions(corpus: Dict[str, List[Dict]], per_video: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    questions = []
+
+    for video_id, segments in corpus.items():
+        candidates = [s for s in segments if len(s['text'].split()) >= PHRASE_WORDS]
+        for segment in rng.sample(candidates, min(per_video, len(candidates))):
+            words = segment['text'].split()
+            start = rng.randint(0, len(words) - PHRASE_WORDS)
+            questions.append({
+                "video_id": video_id,
+                "question": " ".join(words[start:start + PHRASE_WORDS]),
+                "start_sec": segment['start'],
+                "end_sec": segment['start'] + segment['duration']
+            })
+
+    return questions
+
+
+def load_questions(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chunk_corpus(corpus: Dict[str, List[Dict]], chunk_size: int, chunk_overlap: int) -> List[Dict]:
+    chunks = []
+    for video_id, segments in corpus.items():
+        transcript = [FetchedTranscriptSnippet(**segment) for segment in segments]
+        for chunk in TranscriptService.chunk_transcript(transcript, chunk_size, chunk_overlap):
+            chunks.append({"video_id": video_id, **chunk})
+    return chunks
+
+
+def quantization_config(kind: str):
+    if kind == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True))
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def build_collection(client: QdrantClient, name: str, chunks: List[Dict], vectors: np.ndarray,
+                     quantization: str, server: bool):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE),
+        hnsw_config=HnswConfigDiff(m=16, ef_construct=100),
+        # Build the HNSW graph however small the corpus is, so ef has an effect
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=1),
+        quantization_config=quantization_config(quantization)
+    )
+    if server:
+        client.create_payload_index(name, field_name="video_id", field_schema=PayloadSchemaType.KEYWORD)
+
+    points = [
+        PointStruct(id=str(uuid.uuid4()), vector=vector.tolist(), payload=chunk)
+        for chunk, vector in zip(chunks, vectors)
+    ]
+    for start in range(0, len(points), 256):
+        client.upsert(collection_name=name, points=points[start:start + 256], wait=True)
+
+    if server:
+        # Wait for the optimizer to finish indexing before timing searches
+        deadline = time.monotonic() + 600
+        while client.get_collection(name).status != CollectionStatus.GREEN and time.monotonic() < deadline:
+            time.sleep(0.5)
+
+
+def percentile_ms(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def evaluate(client: QdrantClient, name: str, questions: List[Dict], query_vectors: np.ndarray,
+             top_ks: List[int], ef: Optional[int], quantization: str) -> Dict:
+    search_params = None
+    if ef is not None or quantization != "none":
+        search_params = SearchParams(
+            hnsw_ef=ef,
+            quantization=QuantizationSearchParams(rescore=True) if quantization != "none" else None
+        )
+
+    limit = max(top_ks)
+    hits = {k: 0 for k in top_ks}
+    reciprocal_ranks, latencies = [], []
+
+    for question, vector in zip(questions, query_vectors):
+        started = time.perf_counter()
+        results = client.query_points(
+            collection_name=name,
+            query=vector.tolist(),
+            query_filter=Filter(must=[FieldCondition(key="video_id", match=MatchValue(value=question['video_id']))]),
+            limit=limit,
+            search_params=search_params,
+            with_payload=["start_time_sec", "end_time_sec"]
+        ).points
+        latencies.append(time.perf_counter() - started)
+
+        rank = next((
+            position for position, point in enumerate(results, 1)
+            if point.payload['start_time_sec'] < question['end_sec'] and point.payload['end_time_sec'] > question['start_sec']
+        ), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for k in top_ks:
+            hits[k] += rank is not None and rank <= k
+
+    return {
+        **{f"recall@{k}": hits[k] / len(questions) for k in top_ks},
+        f"mrr@{limit}": float(np.mean(reciprocal_ranks)),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p99_ms": percentile_ms(latencies, 99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="synthetic", help='"synthetic", "store" or a JSON transcripts file')
+    parser.add_argument("--questions", help="JSONL file of labeled questions")
+    parser.add_argument("--videos", type=int, default=10, help="Videos to generate or sample")
+    parser.add_argument("--questions-per-video", type=int, default=30)
+    parser.add_argument("--chunk-sizes", default="300,500,800")
+    parser.add_argument("--chunk-overlap", type=int, default=settings.CHUNK_OVERLAP)
+    parser.add_argument("--top-k", default="1,3,5,10")
+    parser.add_argument("--ef", default="16,64,128", help="HNSW ef values (server only)")
+    parser.add_argument("--quantization", default="none,scalar", help="none, scalar, binary (server only)")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--qdrant-url", help="Local Qdrant server; embedded in-memory Qdrant if omitted")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print rows as JSON instead of a table")
+    parser.add_argument("--output", help="Also write the rows as JSON to this file")
+    args = parser.parse_args()
+
+    server = args.qdrant_url is not None
+    client = QdrantClient(url=args.qdrant_url, timeout=60) if server else QdrantClient(location=":memory:")
+
+    chunk_sizes = [int(size) for size in args.chunk_sizes.split(",")]
+    top_ks = sorted(int(k) for k in args.top_k.split(","))
+    ef_values = [int(ef) for ef in args.ef.split(",")] if server else [None]
+    quantizations = args.quantization.split(",") if server else ["none"]
+    if not server:
+        print("Embedded Qdrant searches exactly: sweeping chunk size and top_k only (pass --qdrant-url for ef/quantization)\n")
+
+    corpus = load_corpus(args.corpus, args.videos, args.seed)
+    questions = load_questions(args.questions) if args.questions else \
+        sample_questions(corpus, args.questions_per_video, args.seed)
+    questions = [q for q in questions if q['video_id'] in corpus]
+    if not questions:
+        raise SystemExit("No questions for the corpus")
+
+    encoder = SentenceTransformer(args.model)
+    query_vectors = encoder.encode([q['question'] for q in questions], normalize_embeddings=True)
+
+    rows = []
+    for chunk_size in chunk_sizes:
+        chunks = chunk_corpus(corpus, chunk_size, args.chunk_overlap)
+        vectors = encoder.encode([c['text'] for c in chunks], normalize_embeddings=True)
+
+        for quantization in quantizations:
+            name = f"{COLLECTION_PREFIX}_{chunk_size}_{quantization}"
+            build_collection(client, name, chunks, vectors, quantization, server)
+
+            for ef in ef_values:
+                evaluate(client, name, questions[:20], query_vectors[:20], top_ks, ef, quantization)  # Warm up
+                rows.append({
+                    "chunk_size": chunk_size,
+                    "chunks": len(chunks),
+                    "quantization": quantization,
+                    "ef": ef,
+                    **evaluate(client, name, questions, query_vectors, top_ks, ef, quantization)
+                })
+
+            client.delete_collection(name)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": args.model, "questions": len(questions), "rows": rows}, f, indent=2)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{len(questions)} questions over {len(corpus)} videos, embedding {args.model}\n")
+    metrics = [key for key in rows[0] if key.startswith(("recall@", "mrr@"))]
+    header = f"{'chunk':>6} {'chunks':>7} {'quant':>7} {'ef':>5} " + " ".join(f"{m:>9}" for m in metrics)
+    print(header + f" {'p50 ms':>8} {'p99 ms':>8}")
+    for row in rows:
+        print(f"{row['chunk_size']:>6} {row['chunks']:>7} {row['quantization']:>7} {str(row['ef'] or '-'):>5} "
+              + " ".join(f"{row[m]:>9.3f}" for m in metrics)
+              + f" {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Gunicorn settings for production:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+With EMBEDDING_SERVER_SOCKET set, one shared embedding process is started
+next to the workers, so the model is loaded once per node however many
+workers there are.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Embedded Qdrant (QDRANT_PATH) is owned by a single process
+workers = 1 if os.getenv("QDRANT_PATH") else int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+
+embedding_server = None
+
+
+def on_starting(server):
+    global embedding_server
+    if os.getenv("EMBEDDING_SERVER_SOCKET"):
+        embedding_server = subprocess.Popen([sys.executable, "-m", "app.services.embedding_server"])
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if embedding_server is not None:
+        embedding_server.terminate()
+        embedding_server.wait(timeout=10)
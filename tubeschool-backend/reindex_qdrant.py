@@ -0,0 +1,25 @@
+"""
+Script to re-index Qdrant collections for the current EMBEDDING_MODEL / CHUNK_SIZE / CHUNK_OVERLAP
+The live collections keep serving while the new version is built, then the aliases are switched
+(use this when AUTO_REINDEX is disabled)
+"""
+from app.services.vector_service import VectorService
+from app.services.transcript_service import TranscriptService
+from app.services.reindex_service import ReindexService
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+if __name__ == "__main__":
+    vector_service = VectorService()
+    reindex_service = ReindexService(vector_service, TranscriptService())
+
+    if not reindex_service.pending:
+        print(f"✅ Index version {vector_service.index.version} is already live, nothing to do.")
+    elif not reindex_service.claim():
+        print("❌ Another process is already re-indexing this version.")
+    else:
+        print(f"🔄 Re-indexing {vector_service.index.version} -> {vector_service.target.version}...")
+        reindex_service.run()
+        print("✅ Done! Aliases switched to the new index version.")
@@ -0,0 +1,119 @@
+"""
+Test setup: embedded in-memory Qdrant, a hashing encoder and a word-overlap
+cross-encoder in place of the sentence-transformers models and scripted chat
+models in place of the LLM providers, so the suite runs without any server,
+model download or API key.
+"""
+import os
+
+os.environ["QDRANT_PATH"] = ":memory:"
+os.environ["LLM_PROVIDERS"] = '["google", "huggingface"]'
+
+from datetime import datetime
+from langchain_core.messages import AIMessageChunk
+from qdrant_client import QdrantClient
+import hashlib
+import time
+import numpy as np
+import pytest
+
+import app.services.llm_service as llm_service
+import app.services.rerank_service as rerank_service_module
+import app.services.vector_service as vector_service_module
+from app.config import settings
+from app.models.schemas import UserDoubt
+from app.services.vector_service import VectorService
+
+
+class HashEncoder:
+    """Bag-of-words hashing encoder: 16 dimensions for models named "*small*", 32 otherwise"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.dim = 16 if "small" in model_name else 32
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+
+class OverlapCrossEncoder:
+    """Cross-encoder stand-in: scores a (query, text) pair by the number of shared words"""
+
+    def __init__(self, model_name: str, max_length: int = None):
+        self.model_name = model_name
+        self.predicted = []  # Pairs scored, in order
+
+    def predict(self, pairs, batch_size: int = 32, show_progress_bar: bool = False):
+        self.predicted.extend(pairs)
+        return np.array([
+            len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs
+        ], dtype=np.float32)
+
+
+class ScriptedModel:
+    """Chat model stand-in: waits `delay` seconds, then streams `chunks` (or raises `error`)"""
+
+    def __init__(self, chunks=("ok",), delay: float = 0.0, error: Exception = None):
+        self.chunks = list(chunks)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def stream(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        for chunk in self.chunks:
+            yield AIMessageChunk(content=chunk)
+
+
+def doubt(question: str, session_id: str = "s1", topic: str = None, created_at: datetime = None) -> UserDoubt:
+    fields = {"created_at": created_at} if created_at else {}
+    return UserDoubt(session_id=session_id, video_id="v1", question=question, answer="because", topic=topic, **fields)
+
+
+def stored_doubts(vector_service: VectorService, collection: str):
+    """Doubts written to a collection, by question"""
+    points, _ = vector_service.client.scroll(collection_name=collection, limit=100, with_vectors=True)
+    return {point.payload['question']: point for point in points}
+
+
+vector_service_module.SentenceTransformer = HashEncoder
+rerank_service_module.CrossEncoder = OverlapCrossEncoder
+llm_service.build_chat_model = lambda provider: ScriptedModel()
+
+
+@pytest.fixture
+def qdrant(monkeypatch):
+    """One in-memory Qdrant shared by every VectorService of a test (like processes sharing a server)"""
+    client = QdrantClient(location=":memory:")
+    monkeypatch.setattr(vector_service_module, "QdrantClient", lambda **options: client)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def vector_service(qdrant):
+    return VectorService()
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """LLMService over two scripted providers, without hedging unless a test enables it"""
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", False)
+    service = llm_service.LLMService(
+        providers=["google", "huggingface"],
+        models={"google": ScriptedModel(["primary"]), "huggingface": ScriptedModel(["secondary"])}
+    )
+    yield service
+    service.executor.shutdown(wait=False, cancel_futures=True)
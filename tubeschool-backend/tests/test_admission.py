@@ -0,0 +1,111 @@
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.config import Settings, settings
+from app.utils import admission as admission_module
+from app.utils.admission import AdmissionController, admission
+import asyncio
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_SESSION_IN_FLIGHT", 2)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT_SEC", 5.0)
+    monkeypatch.setattr(settings, "ADMISSION_RETRY_AFTER_SEC", 7)
+
+
+async def occupy(controller: AdmissionController, session_id: str, release: asyncio.Event):
+    async with controller.admit(session_id):
+        await release.wait()
+
+
+async def rejection(controller: AdmissionController, session_id: str) -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        async with controller.admit(session_id):
+            pass
+    assert error.value.headers == {"Retry-After": "7"}
+    return error.value
+
+
+def test_admitted_request_holds_a_slot_until_it_ends():
+    async def scenario():
+        controller = AdmissionController("quiz", max_concurrent=2, max_queue=0)
+        async with controller.admit("s1"):
+            assert controller.active == 1 and controller.session_in_flight == {"s1": 1}
+        assert controller.active == 0 and controller.session_in_flight == {}
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected_with_503():
+    async def scenario():
+        controller = AdmissionController("quiz", max_concurrent=1, max_queue=1)
+        release = asyncio.Event()
+        running = asyncio.create_task(occupy(controller, "s1", release))
+        queued = asyncio.create_task(occupy(controller, "s2", release))
+        await asyncio.sleep(0.01)
+        assert controller.active == 1 and controller.waiting == 1
+
+        assert (await rejection(controller, "s3")).status_code == 503
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert controller.active == 0 and controller.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_wait_past_the_timeout_is_rejected_with_503(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT_SEC", 0.05)
+
+    async def scenario():
+        controller = AdmissionController("quiz", max_concurrent=1, max_queue=1)
+        release = asyncio.Event()
+        running = asyncio.create_task(occupy(controller, "s1", release))
+        await asyncio.sleep(0.01)
+
+        assert (await rejection(controller, "s2")).status_code == 503
+        assert controller.waiting == 0 and controller.session_in_flight == {"s1": 1}
+
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+
+def test_session_over_its_in_flight_limit_is_rejected_with_429():
+    async def scenario():
+        controller = AdmissionController("quiz", max_concurrent=5, max_queue=5)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(occupy(controller, "s1", release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        assert (await rejection(controller, "s1")).status_code == 429
+        async with controller.admit("s2"):
+            pass  # Other sessions are not affected
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_route_dependency_answers_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_SESSION_IN_FLIGHT", 0)
+    app = FastAPI()
+
+    @app.get("/sessions/{session_id}/quiz", dependencies=[Depends(admission("quiz"))])
+    async def quiz(session_id: str):
+        return {}
+
+    response = TestClient(app).get("/sessions/s1/quiz")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_partial_override_keeps_the_other_endpoint_defaults():
+    defaults = Settings.model_fields["ADMISSION_CONCURRENCY"].default
+    overridden = Settings(ADMISSION_CONCURRENCY={"quiz": 1}).ADMISSION_CONCURRENCY
+
+    assert overridden == {**defaults, "quiz": 1}
+    assert set(admission_module.controllers) == set(defaults)
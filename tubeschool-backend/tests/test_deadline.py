@@ -0,0 +1,94 @@
+from app.config import settings
+from app.services.quiz_service import QuizService
+from app.utils.deadline import (
+    ClientDisconnected, Deadline, DeadlineExceeded, bounded, current_deadline, detached, request_deadline, start_deadline
+)
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from tests.conftest import ScriptedModel
+import asyncio
+import contextvars
+import time
+import pytest
+
+
+@pytest.fixture
+def in_request(monkeypatch):
+    """Run a function as a request of an endpoint with the given time budget (in its own context)"""
+    def run(seconds, fn, *args):
+        monkeypatch.setitem(settings.REQUEST_DEADLINE_SEC, "test", seconds)
+        monkeypatch.setattr(settings, "DEADLINE_POLL_SEC", 0.02)
+
+        def request():
+            return fn(start_deadline("test"), *args)
+        return contextvars.copy_context().run(request)
+    return run
+
+
+def test_llm_call_stops_at_the_deadline(llm, in_request):
+    llm.models["google"] = ScriptedModel(["late"], delay=2.0)
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        in_request(0.1, lambda deadline: llm.invoke("prompt"))
+    assert time.perf_counter() - started < 1.0
+
+
+def test_llm_call_stops_when_the_client_disconnects(llm, in_request):
+    llm.models["google"] = ScriptedModel(["late"], delay=2.0)
+
+    def disconnect_then_call(deadline):
+        deadline.cancel()
+        return llm.invoke("prompt")
+
+    with pytest.raises(ClientDisconnected):
+        in_request(5.0, disconnect_then_call)
+
+
+def test_bounded_await_stops_at_the_deadline(in_request):
+    async def slow():
+        await asyncio.sleep(2)
+
+    with pytest.raises(DeadlineExceeded):
+        in_request(0.05, lambda deadline: asyncio.run(bounded(slow())))
+
+
+def test_detached_work_has_no_deadline(in_request):
+    assert in_request(5.0, lambda deadline: detached(current_deadline)()) is None
+
+
+def test_short_answers_left_at_the_deadline_are_pending(llm, in_request):
+    llm.models["google"] = ScriptedModel(['{"is_correct": true, "explanation": "ok"}'], delay=2.0)
+    quiz_service = QuizService()
+    quiz_service.model = llm
+    questions = [
+        {"question_id": "q1", "question_text": "Pick", "question_type": "mcq", "correct_answer": "A"},
+        {"question_id": "q2", "question_text": "Explain gravity", "question_type": "short_answer",
+         "correct_answer": "Mass attracts mass"},
+    ]
+    answers = [{"question_id": "q1", "answer": "A"}, {"question_id": "q2", "answer": "Things fall down"}]
+
+    result = in_request(0.1, lambda deadline: quiz_service.evaluate_quiz(questions, answers))
+
+    assert result["pending_answers"] == 1
+    assert result["correct_answers"] == 1
+    assert [item["is_correct"] for item in result["feedback"]] == [True, None]
+
+
+def test_endpoint_without_a_budget_never_expires():
+    deadline = Deadline("unbudgeted", None)
+    deadline.check()
+    assert deadline.remaining() is None and not deadline.expired
+
+
+def test_route_deadline_reaches_the_worker_thread(monkeypatch):
+    monkeypatch.setitem(settings.REQUEST_DEADLINE_SEC, "test", 30)
+    app = FastAPI()
+
+    @app.get("/work", dependencies=[Depends(request_deadline("test"))])
+    def work():
+        deadline = current_deadline()
+        return {"endpoint": deadline.endpoint, "remaining": deadline.remaining()}
+
+    body = TestClient(app).get("/work").json()
+    assert body["endpoint"] == "test" and 0 < body["remaining"] <= 30
+
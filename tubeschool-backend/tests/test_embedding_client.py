@@ -0,0 +1,98 @@
+from app.config import settings
+from app.services.embedding_client import _LENGTH, _frame, RemoteEncoder
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import numpy as np
+import pytest
+
+
+class FakeEmbeddingServer:
+    """Unix socket server answering each connection with a scripted behaviour ("close", "hang" or "serve")"""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.connections = 0
+        self.requests = 0
+        self.path = tempfile.mktemp(prefix="emb-", suffix=".sock", dir="/tmp")
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen()
+        self.stopped = threading.Event()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            behaviour = self.behaviours[min(self.connections, len(self.behaviours) - 1)]
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn, behaviour), daemon=True).start()
+
+    def _serve(self, conn: socket.socket, behaviour: str):
+        with conn:
+            while True:
+                header = conn.recv(_LENGTH.size)
+                if not header:
+                    return
+                request = json.loads(conn.recv(_LENGTH.unpack(header)[0]))
+                self.requests += 1
+                if behaviour == "close":
+                    return
+                if behaviour == "hang":
+                    self.stopped.wait(5)
+                    return
+                vectors = np.ones((len(request["texts"]), 4), dtype=np.float32)
+                conn.sendall(_frame(json.dumps({"ok": True, "shape": list(vectors.shape)}).encode()))
+                conn.sendall(_frame(vectors.tobytes()))
+
+    def stop(self):
+        self.stopped.set()
+        self.listener.close()
+        os.unlink(self.path)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_SERVER_TIMEOUT_SEC", 0.3)
+    servers = []
+
+    def start(*behaviours):
+        servers.append(FakeEmbeddingServer(*behaviours))
+        return servers[-1]
+    yield start
+    for fake in servers:
+        fake.stop()
+
+
+def test_encode_over_the_socket(server):
+    fake = server("serve")
+    vectors = RemoteEncoder("model", fake.path).encode(["a", "b"])
+    assert vectors.shape == (2, 4)
+
+
+def test_stale_connection_is_reconnected_once(server):
+    fake = server("close", "serve")
+    assert RemoteEncoder("model", fake.path).encode("a").shape == (4,)
+    assert fake.connections == 2
+
+
+def test_timed_out_request_is_not_resent(server):
+    fake = server("hang")
+    encoder = RemoteEncoder("model", fake.path)
+    with pytest.raises(TimeoutError):
+        encoder.encode(["a"])
+    assert fake.requests == 1
+    assert encoder._local.sock is None  # A late answer must not be read by the next call
+
+
+def test_client_does_not_import_the_model_runtime():
+    code = "import sys, app.services.embedding_client; print('sentence_transformers' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
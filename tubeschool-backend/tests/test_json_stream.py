@@ -0,0 +1,57 @@
+from app.utils.json_stream import ArrayItemParser
+import json
+import pytest
+
+QUESTION = {"question_text": 'What does "[x]" mean?', "options": ["A", "B"], "correct_answer": "A"}
+
+
+def feed_in_pieces(parser: ArrayItemParser, text: str, size: int):
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 2, 7])
+def test_array_items_are_yielded_as_they_close(size):
+    text = 'Sure, here is [1] quiz:\n```json\n{"topics": ["a", "b"], "questions": [' \
+           + json.dumps(QUESTION) + ", " + json.dumps(QUESTION) + "]}\n```"
+    assert feed_in_pieces(ArrayItemParser("questions"), text, size) == [QUESTION, QUESTION]
+
+
+def test_each_item_is_returned_by_the_piece_that_closes_it():
+    parser = ArrayItemParser("questions")
+    first = '{"questions": [' + json.dumps(QUESTION)
+    assert parser.feed(first[:-1]) == []
+    assert parser.feed(first[-1]) == [QUESTION]
+
+
+def test_truncated_stream_only_loses_the_open_item():
+    text = '{"questions": [' + json.dumps(QUESTION) + ', {"question_text": "cut off'
+    assert feed_in_pieces(ArrayItemParser("questions"), text, 3) == [QUESTION]
+
+
+def test_keyed_parser_skips_other_arrays_of_objects():
+    text = '{"sources": [{"chunk": 1}], "questions": [' + json.dumps(QUESTION) + "]}"
+    assert feed_in_pieces(ArrayItemParser("questions"), text, 4) == [QUESTION]
+
+
+def test_keyed_parser_accepts_a_top_level_array():
+    assert ArrayItemParser("questions").feed("[" + json.dumps(QUESTION) + "]") == [QUESTION]
+
+
+def test_unkeyed_parser_skips_arrays_of_scalars():
+    text = 'Pick from [1, 2]: {"options": ["A"], "items": [' + json.dumps(QUESTION) + "]}"
+    assert feed_in_pieces(ArrayItemParser(), text, 1) == [QUESTION]
+
+
+@pytest.mark.parametrize("size", [1, 3])
+def test_braces_and_escaped_quotes_in_strings_do_not_end_an_item(size):
+    question = {"question_text": 'Is "{" balanced by "}\\"?', "explanation": {"why": ["nested", "[ok]"]}}
+    text = '{"questions": [' + json.dumps(question) + "]}"
+    assert feed_in_pieces(ArrayItemParser("questions"), text, size) == [question]
+
+
+def test_text_after_the_array_is_ignored():
+    text = '{"questions": [' + json.dumps(QUESTION) + ']} and also [{"question_text": "extra"}]'
+    assert feed_in_pieces(ArrayItemParser("questions"), text, 5) == [QUESTION]
@@ -0,0 +1,83 @@
+from app.config import settings
+from tests.conftest import ScriptedModel
+import pytest
+
+
+def answer(llm, label: str = "test") -> str:
+    return llm.invoke("prompt", label=label).content
+
+
+def test_first_provider_answers(llm):
+    assert answer(llm) == "primary"
+    assert llm.models["huggingface"].calls == 0
+
+
+def test_failure_before_the_first_token_fails_over(llm):
+    llm.models["google"] = ScriptedModel(error=RuntimeError("quota"))
+    assert answer(llm) == "secondary"
+    assert llm.stats()["failovers"] == 1
+
+
+def test_error_is_raised_when_every_provider_fails(llm):
+    llm.models["google"] = ScriptedModel(error=RuntimeError("quota"))
+    llm.models["huggingface"] = ScriptedModel(error=RuntimeError("down"))
+    with pytest.raises(RuntimeError, match="down"):
+        answer(llm)
+
+
+def test_open_circuit_skips_the_provider(llm):
+    llm.models["google"] = ScriptedModel(error=RuntimeError("quota"))
+    for _ in range(llm.breakers["google"].failure_threshold):
+        answer(llm)
+
+    calls = llm.models["google"].calls
+    assert answer(llm) == "secondary"
+    assert llm.models["google"].calls == calls
+
+
+def test_slow_first_token_is_hedged_to_the_next_provider(llm, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 3)
+    for _ in range(3):
+        llm._observe("google", "test", 0.05)
+    assert llm.hedge_delay("google", "test") == pytest.approx(0.05)
+
+    llm.models["google"] = ScriptedModel(["late"], delay=1.0)
+    assert answer(llm) == "secondary"
+
+    stats = llm.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert {p["provider"]: p["wins"] for p in stats["providers"]} == {"google": 0, "huggingface": 1}
+
+
+def test_no_hedge_before_enough_samples(llm, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    llm.models["google"] = ScriptedModel(["slow"], delay=0.2)
+    assert llm.hedge_delay("google", "test") is None
+    assert answer(llm) == "slow"
+    assert llm.stats()["hedged"] == 0
+
+
+class BrokenMidStream(ScriptedModel):
+    """Streams its chunks, then fails"""
+
+    def stream(self, prompt):
+        yield from super().stream(prompt)
+        raise ConnectionError("stream reset")
+
+
+def test_failure_after_the_first_token_is_raised_not_failed_over(llm):
+    llm.models["google"] = BrokenMidStream(["half an ans"])
+    received = []
+    with pytest.raises(ConnectionError):
+        for chunk in llm.stream("prompt", label="test"):
+            received.append(chunk.content)
+    assert received == ["half an ans"]  # No second answer spliced in
+    assert llm.models["huggingface"].calls == 0
+
+
+def test_empty_answer_wins_without_failover(llm):
+    llm.models["google"] = ScriptedModel([])
+    assert answer(llm) == ""
+    assert llm.models["huggingface"].calls == 0
+
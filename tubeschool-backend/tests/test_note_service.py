@@ -0,0 +1,35 @@
+from app.services.note_service import FenceStripper
+import pytest
+
+
+def strip_in_pieces(text: str, size: int) -> str:
+    stripper = FenceStripper()
+    out = "".join(stripper.feed(text[start:start + size]) for start in range(0, len(text), size))
+    return out + stripper.finish()
+
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+def test_fence_around_the_output_is_removed(size):
+    text = "```markdown\n# Notes\n\nUse `x` here.\n```"
+    assert strip_in_pieces(text, size) == "# Notes\n\nUse `x` here."
+
+
+@pytest.mark.parametrize("size", [1, 3])
+def test_unfenced_output_is_kept(size):
+    text = "# Notes\n\nInline ``code`` stays"
+    assert strip_in_pieces(text, size) == text
+
+
+def test_held_back_backticks_are_released_when_not_a_fence():
+    stripper = FenceStripper()
+    assert stripper.feed("# Notes\nA ``") == "# Notes\nA"
+    assert stripper.feed("b`` c") == " ``b`` c"
+
+
+@pytest.mark.parametrize("size", [1, 4])
+def test_fence_without_a_language_tag_is_removed(size):
+    assert strip_in_pieces("```\n## Summary\n- point\n```\n", size) == "## Summary\n- point"
+
+
+def test_output_of_only_a_fence_is_empty():
+    assert strip_in_pieces("```markdown\n```", 2) == ""
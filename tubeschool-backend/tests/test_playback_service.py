@@ -0,0 +1,107 @@
+from app.config import settings
+from app.services.playback_service import PlaybackContext
+from app.services.vector_service import VectorService
+import asyncio
+import pytest
+
+TOPICS = ["gravity", "orbits", "tides", "light", "energy", "waves", "atoms", "heat", "sound", "fields"]
+
+
+@pytest.fixture
+def lecture(vector_service, monkeypatch):
+    """A 1000 s video with one 10 s chunk per step, each about its own subject"""
+    monkeypatch.setattr(settings, "PLAYBACK_WINDOW_BEHIND_SEC", 60)
+    monkeypatch.setattr(settings, "PLAYBACK_WINDOW_AHEAD_SEC", 20)
+    monkeypatch.setattr(settings, "PLAYBACK_MAX_CHUNKS", 40)
+    chunks = [
+        {"chunk_index": i, "text": f"{TOPICS[i % 10]} part{i} lesson{i}", "start_time_sec": i * 10.0,
+         "end_time_sec": i * 10.0 + 10}
+        for i in range(100)
+    ]
+    vector_service.store_video_chunks("v1", chunks)
+    return vector_service
+
+
+def play(context: PlaybackContext, *positions: float):
+    """Send heartbeats and wait for the window load they started"""
+    async def heartbeats():
+        for position in positions:
+            context.move(position)
+            if context._refresh is not None:
+                await context._refresh
+    asyncio.run(heartbeats())
+
+
+def query(vector_service, text: str):
+    return vector_service._encode(text).tolist()
+
+
+def test_window_covers_the_playhead(lecture):
+    context = PlaybackContext(lecture, "v1", top_k=2)
+    play(context, 500)
+    starts = [c['start_time_sec'] for c in context.chunks]
+    assert min(starts) == 430 and max(starts) == 520  # Overlapping [440, 520]
+    assert context.search(query(lecture, "tides part52 lesson52"))[0]['chunk_index'] == 52
+
+
+def test_window_reloads_only_after_moving_half_the_lookahead(lecture):
+    context = PlaybackContext(lecture, "v1", top_k=2)
+    play(context, 500, 505)
+    assert context.loaded_position == 500
+
+    play(context, 510)
+    assert context.loaded_position == 510
+
+
+def test_window_is_trimmed_to_the_chunks_closest_to_the_playhead(lecture, monkeypatch):
+    monkeypatch.setattr(settings, "PLAYBACK_MAX_CHUNKS", 5)
+    context = PlaybackContext(lecture, "v1", top_k=2)
+    play(context, 505)  # Window of 9 chunks, 44 to 52
+    assert [c['chunk_index'] for c in context.chunks] == [48, 49, 50, 51, 52]
+
+
+def test_question_outside_the_window_is_a_miss(lecture, monkeypatch):
+    monkeypatch.setattr(settings, "PLAYBACK_MIN_SCORE", 0.5)
+    context = PlaybackContext(lecture, "v1", top_k=2)
+    assert context.search(query(lecture, "gravity part0 lesson0")) is None  # Cold window
+
+    play(context, 500)
+    assert context.search(query(lecture, "gravity part0 lesson0")) is None
+    assert context.search(query(lecture, "gravity part50 lesson50"))[0]['chunk_index'] == 50
+
+
+def test_window_of_a_retired_index_version_is_not_used(lecture, monkeypatch):
+    context = PlaybackContext(lecture, "v1", top_k=2)
+    play(context, 500)
+
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "hash-small")
+    new_process = VectorService()
+    new_process.ensure_index_collections(new_process.target)
+    new_process.switch_index(new_process.target)
+    assert lecture.refresh_index()
+
+    assert context.search([1.0] * 16) is None
+    play(context, 500)
+    assert context.index_version == lecture.index.version
+
+
+def test_assembled_contexts_are_cached_per_selection(lecture, monkeypatch):
+    monkeypatch.setattr(settings, "PLAYBACK_CONTEXT_CACHE_SIZE", 2)
+    context = PlaybackContext(lecture, "v1", top_k=1)
+    assembled = []
+    assemble = context.context_service.assemble
+    monkeypatch.setattr(context.context_service, "assemble",
+                        lambda chunks, **kwargs: assembled.append(len(chunks)) or assemble(chunks, **kwargs))
+    play(context, 500)
+    first, second, third = ([c] for c in context.chunks[:3])
+
+    context.assembled(first)
+    context.assembled(second)  # Evicts the playhead selection assembled by the load
+    context.assembled(first)  # Hit, and now the most recently used
+    context.assembled(third)  # Evicts second
+    context.assembled(first)
+    assert len(assembled) == 4
+
+    segments = context.assembled(first)
+    segments[0]['text'] = "annotated"
+    assert context.assembled(first)[0]['text'] != "annotated"
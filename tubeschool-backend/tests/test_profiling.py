@@ -0,0 +1,66 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.utils.metrics import track_stage
+from app.utils.profiling import RequestProfile
+import asyncio
+import glob
+import time
+import pytest
+
+pytest.importorskip("pyinstrument")
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILE_SLOW_THRESHOLD_SEC", 0.0)
+    return tmp_path
+
+
+def repair_json_slowly():
+    with track_stage("json_parse"):
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+
+def test_stage_in_a_worker_thread_is_in_the_report(profile_dir):
+    async def request():
+        profile = RequestProfile()
+        profile.start()
+        await asyncio.to_thread(repair_json_slowly)
+        profile.stop()
+        return profile
+
+    profile = asyncio.run(request())
+    assert [stage for stage, _ in profile.timings] == ["json_parse"]
+    assert len(profile.worker_sessions) == 1
+
+    report = profile.save_report("GET", "/quiz", total=1.0)
+    assert "repair_json_slowly" in open(report).read()
+
+
+def test_streamed_response_is_profiled_until_the_body_is_sent(profile_dir):
+    from app.main import profile_requests
+
+    app = FastAPI()
+    app.middleware("http")(profile_requests)
+
+    def tokens():
+        yield "first "
+        repair_json_slowly()
+        yield "last"
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(tokens())
+
+    response = TestClient(app).get("/stream", headers={settings.PROFILE_HEADER: "1"})
+    assert response.text == "first last"
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+    reports = glob.glob(str(profile_dir / "*_GET_stream.html"))
+    assert len(reports) == 1
+    assert "repair_json_slowly" in open(reports[0]).read()
@@ -0,0 +1,69 @@
+from app.config import settings
+from app.services.quiz_service import QuizService
+from app.services.vector_service import IndexVersion
+from tests.conftest import HashEncoder, ScriptedModel
+import pytest
+
+EXPECTED = "mass attracts mass"
+
+
+@pytest.fixture
+def quiz_service(vector_service, llm):
+    service = QuizService(vector_service)
+    service.model = llm
+    return service
+
+
+def short_answer(question_id: str = "q1") -> dict:
+    return {"question_id": question_id, "question_text": "Explain gravity", "question_type": "short_answer",
+            "correct_answer": EXPECTED}
+
+
+def pregrade(quiz_service: QuizService, answer: str):
+    return quiz_service._pregrade_short_answers([short_answer()], {"q1": answer}).get("q1")
+
+
+def similarity(a: str, b: str) -> float:
+    encoder = HashEncoder("test")
+    return float(encoder.encode(a) @ encoder.encode(b))
+
+
+def test_close_answer_is_accepted_locally(quiz_service):
+    assert pregrade(quiz_service, "Mass attracts mass")[0] is True
+
+
+def test_unrelated_answer_is_rejected_locally(quiz_service):
+    answer = "photosynthesis"
+    assert similarity(answer, EXPECTED) <= settings.SHORT_ANSWER_REJECT_THRESHOLD
+    is_correct, explanation = pregrade(quiz_service, answer)
+    assert is_correct is False and EXPECTED in explanation
+
+
+def test_missing_answer_is_rejected_without_encoding(quiz_service):
+    assert pregrade(quiz_service, "  ") == (False, "No answer was provided.")
+
+
+def test_borderline_answer_goes_to_the_llm(quiz_service, llm):
+    answer = "every mass pulls on other objects"
+    assert settings.SHORT_ANSWER_REJECT_THRESHOLD < similarity(answer, EXPECTED) < settings.SHORT_ANSWER_ACCEPT_THRESHOLD
+    assert pregrade(quiz_service, answer) is None
+
+    llm.models["google"] = ScriptedModel(['{"is_correct": true, "explanation": "Right idea"}'])
+    result = quiz_service.evaluate_quiz([short_answer()], [{"question_id": "q1", "answer": answer}])
+    assert llm.models["google"].calls == 1
+    assert result["feedback"][0]["is_correct"] is True
+    assert result["grading_stats"]["graded_locally"] == 0
+
+
+def test_pregrading_uses_the_encoder_of_the_live_index(quiz_service, vector_service):
+    new_index = IndexVersion("vsmall", "hash-small", 500, 50, HashEncoder("hash-small"))
+    vector_service.ensure_index_collections(new_index)
+    vector_service.switch_index(new_index)
+
+    assert quiz_service.encoder is new_index.encoder
+    assert pregrade(quiz_service, "Mass attracts mass")[0] is True
+
+
+def test_without_an_encoder_every_answer_goes_to_the_llm(llm):
+    quiz_service = QuizService()
+    assert quiz_service._pregrade_short_answers([short_answer()], {"q1": EXPECTED}) == {}
@@ -0,0 +1,114 @@
+from youtube_transcript_api import FetchedTranscriptSnippet
+from app.config import settings
+from app.services import reindex_service as reindex_module
+from app.services.reindex_service import ReindexService
+from app.services.transcript_service import TranscriptService
+from app.services.vector_service import VectorService
+from tests.conftest import doubt, stored_doubts
+import pytest
+
+
+def lecture(video_id: str, sentences: int = 30):
+    return [
+        FetchedTranscriptSnippet(text=f"sentence {i} of {video_id} about gravity", start=i * 2.0, duration=2.0)
+        for i in range(sentences)
+    ]
+
+
+class LectureSource:
+    """Transcript source serving a generated lecture for every video"""
+
+    def __init__(self):
+        self.fetched = []
+
+    def fetch(self, video_id, languages, preserve_formatting):
+        self.fetched.append(video_id)
+        return lecture(video_id)
+
+
+def store_video_without_transcript(vector_service, video_id: str):
+    """A video ingested before transcripts were stored"""
+    vector_service.store_video_chunks(video_id, TranscriptService.chunk_transcript(lecture(video_id)))
+
+
+def reindex(monkeypatch, source, **config) -> VectorService:
+    """Run the re-index of a deployment with the given settings, return its process"""
+    monkeypatch.setattr(settings, "INDEX_POLL_INTERVAL_SEC", 0)
+    for name, value in config.items():
+        monkeypatch.setattr(settings, name, value)
+    process = VectorService()
+    reindexer = ReindexService(process, TranscriptService(source=source))
+    assert reindexer.pending and reindexer.claim()
+    reindexer.run()
+    reindexer.transcript_service.executor.shutdown(wait=False)
+    return process
+
+
+def test_doubt_buffered_across_a_reindex_switch_lands_in_the_new_index(vector_service, monkeypatch):
+    transcript = [FetchedTranscriptSnippet(text=f"sentence {i} about gravity", start=i * 2.0, duration=2.0) for i in range(30)]
+    vector_service.store_transcript("v1", transcript)
+    vector_service.store_video_chunks("v1", TranscriptService.chunk_transcript(transcript))
+    vector_service.store_user_doubt(doubt("what is gravity"))
+    vector_service.flush_doubts()
+    old_index = vector_service.index
+
+    # A new deployment with another embedding model re-indexes and switches
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "hash-small")
+    monkeypatch.setattr(settings, "INDEX_POLL_INTERVAL_SEC", 0)
+    new_process = VectorService()
+    reindexer = ReindexService(new_process, TranscriptService(source=object()))
+    assert reindexer.pending and reindexer.claim()
+
+    # Asked on the old process while the re-index runs, flushed after it followed the switch
+    vector_service.store_user_doubt(doubt("what is mass"))
+    reindexer.run()
+    assert new_process.index.version != old_index.version
+    assert vector_service.refresh_index()
+    vector_service.flush_doubts()
+
+    doubts = stored_doubts(new_process, new_process.index.doubts)
+    assert set(doubts) == {"what is gravity", "what is mass"}
+    assert all(len(point.vector) == 16 for point in doubts.values())
+    assert {d['question'] for d in new_process.get_session_doubts("s1")} == {"what is gravity", "what is mass"}
+    assert new_process.get_all_video_chunks("v1")
+
+
+def test_served_index_version_cannot_be_dropped(vector_service, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "hash-small")
+    new_process = VectorService()
+    old_version = vector_service.index.version
+    new_process.ensure_index_collections(new_process.target)
+    new_process.switch_index(new_process.target)
+
+    vector_service.register_process("old-worker", started_at=0)
+    with pytest.raises(ValueError, match="still served"):
+        new_process.drop_index_version(old_version)
+
+    vector_service.refresh_index()
+    vector_service.register_process("old-worker", started_at=0)
+    new_process.drop_index_version(old_version)
+
+
+def test_model_change_copies_chunks_without_refetching(vector_service, monkeypatch):
+    store_video_without_transcript(vector_service, "v1")
+    old_chunks = vector_service.get_all_video_chunks("v1")
+
+    new_process = reindex(monkeypatch, source=object(), EMBEDDING_MODEL="hash-small")
+    chunks, vectors = new_process.get_chunk_vectors("v1")
+    assert [chunk['text'] for chunk in chunks] == [chunk['text'] for chunk in old_chunks]
+    assert vectors.shape == (len(chunks), 16)
+
+
+def test_chunking_change_refetches_missing_transcripts_paced(vector_service, monkeypatch):
+    for video_id in ("v1", "v2", "v3"):
+        store_video_without_transcript(vector_service, video_id)
+    monkeypatch.setattr(settings, "REINDEX_FETCH_INTERVAL_SEC", 60.0)
+    slept = []
+    monkeypatch.setattr(reindex_module.time, "sleep", slept.append)
+
+    source = LectureSource()
+    new_process = reindex(monkeypatch, source, CHUNK_SIZE=200)
+    assert source.fetched == ["v1", "v2", "v3"]
+    assert len([wait for wait in slept if wait > 50]) == 2  # Between the three fetches only
+    assert new_process.get_transcript("v1") is not None
+    assert all(len(chunk['text']) < 300 for chunk in new_process.get_all_video_chunks("v1"))
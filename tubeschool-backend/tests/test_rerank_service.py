@@ -0,0 +1,47 @@
+from app.config import settings
+from app.services.rerank_service import RerankService
+import pytest
+
+QUERY = "why does the moon orbit the earth"
+
+
+@pytest.fixture
+def reranker():
+    return RerankService()
+
+
+def chunk(text: str) -> dict:
+    return {"text": text, "chunk_index": 0}
+
+
+def test_rerank_keeps_the_top_k_by_score(reranker):
+    chunks = [chunk("a recipe for bread"), chunk("the moon and the earth"), chunk("why the moon does orbit the earth")]
+    ranked = reranker.rerank(QUERY, chunks, top_k=2)
+    assert [c['text'] for c in ranked] == ["why the moon does orbit the earth", "the moon and the earth"]
+    assert ranked[0]['rerank_score'] > ranked[1]['rerank_score']
+
+
+def test_no_chunks_need_no_model_call(reranker):
+    assert reranker.rerank(QUERY, [], top_k=2) == []
+    assert reranker.model.predicted == []
+
+
+def test_cached_scores_are_not_predicted_again(reranker):
+    first = reranker.score(QUERY, ["the moon", "the earth"])
+    second = reranker.score(QUERY, ["the earth", "the moon", "the sun"])
+    assert second[:2] == [first[1], first[0]]
+    assert reranker.model.predicted == [(QUERY, "the moon"), (QUERY, "the earth"), (QUERY, "the sun")]
+
+    reranker.score("another question", ["the moon"])  # Cached per (question, text)
+    assert reranker.model.predicted[-1] == ("another question", "the moon")
+
+
+def test_least_recently_used_scores_are_evicted(reranker, monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_CACHE_SIZE", 2)
+    reranker.score(QUERY, ["a", "b"])
+    reranker.score(QUERY, ["a"])  # "a" is used again, so "b" is the oldest
+    reranker.score(QUERY, ["c"])
+    reranker.model.predicted.clear()
+
+    reranker.score(QUERY, ["a", "b", "c"])
+    assert reranker.model.predicted == [(QUERY, "b")]
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+from app.config import settings
+from app.services.retention_service import RetentionService
+from tests.conftest import doubt, stored_doubts
+import time
+
+
+def process(process_id: str, started_at: float) -> dict:
+    return {"process_id": process_id, "started_at": started_at}
+
+
+def test_compact_doubts_deletes_old_doubts_and_keeps_their_topic_counts(vector_service):
+    now = datetime.now(timezone.utc)
+    vector_service.store_user_doubt(doubt("old one", topic="Gravity", created_at=now - timedelta(days=40)))
+    vector_service.store_user_doubt(doubt("old two", topic="Gravity", created_at=now - timedelta(days=35)))
+    vector_service.store_user_doubt(doubt("old three", topic="Mass", created_at=now - timedelta(days=31)))
+    vector_service.store_user_doubt(doubt("recent", topic="Gravity", created_at=now))
+    vector_service.flush_doubts()
+
+    assert vector_service.compact_doubts(now - timedelta(days=30), summarize=True) == 3
+    assert set(stored_doubts(vector_service, vector_service.index.doubts)) == {"recent"}
+
+    summary = vector_service.get_doubt_summary("v1")
+    assert summary["doubts"] == 3
+    assert summary["topics"] == {"Gravity": 2, "Mass": 1}
+    assert vector_service.compact_doubts(now - timedelta(days=30), summarize=True) == 0
+
+
+def test_only_the_oldest_live_process_compacts(vector_service):
+    younger, oldest = RetentionService(vector_service), RetentionService(vector_service)
+    oldest.started_at = younger.started_at - 60
+    younger.heartbeat()
+    oldest.heartbeat()
+
+    vector_service.store_user_doubt(doubt("expired", created_at=datetime.now(timezone.utc) - timedelta(days=90)))
+    assert younger.compact() == 0
+    assert oldest.compact() == 1  # Still buffered: flushed before the delete
+    assert oldest.last_compaction["deleted"] == 1
+    assert stored_doubts(vector_service, vector_service.index.doubts) == {}
+
+
+def test_cutoff_is_the_later_of_ttl_and_orphan_cutoffs(monkeypatch):
+    monkeypatch.setattr(settings, "DOUBT_TTL_DAYS", 30)
+    monkeypatch.setattr(settings, "DOUBT_COMPACT_ORPHANS", True)
+    monkeypatch.setattr(settings, "DOUBT_ORPHAN_GRACE_SEC", 3600)
+    now = time.time()
+
+    # Long-running processes: the TTL cutoff is the later one
+    ttl_cutoff = RetentionService.cutoff([process("a", now - 90 * 86400)]).timestamp()
+    assert abs(ttl_cutoff - (now - 30 * 86400)) < 5
+    # After a restart, doubts older than the oldest process (minus the grace period) are orphaned
+    orphan_cutoff = RetentionService.cutoff([process("a", now - 600), process("b", now - 60)]).timestamp()
+    assert abs(orphan_cutoff - (now - 600 - 3600)) < 5
+
+
+def test_retention_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "DOUBT_TTL_DAYS", 0)
+    monkeypatch.setattr(settings, "DOUBT_COMPACT_ORPHANS", False)
+    assert RetentionService.cutoff([process("a", time.time())]) is None
+
+
+def test_leader_ties_are_broken_by_process_id(vector_service):
+    service = RetentionService(vector_service)
+    service.owner = "a"
+    assert service.is_leader([process("b", 100.0), process("a", 100.0)])
+    assert not service.is_leader([process("b", 99.0), process("a", 100.0)])
+    assert not service.is_leader([])
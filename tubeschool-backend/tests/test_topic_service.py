@@ -0,0 +1,61 @@
+from app.services.topic_service import TopicService
+import numpy as np
+import pytest
+
+SUBJECTS = ["gravity mass attraction orbit", "photosynthesis light leaf sugar", "voltage current resistor circuit"]
+
+
+@pytest.fixture
+def topic_service(vector_service, llm):
+    service = TopicService(vector_service)
+    service.model = llm
+    return service
+
+
+def answer_with(llm, text: str):
+    llm.models["google"].chunks = [text]
+
+
+def store_lecture(vector_service, video_id: str = "v1"):
+    chunks = [
+        {"text": f"{subject} part {i}", "chunk_index": n, "start_time_sec": n * 10.0, "end_time_sec": n * 10.0 + 10}
+        for n, (i, subject) in enumerate((i, subject) for i in range(6) for subject in SUBJECTS)
+    ]
+    vector_service.store_video_chunks(video_id, chunks)
+
+
+def test_rebuilt_topic_vocabulary_replaces_the_previous_one(vector_service):
+    vector_service.store_video_topics("v1", np.eye(32, dtype=np.float32)[:3], ["A", "B", "C"])
+    vector_service.store_video_topics("v1", np.eye(32, dtype=np.float32)[:2], ["D", "E"])
+    labels, centroids = vector_service.get_video_topics("v1")
+    assert labels == ["D", "E"] and centroids.shape == (2, 32)
+
+
+def test_vocabulary_is_labeled_stored_and_used_for_assignment(topic_service, vector_service, llm):
+    store_lecture(vector_service)
+    answer_with(llm, '```json\n["Gravity", "Photosynthesis", "Circuits"]\n```')
+
+    labels = topic_service.build_vocabulary("v1")
+    assert sorted(labels) == ["Circuits", "Gravity", "Photosynthesis"]
+    assert vector_service.get_video_topics("v1")[0] == labels
+
+    topic_service._vocabularies.clear()  # Assignment after a restart reads the stored centroids
+    query = vector_service._encode("gravity mass attraction orbit").tolist()
+    assert topic_service.assign_topic("v1", query) is not None
+
+
+@pytest.mark.parametrize("response", ["no topics here", '["Gravity", "Photosynthesis"]', '["Gravity", " ", "Circuits"]'])
+def test_unusable_labels_leave_the_video_without_a_vocabulary(topic_service, vector_service, llm, response):
+    store_lecture(vector_service)
+    answer_with(llm, response)
+
+    with pytest.raises(ValueError):
+        topic_service.build_vocabulary("v1")
+    assert vector_service.get_video_topics("v1")[0] == []
+    with pytest.raises(LookupError):
+        topic_service.assign_topic("v1", [1.0] + [0.0] * 31)
+
+
+def test_video_without_chunks_has_no_topics(topic_service, llm):
+    assert topic_service.build_vocabulary("missing") == []
+    assert llm.models["google"].calls == 0
@@ -0,0 +1,131 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from youtube_transcript_api import FetchedTranscriptSnippet, TranscriptsDisabled
+from app.config import settings
+from app.services.transcript_service import TranscriptService
+from app.utils import resilience
+from app.utils.resilience import CircuitBreaker, CircuitOpenError
+import threading
+import time
+import pytest
+
+SNIPPETS = [FetchedTranscriptSnippet(text="gravity pulls", start=0.0, duration=2.0)]
+
+
+class FakeSource:
+    """Transcript source answering each fetch() with the next scripted outcome (an exception, a delay or snippets)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.release = threading.Event()
+
+    def fetch(self, video_id, languages, preserve_formatting):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome == "hang":
+            self.release.wait(5)
+            return []
+        return outcome
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff sleeps of call_with_resilience, recorded instead of slept"""
+    slept = []
+    monkeypatch.setattr(resilience.time, "sleep", slept.append)
+    monkeypatch.setattr(resilience.random, "random", lambda: 0.0)
+    return slept
+
+
+@pytest.fixture
+def transcripts(monkeypatch, sleeps):
+    monkeypatch.setattr(settings, "TRANSCRIPT_TIMEOUT_SEC", 0.1)
+    monkeypatch.setattr(settings, "TRANSCRIPT_RETRIES", 2)
+    monkeypatch.setattr(settings, "TRANSCRIPT_RETRY_BACKOFF_SEC", 0.5)
+    monkeypatch.setattr(settings, "TRANSCRIPT_BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "TRANSCRIPT_BREAKER_RESET_SEC", 30.0)
+    services = []
+
+    def build(*outcomes):
+        service = TranscriptService(source=FakeSource(*outcomes))
+        services.append(service)
+        return service
+    yield build
+    for service in services:
+        service.api.release.set()
+        service.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_transient_failures_are_retried_with_exponential_backoff(transcripts, sleeps):
+    service = transcripts(ConnectionError("reset"), ConnectionError("reset"), SNIPPETS)
+    assert service.fetch_transcript("v1") == SNIPPETS
+    assert service.api.calls == 3
+    assert sleeps == [0.5, 1.0]
+    assert service.breaker.failures == 0
+
+
+def test_hung_attempt_times_out(transcripts):
+    service = transcripts("hang")
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        service.fetch_transcript("v1")
+    assert service.api.calls == 3
+    assert time.perf_counter() - started < 1.0
+
+
+def test_video_without_captions_is_not_retried(transcripts, sleeps):
+    service = transcripts(TranscriptsDisabled("v1"))
+    with pytest.raises(TranscriptsDisabled):
+        service.fetch_transcript("v1")
+    assert service.api.calls == 1 and sleeps == []
+    assert not service.breaker.is_open
+
+
+def test_open_breaker_fails_fast_until_the_trial_call(transcripts, monkeypatch):
+    service = transcripts(ConnectionError("down"))
+    with pytest.raises(ConnectionError):
+        service.fetch_transcript("v1")
+    assert service.breaker.is_open
+
+    with pytest.raises(CircuitOpenError):
+        service.fetch_transcript("v1")
+    assert service.api.calls == 3
+
+    # Half-open after the reset timeout: one trial call closes the breaker again
+    service.api.outcomes = [SNIPPETS]
+    opened_at = service.breaker.opened_at
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: opened_at + settings.TRANSCRIPT_BREAKER_RESET_SEC)
+    assert service.fetch_transcript("v1") == SNIPPETS
+    assert not service.breaker.is_open
+
+
+def test_failed_trial_reopens_the_breaker(monkeypatch):
+    breaker = CircuitBreaker("upstream", failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    trial_at = breaker.opened_at + 10.0
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: trial_at)
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # Only one trial at a time
+    breaker.record_failure()
+    assert breaker.is_open and breaker.opened_at == trial_at
+
+
+@pytest.mark.parametrize("outcome, status_code", [(ConnectionError("down"), 503), ("hang", 504)])
+def test_create_session_maps_upstream_failures(transcripts, monkeypatch, outcome, status_code):
+    from app.routes import sessions
+
+    service = transcripts(outcome)
+    if status_code == 503:
+        service.breaker.failure_threshold = 1
+        service.breaker.record_failure()
+    monkeypatch.setattr(sessions, "transcript_service", service)
+
+    app = FastAPI()
+    app.include_router(sessions.router)
+    response = TestClient(app).post("/sessions", json={"youtube_url": "https://youtu.be/unindexed01"})
+    assert response.status_code == status_code
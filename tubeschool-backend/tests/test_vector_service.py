@@ -0,0 +1,111 @@
+from qdrant_client.models import PointStruct
+from app.services.vector_service import VectorService
+from app.config import settings
+from tests.conftest import doubt, stored_doubts
+import asyncio
+import uuid
+import pytest
+
+
+def test_rejected_doubt_batch_is_dropped_not_retried(vector_service):
+    bad = PointStruct(id=str(uuid.uuid4()), vector=[1.0] * 3, payload=doubt("bad").model_dump(mode="json"))
+    vector_service._buffer_doubt(vector_service.index, bad)
+    vector_service.flush_doubts()
+    assert vector_service._pending_doubts == []
+
+    vector_service.store_user_doubt(doubt("good"))
+    vector_service.flush_doubts()
+    assert set(stored_doubts(vector_service, vector_service.index.doubts)) == {"good"}
+
+
+def test_buffered_doubts_are_read_before_they_are_flushed(vector_service):
+    vector_service.store_user_doubt(doubt("what is gravity"))
+    assert vector_service._pending_doubts
+    assert stored_doubts(vector_service, vector_service.index.doubts) == {}
+
+    vector_service.doubt_index.clear()  # Cold session: read from Qdrant plus the buffer
+    assert [d['question'] for d in vector_service.get_session_doubts("s1")] == ["what is gravity"]
+
+
+def test_full_buffer_is_flushed_in_one_batch(vector_service, monkeypatch):
+    monkeypatch.setattr(settings, "DOUBT_FLUSH_BATCH_SIZE", 3)
+    upserts = []
+    upsert = vector_service.client.upsert
+    monkeypatch.setattr(vector_service.client, "upsert", lambda **kw: upserts.append(len(kw["points"])) or upsert(**kw))
+
+    for i in range(3):
+        vector_service.store_user_doubt(doubt(f"question {i}"))
+
+    assert upserts == [3]
+    assert vector_service._pending_doubts == []
+    assert len(stored_doubts(vector_service, vector_service.index.doubts)) == 3
+
+
+def test_retrieval_vector_is_stored_without_encoding_again(vector_service, monkeypatch):
+    vector = [1.0] + [0.0] * 31
+    monkeypatch.setattr(vector_service, "_encode", lambda *args, **kwargs: pytest.fail("encoded again"))
+
+    vector_service.store_user_doubt(doubt("what is gravity"), vector=vector)
+    vector_service.flush_doubts()
+    assert stored_doubts(vector_service, vector_service.index.doubts)["what is gravity"].vector == vector
+
+
+def test_failed_flush_keeps_the_batch_for_the_next_one(vector_service, monkeypatch):
+    upsert = vector_service.client.upsert
+
+    def unreachable(**kwargs):
+        raise ConnectionError("qdrant unreachable")
+
+    vector_service.store_user_doubt(doubt("what is gravity"))
+    monkeypatch.setattr(vector_service.client, "upsert", unreachable)
+    vector_service.flush_doubts()
+    assert len(vector_service._pending_doubts) == 1
+
+    monkeypatch.setattr(vector_service.client, "upsert", upsert)
+    vector_service.flush_doubts()
+    assert set(stored_doubts(vector_service, vector_service.index.doubts)) == {"what is gravity"}
+
+
+def test_shutdown_keeps_the_doubts_of_an_interrupted_flush(vector_service):
+    written = []
+
+    class HangingClient:
+        """Async client whose first upsert hangs until cancelled"""
+
+        async def upsert(self, collection_name, points):
+            if not written:
+                written.append(None)
+                await asyncio.sleep(60)
+            written.extend(points)
+
+        async def close(self):
+            pass
+
+    async def scenario():
+        vector_service.async_client = HangingClient()
+        vector_service.store_user_doubt(doubt("one"))
+        vector_service.store_user_doubt(doubt("two"))
+        flush = asyncio.create_task(vector_service.aflush_doubts())
+        vector_service._flush_task = flush
+        await asyncio.sleep(0.05)
+        await vector_service.aclose()
+
+    asyncio.run(scenario())
+    assert {point.payload['question'] for point in written[1:]} == {"one", "two"}
+
+
+def test_embedded_storage_directory_survives_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "QDRANT_PATH", str(tmp_path / "qdrant"))
+    chunks = [{"chunk_index": 0, "text": "gravity pulls", "start_time_sec": 0.0, "end_time_sec": 5.0}]
+
+    first = VectorService()
+    assert first.async_client is None  # Embedded mode serves async calls from the sync client
+    first.store_video_chunks("v1", chunks)
+    first.store_user_doubt(doubt("what is gravity"))
+    asyncio.run(first.aclose())
+
+    restarted = VectorService()
+    assert restarted.index.version == first.index.version
+    assert restarted.check_video_exists("v1")
+    assert set(stored_doubts(restarted, restarted.index.doubts)) == {"what is gravity"}
+    restarted.client.close()